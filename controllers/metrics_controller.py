@@ -1,29 +1,205 @@
-from database.metrics_queries import MetricsQueries
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from database.db import Database
+from database.metrics_queries import VISIT_PHASES, MetricsQueries
+from database.metrics_sketches import (
+    QuantileSketch,
+    load_phase_sketches,
+    merge_phase_sketches,
+    sketch_percentiles,
+)
 from utils.time_format import seconds_to_mmss
 
 
 
+def shift_partials(db_path, start=None, end=None):
+    """
+    Mergeable per-phase sum/count/min/max and the turnover count for one
+    shift file. Files are opened read-only; ones that predate the running
+    aggregates are summed from the per-visit phase table instead.
+    """
+    db = Database(db_path, read_only=True)
+    try:
+        metrics = MetricsQueries(db)
+        has_aggregates = db.fetch_one(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'phase_aggregates'"
+        )
+        if has_aggregates:
+            phases = metrics.aggregated_phase_stats(start, end)
+        else:
+            phases = {}
+            rows = metrics.visit_phases(start, end)
+            for phase in VISIT_PHASES:
+                durations = [row[f"{phase}_seconds"] for row in rows if row[f"{phase}_seconds"] is not None]
+                phases[phase] = {
+                    "count": len(durations),
+                    "total": sum(durations),
+                    "min": min(durations, default=None),
+                    "max": max(durations, default=None),
+                }
+
+        return {
+            "phases": {
+                phase: {key: phases[phase][key] for key in ("count", "total", "min", "max")}
+                for phase in VISIT_PHASES
+            },
+            "turnovers": metrics.total_turnovers(start, end),
+        }
+    finally:
+        db.close()
+
+
+def merge_shift_partials(partials):
+    """Combines shift partials by summing totals and counts (never averaging averages)."""
+    merged = {
+        phase: {"count": 0, "total": 0, "avg": None, "min": None, "max": None}
+        for phase in VISIT_PHASES
+    }
+    turnovers = 0
+
+    for partial in partials:
+        turnovers += partial["turnovers"] or 0
+        for phase, entry in partial["phases"].items():
+            target = merged[phase]
+            target["count"] += entry["count"]
+            target["total"] += entry["total"] or 0
+            for key, pick in (("min", min), ("max", max)):
+                if entry[key] is not None:
+                    target[key] = entry[key] if target[key] is None else pick(target[key], entry[key])
+
+    for entry in merged.values():
+        if entry["count"]:
+            entry["avg"] = entry["total"] / entry["count"]
+
+    return merged, turnovers
+
+
 class MetricsController:
     def __init__(self, db):
         self.db = db
         self.metrics = MetricsQueries(db)
-        
-    def get_summary(self, start=None, end=None):
+
+    def get_summary(self, start=None, end=None, shift_paths=None, max_workers=None, include_distributions=False):
         """
         Returns high-level metrics summary.
         start/end: ISO timestamps or None (all time)
+        shift_paths: optional shift DB files to combine instead of this DB.
+        Each file is reduced to sum/count partials in a worker process and
+        the partials are merged; stuck rooms always come from this DB.
+        include_distributions: also read every visit in range for the
+        percentile fields and "distributions" (this DB only). Off by
+        default so a refresh stays O(hour buckets); the keys are then
+        left out.
         """
-        avg_wait = self.metrics.avg_wait_time(start, end)
-        avg_provider = self.metrics.avg_provider_time(start, end)
+        if shift_paths is not None:
+            stats, turnovers = merge_shift_partials(
+                self._collect_shift_partials(shift_paths, start, end, max_workers)
+            )
+        else:
+            # Averages come from the running aggregates, so a refresh costs
+            # O(hour buckets in range) rather than a pass over history.
+            stats = self.metrics.aggregated_phase_stats(start, end)
+            turnovers = self.metrics.total_turnovers(start, end)
         #avg_occupied = self.metrics.avg_occupied_time(start, end)
-        avg_cleaning = self.metrics.avg_cleaning_time(start, end)
-        turnovers = self.metrics.total_turnovers(start, end)
-        stuck_rooms = self.metrics.rooms_stuck_needing_cleaning()
-        
-        return {
-            "avg_wait": seconds_to_mmss(avg_wait),
-            "avg_provider": seconds_to_mmss(avg_provider),
-            "avg_cleaning": seconds_to_mmss(avg_cleaning),
+
+        summary = {
+            "avg_wait": seconds_to_mmss(stats["wait"]["avg"]),
+            "avg_provider": seconds_to_mmss(stats["provider"]["avg"]),
+            "avg_cleaning": seconds_to_mmss(stats["cleaning"]["avg"]),
             "turnovers": turnovers,
-            "stuck_rooms": stuck_rooms,
-        }
\ No newline at end of file
+            **self.get_stuck_rooms(),
+        }
+        if include_distributions and shift_paths is None:
+            summary.update(self.get_percentile_summary(start, end))
+        return summary
+
+    def get_percentile_summary(self, start=None, end=None):
+        """
+        Formatted percentile fields plus the raw "distributions". Reads
+        every visit in range, so callers fetch it on demand rather than on
+        every refresh.
+        """
+        distributions = self.get_distributions(start, end)
+        phases = distributions["phases"] if distributions else {}
+
+        def percentile(phase, key):
+            return seconds_to_mmss(phases.get(phase, {}).get(key))
+
+        return {
+            "p50_wait": percentile("wait", "p50"),
+            "p90_wait": percentile("wait", "p90"),
+            "p99_wait": percentile("wait", "p99"),
+            "p90_provider": percentile("provider", "p90"),
+            "p90_cleaning": percentile("cleaning", "p90"),
+            "distributions": distributions,
+        }
+
+    def get_stuck_rooms(self):
+        """
+        Stuck rooms and the next room due to breach. Served from the
+        in-memory status index, so it is cheap enough to poll while the
+        rest of the summary is unchanged.
+        """
+        return {
+            "stuck_rooms": self.metrics.rooms_stuck_needing_cleaning(),
+            "next_breach": self.metrics.next_room_to_breach(),
+        }
+
+    def get_distributions(self, start=None, end=None):
+        """
+        Percentiles, histograms and per-room / per-hour breakdowns in raw
+        seconds, or None when NumPy is not installed.
+        """
+        try:
+            from database.metrics_distributions import PhaseDistributions
+        except ImportError:
+            return None
+        return PhaseDistributions(self.db).summary(start, end)
+
+    def get_sketch_percentiles(self, shift_paths=None, room_id=None):
+        """
+        Approximate all-time p50/p90/p99 per phase from the stored quantile
+        sketches (within RELATIVE_ACCURACY), for this DB or merged across
+        the given shift files. Cost does not grow with history length.
+        """
+        if shift_paths is None:
+            return sketch_percentiles(load_phase_sketches(self.db, room_id))
+
+        sketch_sets = []
+        for path in shift_paths:
+            db = Database(path, read_only=True)
+            try:
+                has_sketches = db.fetch_one(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'phase_sketch_buckets'"
+                )
+                if has_sketches:
+                    sketch_sets.append(load_phase_sketches(db, room_id))
+                    continue
+
+                # Older archive: sketch its visits on the fly.
+                sketches = {phase: QuantileSketch() for phase in VISIT_PHASES}
+                for row in MetricsQueries(db).visit_phases():
+                    if room_id is not None and row["room_id"] != room_id:
+                        continue
+                    for phase, sketch in sketches.items():
+                        if row[f"{phase}_seconds"] is not None:
+                            sketch.add(row[f"{phase}_seconds"])
+                sketch_sets.append(sketches)
+            finally:
+                db.close()
+        return sketch_percentiles(merge_phase_sketches(sketch_sets))
+
+    def _collect_shift_partials(self, shift_paths, start, end, max_workers=None):
+        paths = [str(path) for path in shift_paths]
+        if len(paths) <= 1:
+            return [shift_partials(path, start, end) for path in paths]
+
+        workers = min(len(paths), max_workers or os.cpu_count() or 1)
+        # spawn: never fork a process that may be running the Tk main loop.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            return list(
+                pool.map(shift_partials, paths, [start] * len(paths), [end] * len(paths))
+            )
@@ -1,7 +1,70 @@
 from models.enums import RoomStatus, UpdateSource
 from services.transition_rules import is_transition_allowed
 from database.db import Database
-from datetime import datetime
+from database.metrics_aggregates import record_visit_phases
+from database.status_index import status_index_for
+from utils.time_utils import next_stamp_ms
+import os
+import threading
+
+# SQLite caps bound parameters per statement; batch lookups are chunked.
+MAX_IDS_PER_QUERY = 500
+
+
+class RoomDirectoryCache:
+    """
+    In-process cache of the (id, name) room list per DB file.
+
+    Entries are validated against the trigger-maintained room_set counter,
+    so rooms added or removed by another process are noticed, and this
+    process's own writes invalidate the entry directly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @staticmethod
+    def _key(db):
+        path = str(db.db_path)
+        if path in ("", ":memory:"):
+            return None
+        return os.path.abspath(path)
+
+    def get(self, db, version):
+        key = self._key(db)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry[0] == version:
+            return entry[1]
+        return None
+
+    def put(self, db, version, rooms):
+        key = self._key(db)
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key] = (version, rooms)
+
+    def invalidate(self, db):
+        key = self._key(db)
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+room_directory_cache = RoomDirectoryCache()
+
+
+def _outcome(room_id, new_status, error=None):
+    return {
+        "room_id": room_id,
+        "new_status": new_status.value,
+        "ok": error is None,
+        "error": error,
+    }
+
 
 class RoomController:
     """
@@ -16,12 +79,16 @@ class RoomController:
     # Room creation
     # ---------------------------
     def create_room(self, name: str, initial_status=RoomStatus.AVAILABLE):
+        index = status_index_for(self.db)
+        before = index.version()
         cursor = self.db.conn.cursor()
         cursor.execute(
             "INSERT INTO rooms (name, status) VALUES (?, ?)",
             (name, initial_status.value),
         )
         self.db.conn.commit()
+        room_directory_cache.invalidate(self.db)
+        index.apply([(cursor.lastrowid, initial_status.value, None)], before)
         return cursor.lastrowid
 
     # ---------------------------
@@ -32,108 +99,179 @@ class RoomController:
         room_id: int,
         new_status: RoomStatus,
         source: UpdateSource = UpdateSource.MANUAL,
+        commit: bool = True,
     ):
+        """
+        Applies one status transition. With commit=False the changes are
+        left in the caller's open transaction (used for group commits).
+        """
+        outcome = self.update_status_many([(room_id, new_status, source)], commit=commit)[0]
+        if not outcome["ok"]:
+            raise ValueError(outcome["error"])
+
+    def update_status_many(self, updates, commit: bool = True):
+        """
+        Applies many transitions in one transaction.
+
+        updates: iterable of (room_id, RoomStatus, UpdateSource) tuples; the
+        source may be omitted. Items are validated in order against the
+        status left by earlier items, and rejected items are skipped.
+        Returns one outcome dict per item: room_id, new_status, ok, error.
+        """
+        items = []
+        for update in updates:
+            room_id, new_status, *rest = update
+            items.append((room_id, new_status, rest[0] if rest else UpdateSource.MANUAL))
+
+        index = status_index_for(self.db)
+        before = index.version()
         cursor = self.db.conn.cursor()
+        room_ids = list(dict.fromkeys(room_id for room_id, _, _ in items))
+        current = {row["id"]: row["status"] for row in self.get_rooms(room_ids)}
+        active_visits = self._active_visits(cursor, room_ids)
 
-        # Get current status
-        row = cursor.execute(
-            "SELECT status FROM rooms WHERE id=?", (room_id,)
-        ).fetchone()
+        outcomes = []
+        visit_ends = []
+        history_rows = []
+        touched_visits = []
 
-        if not row:
-            raise ValueError(f"Room with ID {room_id} does not exist")
+        for room_id, new_status, source in items:
+            old_status = current.get(room_id)
+            if old_status is None:
+                outcomes.append(_outcome(room_id, new_status, f"Room with ID {room_id} does not exist"))
+                continue
 
-        old_status = row["status"]
-        old_status_enum = RoomStatus(old_status)
-        
-        if not is_transition_allowed(old_status_enum, new_status):
-            raise ValueError(
-                f"Invalid transition for room {room_id}: {old_status_enum.value} -> {new_status.value}"
-            )
+            if not is_transition_allowed(RoomStatus(old_status), new_status):
+                outcomes.append(
+                    _outcome(
+                        room_id,
+                        new_status,
+                        f"Invalid transition for room {room_id}: {old_status} -> {new_status.value}",
+                    )
+                )
+                continue
 
-        # ---------------------------
-        # VISIT START LOGIC
-        # ---------------------------
-        if (
-            old_status == RoomStatus.AVAILABLE.value
-            and new_status == RoomStatus.WAITING
-        ):
-            # Check for existing active visit
-            active_visit = cursor.execute(
-                """
-                SELECT id FROM visits
-                WHERE room_id = ?
-                AND end_time IS NULL
-                """,
-                (room_id,),
-            ).fetchone()
+            # One timestamp per transition so the visit window and the history
+            # row always agree when phase durations are derived.
+            now = next_stamp_ms()
+            visit_id = active_visits.get(room_id)
 
-            if not active_visit:
+            # ---------------------------
+            # VISIT START LOGIC
+            # ---------------------------
+            if (
+                old_status == RoomStatus.AVAILABLE.value
+                and new_status == RoomStatus.WAITING
+                and visit_id is None
+            ):
                 cursor.execute(
                     """
-                    INSERT INTO visits (room_id, start_time)
+                    INSERT INTO visits (room_id, start_ms)
                     VALUES (?, ?)
                     """,
-                    (room_id, datetime.now()),
+                    (room_id, now),
                 )
+                visit_id = cursor.lastrowid
+                active_visits[room_id] = visit_id
 
-        # ---------------------------
-        # VISIT END LOGIC
-        # ---------------------------
-        if (
-            old_status == RoomStatus.CLEANING.value
-            and new_status == RoomStatus.AVAILABLE
-        ):
-            cursor.execute(
-                """
-                UPDATE visits
-                SET end_time = ?
-                WHERE room_id = ?
-                AND end_time IS NULL
-                """,
-                (datetime.now(), room_id),
-            )
+            if visit_id is not None:
+                touched_visits.append(visit_id)
+
+            # ---------------------------
+            # VISIT END LOGIC
+            # ---------------------------
+            if (
+                old_status == RoomStatus.CLEANING.value
+                and new_status == RoomStatus.AVAILABLE
+                and visit_id is not None
+            ):
+                # Bounded by id so a visit started later in this batch stays open
+                visit_ends.append((now, room_id, visit_id))
+                del active_visits[room_id]
+
+            history_rows.append((room_id, old_status, new_status.value, source.value, now))
+            current[room_id] = new_status.value
+            outcomes.append(_outcome(room_id, new_status))
+
+        cursor.executemany(
+            """
+            UPDATE visits
+            SET end_ms = ?
+            WHERE room_id = ?
+            AND end_ms IS NULL
+            AND id <= ?
+            """,
+            visit_ends,
+        )
 
         # ---------------------------
         # Update rooms table
         # ---------------------------
-        cursor.execute(
+        changed_rooms = dict.fromkeys(row[0] for row in history_rows)
+        cursor.executemany(
             "UPDATE rooms SET status=? WHERE id=?",
-            (new_status.value, room_id),
+            [(current[room_id], room_id) for room_id in changed_rooms],
         )
 
         # ---------------------------
-        # Log the change
+        # Log the change (room_events is a view over this table)
         # ---------------------------
-        cursor.execute(
+        cursor.executemany(
             """
-            INSERT INTO room_events (room_id, old_status, new_status, source)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp_ms)
+            VALUES (?, ?, ?, ?, ?)
             """,
-            (room_id, old_status, new_status.value, source.value),
-        )
-        
-        # Log into room_status_history (used for metrics)
-        cursor.execute(
-            """
-            INSERT INTO room_status_history (room_id, old_status, new_status, source)
-            VALUES (?, ?, ?, ?)
-            """,
-            (room_id, old_status, new_status.value, source.value),
+            history_rows,
         )
 
+        # Fold any phase these transitions completed into the running aggregates
+        for visit_id in dict.fromkeys(touched_visits):
+            record_visit_phases(cursor, visit_id)
 
-        self.db.conn.commit()
+        if commit:
+            self.db.conn.commit()
+            index.apply(
+                [(room_id, new_status, now) for room_id, _, new_status, _, now in history_rows],
+                before,
+            )
+        else:
+            # The caller may still roll back; reload once it has committed.
+            index.invalidate()
+
+        return outcomes
+
+    def _active_visits(self, cursor, room_ids):
+        active = {}
+        for offset in range(0, len(room_ids), MAX_IDS_PER_QUERY):
+            chunk = room_ids[offset:offset + MAX_IDS_PER_QUERY]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = cursor.execute(
+                f"""
+                SELECT room_id, MAX(id) AS id FROM visits
+                WHERE end_ms IS NULL
+                AND room_id IN ({placeholders})
+                GROUP BY room_id
+                """,
+                chunk,
+            ).fetchall()
+            active.update((row["room_id"], row["id"]) for row in rows)
+        return active
 
     def delete_room(self, room_id: int):
+        index = status_index_for(self.db)
+        before = index.version()
         cursor = self.db.conn.cursor()
 
+        cursor.execute("DELETE FROM phase_aggregates WHERE room_id=?", (room_id,))
+        cursor.execute("DELETE FROM phase_sketch_buckets WHERE room_id=?", (room_id,))
+        cursor.execute("DELETE FROM visit_phase_durations WHERE room_id=?", (room_id,))
         cursor.execute("DELETE FROM visits WHERE room_id=?", (room_id,))
         cursor.execute("DELETE FROM room_status_history WHERE room_id=?", (room_id,))
-        cursor.execute("DELETE FROM room_events WHERE room_id=?", (room_id,))
         cursor.execute("DELETE FROM rooms WHERE id=?", (room_id,))
 
         self.db.conn.commit()
+        room_directory_cache.invalidate(self.db)
+        index.remove(room_id, before)
 
     # ---------------------------
     # Query methods
@@ -143,10 +281,62 @@ class RoomController:
         rows = cursor.execute("SELECT * FROM rooms").fetchall()
         return rows
 
+    def get_room(self, room_id: int):
+        cursor = self.db.conn.cursor()
+        return cursor.execute(
+            "SELECT * FROM rooms WHERE id=?", (room_id,)
+        ).fetchone()
+
+    def get_rooms(self, room_ids):
+        """
+        Primary-key lookup of several rooms. Rows come back in the order
+        the ids were given; unknown ids are skipped.
+        """
+        room_ids = list(dict.fromkeys(room_ids))
+        cursor = self.db.conn.cursor()
+        found = {}
+
+        for offset in range(0, len(room_ids), MAX_IDS_PER_QUERY):
+            chunk = room_ids[offset:offset + MAX_IDS_PER_QUERY]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = cursor.execute(
+                f"SELECT * FROM rooms WHERE id IN ({placeholders})",
+                chunk,
+            ).fetchall()
+            found.update((row["id"], row) for row in rows)
+
+        return [found[room_id] for room_id in room_ids if room_id in found]
+
+    def room_set_version(self):
+        cursor = self.db.conn.cursor()
+        row = cursor.execute(
+            "SELECT version FROM change_counters WHERE name = 'room_set'"
+        ).fetchone()
+        return row["version"] if row else 0
+
+    def get_room_directory(self):
+        """
+        Id/name of every room sorted by name, served from the in-process
+        directory cache while the room set is unchanged.
+        """
+        version = self.room_set_version()
+        rooms = room_directory_cache.get(self.db, version)
+        if rooms is not None:
+            return rooms
+
+        cursor = self.db.conn.cursor()
+        rows = cursor.execute("SELECT id, name FROM rooms").fetchall()
+        rooms = tuple(sorted(
+            ({"id": row["id"], "name": row["name"]} for row in rows),
+            key=lambda r: r["name"].lower(),
+        ))
+        room_directory_cache.put(self.db, version, rooms)
+        return rooms
+
     def get_room_events(self, room_id: int):
         cursor = self.db.conn.cursor()
         rows = cursor.execute(
-            "SELECT * FROM room_events WHERE room_id=? ORDER BY timestamp DESC",
+            "SELECT * FROM room_events WHERE room_id=? ORDER BY timestamp_ms DESC",
             (room_id,),
         ).fetchall()
         return rows
@@ -1,22 +1,44 @@
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
+from database.migrations import EPOCH_MS_VERSION, create_legacy_timestamp_views, current_version, ensure_schema
+
+
+def data_version(conn):
+    """
+    Token that changes whenever a write is committed to the file: PRAGMA
+    data_version moves on commits from other connections and
+    total_changes on this connection's own writes. Reading it costs no
+    table access, so pollers can skip all work while it stays equal.
+    """
+    return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
 
 class Database:
-    def __init__(self, db_path="clinic.db"):
+    def __init__(self, db_path="clinic.db", initialize_schema=True, check_same_thread=True, read_only=False):
         self.db_path = Path(db_path)
-        self.conn = sqlite3.connect(self.db_path)
+        if read_only:
+            # Archived shift files are read as-is: no schema setup, no writes.
+            uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+            self.conn = sqlite3.connect(uri, uri=True, check_same_thread=check_same_thread)
+            initialize_schema = False
+        else:
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=check_same_thread)
         self.conn.row_factory = sqlite3.Row
-        self._initialize_schema()
+        if read_only and current_version(self.conn) < EPOCH_MS_VERSION:
+            # Older archives keep text timestamps; read them through temp views.
+            create_legacy_timestamp_views(self.conn)
+        if initialize_schema:
+            self._initialize_schema()
 
     def _initialize_schema(self):
-        schema_path = Path(__file__).parent / "schema.sql"
+        # A no-op beyond one PRAGMA read once the file is at the latest version.
+        ensure_schema(self.conn)
 
-        with open(schema_path, "r", encoding="utf-8") as f:
-            schema_sql = f.read()
-
-        self.conn.executescript(schema_sql)
-        self.conn.commit()
+    def data_version(self):
+        return data_version(self.conn)
 
     def fetch_one(self, query, params=None):
         cursor = self.conn.cursor()
@@ -36,3 +58,78 @@ class Database:
     
     def close(self):
         self.conn.close()
+
+
+class ConnectionPool:
+    """
+    Reusable connections to the active shift DB for threaded servers.
+
+    A connection is checked out by exactly one thread at a time and handed
+    back afterwards. Schema setup runs once per DB file, and every
+    connection opens in WAL mode with a busy timeout so concurrent readers
+    and a writer do not trip over each other. Asking for a different path
+    (a shift rotation) retires every connection to the previous file.
+    """
+
+    def __init__(self, max_idle=8, busy_timeout_ms=5000):
+        self.max_idle = max_idle
+        self.busy_timeout_ms = busy_timeout_ms
+        self._lock = threading.Lock()
+        self._db_path = None
+        self._generation = 0
+        self._idle = []
+        self._initialized_paths = set()
+
+    @contextmanager
+    def connection(self, db_path):
+        db = self._acquire(str(db_path))
+        try:
+            yield db
+        finally:
+            self._release(db)
+
+    def _acquire(self, db_path):
+        with self._lock:
+            if db_path != self._db_path:
+                self._retire_idle()
+                self._db_path = db_path
+                self._generation += 1
+
+            generation = self._generation
+            if self._idle:
+                return self._idle.pop()
+
+            initialize = db_path not in self._initialized_paths
+            db = self._open(db_path, initialize)
+            self._initialized_paths.add(db_path)
+
+        db.pool_generation = generation
+        return db
+
+    def _open(self, db_path, initialize_schema):
+        db = Database(db_path, initialize_schema=initialize_schema, check_same_thread=False)
+        db.conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        db.conn.execute("PRAGMA journal_mode = WAL")
+        return db
+
+    def _release(self, db):
+        if db.conn.in_transaction:
+            db.conn.rollback()
+
+        with self._lock:
+            if db.pool_generation == self._generation and len(self._idle) < self.max_idle:
+                self._idle.append(db)
+                return
+
+        db.close()
+
+    def _retire_idle(self):
+        for db in self._idle:
+            db.close()
+        self._idle = []
+
+    def close_all(self):
+        with self._lock:
+            self._retire_idle()
+            self._db_path = None
+            self._generation += 1
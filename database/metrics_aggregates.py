@@ -0,0 +1,107 @@
+"""
+Running phase aggregates maintained on write.
+
+Every completed phase of a visit is recorded once in visit_phase_durations
+and folded into phase_aggregates (sum/count/min/max per phase, room and
+hour bucket of the visit start). Readers then sum buckets instead of
+re-deriving durations from raw history.
+"""
+
+from database.metrics_queries import VISIT_PHASES, visit_phase_query
+from database.metrics_sketches import rebuild_phase_sketches, record_sketch_sample
+
+
+# Local hour of an epoch-ms visit start, as a 'YYYY-MM-DD HH:00:00' label.
+HOUR_BUCKET_SQL = "strftime('%Y-%m-%d %H:00:00', ? / 1000, 'unixepoch', 'localtime')"
+
+
+def record_visit_phases(cursor, visit_id):
+    """
+    Folds any newly completed phases of one visit into the aggregates.
+    Runs on the caller's cursor so it shares the caller's transaction;
+    phases already recorded for the visit are skipped.
+    """
+    query, params = visit_phase_query("WHERE v.id = ?", [visit_id])
+    row = cursor.execute(query, params).fetchone()
+    if not row:
+        return []
+
+    recorded = []
+    for phase in VISIT_PHASES:
+        seconds = row[f"{phase}_seconds"]
+        if seconds is None:
+            continue
+
+        inserted = cursor.execute(
+            f"""
+            INSERT OR IGNORE INTO visit_phase_durations
+                (visit_id, phase, room_id, hour_bucket, seconds)
+            VALUES (?, ?, ?, {HOUR_BUCKET_SQL}, ?)
+            """,
+            (visit_id, phase, row["room_id"], row["start_ms"], seconds),
+        ).rowcount
+        if not inserted:
+            continue
+
+        cursor.execute(
+            f"""
+            INSERT INTO phase_aggregates
+                (phase, hour_bucket, room_id, total_seconds, sample_count, min_seconds, max_seconds)
+            VALUES (?, {HOUR_BUCKET_SQL}, ?, ?, 1, ?, ?)
+            ON CONFLICT (hour_bucket, phase, room_id) DO UPDATE SET
+                total_seconds = total_seconds + excluded.total_seconds,
+                sample_count = sample_count + 1,
+                min_seconds = MIN(min_seconds, excluded.min_seconds),
+                max_seconds = MAX(max_seconds, excluded.max_seconds)
+            """,
+            (phase, row["start_ms"], row["room_id"], seconds, seconds, seconds),
+        )
+        record_sketch_sample(cursor, phase, row["room_id"], seconds)
+        recorded.append(phase)
+
+    return recorded
+
+
+def rebuild_phase_aggregates(conn, include_sketches=True):
+    """
+    Recomputes the ledger, aggregates and (unless include_sketches is
+    False, for schemas that predate them) the quantile sketches from raw
+    history. Does not commit; callers own the transaction.
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM phase_aggregates")
+    cursor.execute("DELETE FROM visit_phase_durations")
+
+    # One timeline pass, fanned out into one ledger row per completed phase.
+    query, params = visit_phase_query()
+    phase_selects = "\nUNION ALL\n".join(
+        f"""
+        SELECT visit_id, '{phase}', room_id, strftime('%Y-%m-%d %H:00:00', start_ms / 1000, 'unixepoch', 'localtime'), {phase}_seconds
+        FROM timeline
+        WHERE {phase}_seconds IS NOT NULL
+        """
+        for phase in VISIT_PHASES
+    )
+    cursor.execute(
+        f"""
+        WITH timeline AS MATERIALIZED ({query})
+        INSERT INTO visit_phase_durations (visit_id, phase, room_id, hour_bucket, seconds)
+        {phase_selects}
+        """,
+        params,
+    )
+
+    cursor.execute(
+        """
+        INSERT INTO phase_aggregates
+            (phase, hour_bucket, room_id, total_seconds, sample_count, min_seconds, max_seconds)
+        SELECT phase, hour_bucket, room_id, SUM(seconds), COUNT(*), MIN(seconds), MAX(seconds)
+        FROM visit_phase_durations
+        GROUP BY phase, hour_bucket, room_id
+        """
+    )
+
+    if include_sketches:
+        rebuild_phase_sketches(conn)
+
+    return cursor.execute("SELECT COUNT(*) FROM visit_phase_durations").fetchone()[0]
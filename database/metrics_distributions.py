@@ -0,0 +1,135 @@
+"""
+Percentile and distribution metrics over recorded phase durations.
+
+Completed phases are read once from the visit_phase_durations ledger into
+NumPy arrays, then p50/p90/p99, histograms and per-room / per-hour-of-day
+breakdowns are computed from one sort of all samples rather than one
+query per group. NumPy is optional for the app as a whole;
+importing this module without it raises ImportError.
+"""
+
+import numpy as np
+
+from database.metrics_queries import VISIT_PHASES, percentile, visit_start_filter
+
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+# Histogram bin edges in minutes; the last bin is open-ended.
+HISTOGRAM_EDGES_MINUTES = (0, 5, 10, 15, 20, 30, 45, 60, 90, 120)
+
+PHASE_NAMES = tuple(VISIT_PHASES)
+
+
+def _percentile_key(fraction):
+    return f"p{round(fraction * 100)}"
+
+
+def _grouped_percentiles(groups, values, fractions):
+    """
+    Percentiles of values within each group, one sort for all groups and
+    then metrics_queries.percentile on each group's slice. Returns (group
+    keys, counts, sums, maxima, {fraction: [value per group]}).
+    """
+    order = np.lexsort((values, groups))
+    groups = groups[order]
+    values = values[order]
+
+    keys, starts, counts = np.unique(groups, return_index=True, return_counts=True)
+    slices = [values[first:first + count] for first, count in zip(starts.tolist(), counts.tolist())]
+    result = {fraction: [percentile(group, fraction) for group in slices] for fraction in fractions}
+
+    sums = np.add.reduceat(values, starts) if len(values) else np.array([])
+    maxima = values[starts + counts - 1] if len(values) else np.array([])
+    return keys, counts, sums, maxima, result
+
+
+class PhaseDistributions:
+    def __init__(self, db):
+        self.db = db
+
+    def load(self, start=None, end=None):
+        """
+        Phase durations in range as parallel arrays: phase index (into
+        PHASE_NAMES), room id, hour of day of the visit start, seconds.
+        Bounds select visits that started in [start, end), as for the
+        averages and turnovers.
+        """
+        where, params = visit_start_filter(start, end)
+        source = "visit_phase_durations d"
+        if where:
+            source = "visits v JOIN visit_phase_durations d ON d.visit_id = v.id"
+
+        rows = self.db.fetch_all(
+            f"""
+            SELECT d.phase, d.room_id, CAST(substr(d.hour_bucket, 12, 2) AS INTEGER), d.seconds
+            FROM {source}
+            {where}
+            """,
+            params,
+        )
+
+        phase_index = {phase: index for index, phase in enumerate(PHASE_NAMES)}
+        phases = np.fromiter((phase_index.get(row[0], -1) for row in rows), dtype=np.int64, count=len(rows))
+        rooms = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        hours = np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows))
+        seconds = np.fromiter((row[3] for row in rows), dtype=np.float64, count=len(rows))
+
+        known = phases >= 0
+        return phases[known], rooms[known], hours[known], seconds[known]
+
+    def summary(self, start=None, end=None):
+        """
+        {"phases": {phase: {count, avg, max, p50, p90, p99, histogram}},
+         "by_room": {room_id: {phase: {...}}}, "by_hour": {hour: {phase: {...}}}}
+        """
+        phases, rooms, hours, seconds = self.load(start, end)
+        return {
+            "phases": self._by_phase(phases, seconds),
+            "by_room": self._breakdown(phases, rooms, seconds),
+            "by_hour": self._breakdown(phases, hours, seconds),
+            "histogram_edges_minutes": list(HISTOGRAM_EDGES_MINUTES),
+        }
+
+    def _stats(self, keys, counts, sums, maxima, percentiles):
+        stats = {}
+        for index, key in enumerate(keys.tolist()):
+            entry = {
+                "count": int(counts[index]),
+                "avg": float(sums[index] / counts[index]),
+                "max": float(maxima[index]),
+            }
+            for fraction, values in percentiles.items():
+                entry[_percentile_key(fraction)] = float(values[index])
+            stats[key] = entry
+        return stats
+
+    def _by_phase(self, phases, seconds):
+        empty = {"count": 0, "avg": None, "max": None, **{_percentile_key(f): None for f in PERCENTILES}}
+        result = {phase: dict(empty, histogram=[0] * len(HISTOGRAM_EDGES_MINUTES)) for phase in PHASE_NAMES}
+
+        stats = self._stats(*_grouped_percentiles(phases, seconds, PERCENTILES))
+        edges = np.array(HISTOGRAM_EDGES_MINUTES, dtype=np.float64) * 60
+        # Bin index per sample (last bin open-ended), counted per phase in one pass.
+        bins = np.searchsorted(edges, seconds, side="right") - 1
+        counts = np.bincount(
+            phases * len(edges) + np.clip(bins, 0, len(edges) - 1),
+            minlength=len(PHASE_NAMES) * len(edges),
+        ).reshape(len(PHASE_NAMES), len(edges))
+
+        for index, phase in enumerate(PHASE_NAMES):
+            if index in stats:
+                result[phase].update(stats[index])
+            result[phase]["histogram"] = counts[index].tolist()
+        return result
+
+    def _breakdown(self, phases, groups, seconds):
+        # Group on (key, phase) packed into one integer.
+        packed = groups * len(PHASE_NAMES) + phases
+        stats = self._stats(*_grouped_percentiles(packed, seconds, PERCENTILES))
+
+        result = {}
+        for code, entry in stats.items():
+            key, phase_index = divmod(code, len(PHASE_NAMES))
+            result.setdefault(key, {})[PHASE_NAMES[phase_index]] = entry
+        return result
@@ -1,89 +1,281 @@
 from database.db import Database
+from database.status_index import status_index_for
+from utils.time_utils import from_epoch_ms, to_epoch_ms
+
+
+# Phase name -> (status that starts the phase, status that ends it).
+# Durations use the first time each status is entered within a visit.
+VISIT_PHASES = {
+    "wait": ("waiting", "seeing_provider"),
+    "provider": ("seeing_provider", "needs_cleaning"),
+    "cleaning_wait": ("needs_cleaning", "cleaning"),
+    "cleaning": ("cleaning", "available"),
+}
+
+PHASE_STATUSES = ("waiting", "seeing_provider", "needs_cleaning", "cleaning", "available")
+
+HOUR_MS = 3_600_000
+
+
+def percentile(sorted_values, fraction):
+    """
+    Linear-interpolated percentile of an already sorted list or NumPy
+    array. Every p50/p90/p99 the app reports goes through this, so the
+    plain and NumPy summaries agree. Rounded to the millisecond so 8.1-style
+    positions do not land a hair under a whole second.
+    """
+    if len(sorted_values) == 0:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = position - lower
+    return round(float(sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * weight), 3)
+
+
+def _summarize(sorted_values):
+    if not sorted_values:
+        return {"count": 0, "avg": None, "min": None, "max": None, "p50": None, "p90": None}
+
+    return {
+        "count": len(sorted_values),
+        "avg": sum(sorted_values) / len(sorted_values),
+        "min": sorted_values[0],
+        "max": sorted_values[-1],
+        "p50": percentile(sorted_values, 0.5),
+        "p90": percentile(sorted_values, 0.9),
+    }
+
+
+def visit_phase_query(where="", params=None, extra_columns=()):
+    """
+    One ordered pass over room_status_history joined to visits.
+    Each visit row carries the first time every tracked status was
+    entered inside its window, plus the duration of every phase.
+    extra_columns are further visits columns to carry through.
+    """
+    status_columns = ",\n".join(
+        f"MIN(CASE WHEN h.new_status = '{status}' THEN h.timestamp_ms END) AS {status}_at_ms"
+        for status in PHASE_STATUSES
+    )
+    duration_columns = ",\n".join(
+        f"""CASE WHEN {to_status}_at_ms > {from_status}_at_ms
+            THEN ({to_status}_at_ms - {from_status}_at_ms) / 1000.0
+        END AS {phase}_seconds"""
+        for phase, (from_status, to_status) in VISIT_PHASES.items()
+    )
+    carried_columns = "".join(f"v.{column},\n" for column in extra_columns)
+
+    query = f"""
+    SELECT *,
+        {duration_columns}
+    FROM (
+        SELECT
+            v.id AS visit_id,
+            v.room_id,
+            v.start_ms,
+            v.end_ms,
+            {carried_columns}{status_columns}
+        FROM visits v
+        LEFT JOIN room_status_history h
+          ON h.room_id = v.room_id
+         AND h.timestamp_ms >= v.start_ms
+         AND (v.end_ms IS NULL OR h.timestamp_ms <= v.end_ms)
+        {where}
+        GROUP BY v.start_ms, v.id
+    ) visit_timeline
+    ORDER BY start_ms, visit_id
+    """
+
+    return query, list(params or [])
+
+
+def visit_start_filter(start=None, end=None):
+    """
+    WHERE clause and params selecting visits that started in [start, end).
+    Every metric bounded by a date range uses this rule, so averages,
+    percentiles and turnovers over one range describe the same visits.
+    Bounds may be datetimes or ISO strings (local time).
+    """
+    clauses = []
+    params = []
+
+    if start:
+        clauses.append("v.start_ms >= ?")
+        params.append(to_epoch_ms(start))
+
+    if end:
+        clauses.append("v.start_ms < ?")
+        params.append(to_epoch_ms(end))
+
+    where = ""
+    if clauses:
+        where = "WHERE " + " AND ".join(clauses)
+
+    return where, params
+
+
+def _floor_hour_ms(value_ms):
+    return to_epoch_ms(from_epoch_ms(value_ms).replace(minute=0, second=0, microsecond=0))
+
+
+def _hour_label(value_ms):
+    return f"{from_epoch_ms(value_ms):%Y-%m-%d %H}:00:00"
+
+
+def split_hour_range(start=None, end=None):
+    """
+    Splits [start, end) into the whole local hours it covers and the
+    partial hours left at its edges. Returns (clauses, params, edges):
+    WHERE clauses and params bounding hour_bucket labels to the whole
+    hours (clauses is None when there are none), and (start_ms, end_ms)
+    ranges of visit starts that fall outside them.
+    """
+    start_ms = to_epoch_ms(start) if start else None
+    end_ms = to_epoch_ms(end) if end else None
+
+    first_hour = None
+    if start_ms is not None:
+        first_hour = _floor_hour_ms(start_ms)
+        if first_hour < start_ms:
+            first_hour += HOUR_MS
+
+    last_hour = _floor_hour_ms(end_ms) if end_ms is not None else None
+
+    if first_hour is not None and last_hour is not None and first_hour >= last_hour:
+        return None, [], [(start_ms, end_ms)]
+
+    clauses = []
+    params = []
+    edges = []
+
+    if first_hour is not None:
+        clauses.append("hour_bucket >= ?")
+        params.append(_hour_label(first_hour))
+        if start_ms < first_hour:
+            edges.append((start_ms, first_hour))
+
+    if last_hour is not None:
+        clauses.append("hour_bucket < ?")
+        params.append(_hour_label(last_hour))
+        if last_hour < end_ms:
+            edges.append((last_hour, end_ms))
+
+    return clauses, params, edges
 
 
 class MetricsQueries:
     def __init__(self, db: Database):
         self.db = db
+        # ((start_ms, end_ms, data version), stats) of the last phase_stats
+        # pass, so avg_wait_time and friends share one pass per range.
+        self._phase_stats = None
+
+    def _visit_time_filter(self, start=None, end=None):
+        return visit_start_filter(start, end)
 
-    def _visit_time_filter(self, start=None, end=None):       
+    def visit_phases(self, start=None, end=None):
         """
-        Builds SQL WHERE clause for optional date filtering on visit windows.
+        Per-visit phase table: one row per visit with phase timestamps
+        and durations in seconds (NULL when a phase never completed).
         """
-        clauses = []
-        params = []
+        where, params = self._visit_time_filter(start, end)
+        query, params = visit_phase_query(where, params)
+        return self.db.fetch_all(query, params)
 
-        if start:
-            clauses.append("v.start_time >= ?")
-            params.append(start)
+    def phase_stats(self, start=None, end=None):
+        """
+        Derives count/avg/min/max/p50/p90 for every phase, plus the visit
+        count, from a single visit_phases pass. The result is reused until
+        the range or the database changes; treat it as read-only.
+        """
+        key = (to_epoch_ms(start) if start else None, to_epoch_ms(end) if end else None, self.db.data_version())
+        if self._phase_stats is not None and self._phase_stats[0] == key:
+            return self._phase_stats[1]
 
-        if end:
-            clauses.append("(v.end_time IS NOT NULL AND v.end_time <= ?)")
-            params.append(end)
+        rows = self.visit_phases(start, end)
+        stats = {"visits": len(rows)}
 
-        where = ""
-        if clauses:
-            where = "WHERE " + " AND ".join(clauses)
+        for phase in VISIT_PHASES:
+            durations = sorted(
+                row[f"{phase}_seconds"]
+                for row in rows
+                if row[f"{phase}_seconds"] is not None
+            )
+            stats[phase] = _summarize(durations)
 
-        return where, params
+        self._phase_stats = (key, stats)
+        return stats
 
-    def _avg_transition_within_visit(self, from_status, to_status, start=None, end=None):
-        where, params = self._visit_time_filter(start, end)
-        
-        query = f"""
-        SELECT AVG(strftime('%s', to_ts) - strftime('%s', from_ts))
-        FROM (
-            SELECT
-                v.id,
-                (
-                    SELECT MIN(hf.timestamp)
-                    FROM room_status_history hf
-                    WHERE hf.room_id = v.room_id
-                      AND hf.new_status = ?
-                      AND hf.timestamp >= v.start_time
-                      AND (v.end_time IS NULL OR hf.timestamp <= v.end_time)
-                ) AS from_ts,
-                (
-                    SELECT MIN(ht.timestamp)
-                    FROM room_status_history ht
-                    WHERE ht.room_id = v.room_id
-                      AND ht.new_status = ?
-                      AND ht.timestamp >= v.start_time
-                      AND (v.end_time IS NULL OR ht.timestamp <= v.end_time)
-                ) AS to_ts
-            FROM visits v
+    def aggregated_phase_stats(self, start=None, end=None, by_room=False):
+        """
+        Phase count/avg/min/max for visits that started in [start, end).
+        Whole hours are read from the running aggregates; partial hours at
+        either edge come from the visit_phase_durations ledger, reached
+        through the visit start index. Cost is O(hour buckets in range)
+        plus the visits in the partial hours.
+        """
+        clauses, params, edges = split_hour_range(start, end)
+
+        sources = []
+        if clauses is not None:
+            where = ""
+            if clauses:
+                where = "WHERE " + " AND ".join(clauses)
+            sources.append(f"""
+            SELECT phase, room_id, total_seconds, sample_count, min_seconds, max_seconds
+            FROM phase_aggregates
             {where}
-        ) visit_durations
-        WHERE from_ts IS NOT NULL
-          AND to_ts IS NOT NULL
-          AND to_ts > from_ts
+            """)
+
+        if edges:
+            ranges = " OR ".join("(v.start_ms >= ? AND v.start_ms < ?)" for _ in edges)
+            sources.append(f"""
+            SELECT d.phase, d.room_id, d.seconds AS total_seconds, 1 AS sample_count,
+                   d.seconds AS min_seconds, d.seconds AS max_seconds
+            FROM visits v
+            JOIN visit_phase_durations d ON d.visit_id = v.id
+            WHERE {ranges}
+            """)
+            params = params + [bound for edge in edges for bound in edge]
+
+        group_columns = "phase, room_id" if by_room else "phase"
+        query = f"""
+        SELECT {group_columns},
+               SUM(total_seconds) AS total_seconds,
+               SUM(sample_count) AS sample_count,
+               MIN(min_seconds) AS min_seconds,
+               MAX(max_seconds) AS max_seconds
+        FROM ({" UNION ALL ".join(sources)})
+        GROUP BY {group_columns}
         """
 
-        return self.db.fetch_one(query, [from_status, to_status, *params])
-    
+        empty = {"count": 0, "total": 0, "avg": None, "min": None, "max": None}
+        stats = {} if by_room else {phase: dict(empty) for phase in VISIT_PHASES}
+
+        for row in self.db.fetch_all(query, params):
+            entry = {
+                "count": row["sample_count"],
+                "total": row["total_seconds"],
+                "avg": row["total_seconds"] / row["sample_count"] if row["sample_count"] else None,
+                "min": row["min_seconds"],
+                "max": row["max_seconds"],
+            }
+            if by_room:
+                stats.setdefault(row["room_id"], {phase: dict(empty) for phase in VISIT_PHASES})[row["phase"]] = entry
+            else:
+                stats[row["phase"]] = entry
+
+        return stats
+
     def avg_wait_time(self, start=None, end=None):
-        return self._avg_transition_within_visit(
-            from_status='waiting',
-            to_status='seeing_provider',
-            start=start,
-            end=end,
-        )
+        return self.phase_stats(start, end)["wait"]["avg"]
 
     def avg_provider_time(self, start=None, end=None):
-        return self._avg_transition_within_visit(
-            from_status='seeing_provider',
-            to_status='needs_cleaning',
-            start=start,
-            end=end,
-        )
+        return self.phase_stats(start, end)["provider"]["avg"]
 
     def avg_cleaning_time(self, start=None, end=None):
-        return self._avg_transition_within_visit(
-            from_status='cleaning',
-            to_status='available',
-            start=start,
-            end=end,
-        )
-
+        return self.phase_stats(start, end)["cleaning"]["avg"]
 
     def total_turnovers(self, start=None, end=None):
         where, params = self._visit_time_filter(start, end)
@@ -98,21 +290,14 @@ class MetricsQueries:
 
     def rooms_stuck_needing_cleaning(self, threshold_seconds=1800):
         """
-        Rooms in needs_cleaning longer than threshold
-        """
-        query = """
-        SELECT r.id
-        FROM rooms r
-        JOIN (
-            SELECT room_id, MAX(timestamp) AS since
-            FROM room_status_history
-            WHERE new_status = 'needs_cleaning'
-            GROUP BY room_id
-        ) latest_nc ON latest_nc.room_id = r.id
-        WHERE r.status = 'needs_cleaning'
-          AND strftime('%s','now','localtime') - strftime('%s', latest_nc.since) > ?
-        ORDER BY r.id
+        Rooms in needs_cleaning longer than threshold, from the in-memory
+        status index (local clock, no history scan per call)
         """
+        return status_index_for(self.db).stuck_rooms("needs_cleaning", threshold_seconds)
 
-        rows = self.db.fetch_all(query, [threshold_seconds])
-        return [row[0] for row in rows]
+    def next_room_to_breach(self, threshold_seconds=1800):
+        """
+        (room_id, deadline) of the needs_cleaning room that crosses the
+        threshold first, or None when no room needs cleaning
+        """
+        return status_index_for(self.db).next_breach("needs_cleaning", threshold_seconds)
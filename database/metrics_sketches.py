@@ -0,0 +1,167 @@
+"""
+Mergeable streaming quantile sketches for phase durations.
+
+Each sketch is a log-bucketed histogram (the DDSketch construction): a
+duration x > 0 lands in bucket ceil(log_gamma(x)) with
+gamma = (1 + a) / (1 - a), and a bucket is reported as the value
+2 * gamma**k / (gamma + 1). For the sample of rank floor(q * (n - 1)) in
+sorted order (NumPy's ``method="lower"`` percentile) the reported value
+is within relative error ``a`` (RELATIVE_ACCURACY, 1%), independent of
+how many samples were added. Durations of zero seconds are counted
+exactly in their own bucket.
+
+Sketches are stored per shift DB as (phase, room_id, bucket) -> count
+rows and bumped from record_visit_phases, so every status update keeps
+them current. Merging is adding counts: across rooms with a GROUP BY,
+across shift files by reading each and adding. A query touches at most a
+few hundred buckets per phase, whatever the history length.
+"""
+
+import math
+from collections import Counter
+
+from database.metrics_queries import VISIT_PHASES
+
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+# Bucket for zero (and negative clock-skew) durations.
+ZERO_BUCKET = -(1 << 31)
+
+
+def bucket_for(seconds):
+    if seconds <= 0:
+        return ZERO_BUCKET
+    return math.ceil(math.log(seconds) / _LOG_GAMMA)
+
+
+def bucket_value(bucket):
+    if bucket == ZERO_BUCKET:
+        return 0.0
+    return 2 * GAMMA ** bucket / (GAMMA + 1)
+
+
+class QuantileSketch:
+    def __init__(self, buckets=None):
+        self.buckets = Counter(buckets or {})
+        self._cumulative = None
+
+    @property
+    def count(self):
+        return sum(self.buckets.values())
+
+    def add(self, seconds, count=1):
+        self.buckets[bucket_for(seconds)] += count
+        self._cumulative = None
+
+    def merge(self, other):
+        self.buckets.update(other.buckets)
+        self._cumulative = None
+        return self
+
+    def quantile(self, fraction):
+        """Estimated value at rank floor(fraction * (count - 1)); None when empty."""
+        if self._cumulative is None:
+            keys = sorted(self.buckets)
+            running = 0
+            cumulative = []
+            for key in keys:
+                running += self.buckets[key]
+                cumulative.append((running, key))
+            self._cumulative = cumulative
+
+        if not self._cumulative:
+            return None
+
+        total = self._cumulative[-1][0]
+        rank = math.floor(fraction * (total - 1))
+        for running, key in self._cumulative:
+            if running > rank:
+                return bucket_value(key)
+        return bucket_value(self._cumulative[-1][1])
+
+
+# ---------------------------
+# Storage
+# ---------------------------
+def record_sketch_sample(cursor, phase, room_id, seconds):
+    """Adds one duration to the stored sketch; runs in the caller's transaction."""
+    cursor.execute(
+        """
+        INSERT INTO phase_sketch_buckets (phase, room_id, bucket, count)
+        VALUES (?, ?, ?, 1)
+        ON CONFLICT (phase, room_id, bucket) DO UPDATE SET count = count + 1
+        """,
+        (phase, room_id, bucket_for(seconds)),
+    )
+
+
+def rebuild_phase_sketches(conn, room_ids=None):
+    """
+    Recomputes stored sketches from the visit_phase_durations ledger, for
+    every room or only the given ones. Does not commit.
+    """
+    cursor = conn.cursor()
+    if room_ids is None:
+        cursor.execute("DELETE FROM phase_sketch_buckets")
+        rows = cursor.execute("SELECT phase, room_id, seconds FROM visit_phase_durations")
+    else:
+        room_ids = list(room_ids)
+        placeholders = ", ".join("?" for _ in room_ids) or "NULL"
+        cursor.execute(f"DELETE FROM phase_sketch_buckets WHERE room_id IN ({placeholders})", room_ids)
+        rows = cursor.execute(
+            f"SELECT phase, room_id, seconds FROM visit_phase_durations WHERE room_id IN ({placeholders})",
+            room_ids,
+        )
+
+    counts = Counter((phase, room_id, bucket_for(seconds)) for phase, room_id, seconds in rows.fetchall())
+    cursor.executemany(
+        "INSERT INTO phase_sketch_buckets (phase, room_id, bucket, count) VALUES (?, ?, ?, ?)",
+        [(phase, room_id, bucket, count) for (phase, room_id, bucket), count in counts.items()],
+    )
+
+
+def load_phase_sketches(db, room_id=None):
+    """{phase: QuantileSketch} for one room, or merged over every room."""
+    clauses = ""
+    params = []
+    if room_id is not None:
+        clauses = "WHERE room_id = ?"
+        params.append(room_id)
+
+    sketches = {phase: QuantileSketch() for phase in VISIT_PHASES}
+    rows = db.fetch_all(
+        f"""
+        SELECT phase, bucket, SUM(count) AS count
+        FROM phase_sketch_buckets
+        {clauses}
+        GROUP BY phase, bucket
+        """,
+        params,
+    )
+    for row in rows:
+        if row["phase"] in sketches:
+            sketches[row["phase"]].buckets[row["bucket"]] += row["count"]
+    return sketches
+
+
+def merge_phase_sketches(sketch_sets):
+    """Merges {phase: QuantileSketch} mappings, e.g. one per shift file."""
+    merged = {phase: QuantileSketch() for phase in VISIT_PHASES}
+    for sketches in sketch_sets:
+        for phase, sketch in sketches.items():
+            merged[phase].merge(sketch)
+    return merged
+
+
+def sketch_percentiles(sketches, fractions=(0.5, 0.9, 0.99)):
+    """{phase: {"count", "p50", ...}} from a {phase: QuantileSketch} mapping."""
+    return {
+        phase: {
+            "count": sketch.count,
+            **{f"p{round(fraction * 100)}": sketch.quantile(fraction) for fraction in fractions},
+        }
+        for phase, sketch in sketches.items()
+    }
@@ -0,0 +1,490 @@
+"""
+Versioned schema changes applied on top of schema.sql.
+
+Every migration is tagged with the ``PRAGMA user_version`` it brings a
+database file to, so each step runs exactly once per shift DB no matter
+how many times the file is opened. schema.sql is the version 0 baseline
+and only runs for files that have never been migrated; opening a file
+that is already current reads user_version and nothing else.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+
+
+BASELINE_SCHEMA_PATH = Path(__file__).parent / "schema.sql"
+
+_baseline_schema = None
+
+
+# Epoch milliseconds (UTC) of a stored local-time DATETIME text column.
+def _epoch_ms_sql(expression):
+    return f"CAST(round((julianday({expression}, 'utc') - 2440587.5) * 86400000) AS INTEGER)"
+
+
+# Epoch milliseconds of a legacy history timestamp. The baseline schema
+# stamped history with CURRENT_TIMESTAMP (UTC, whole seconds); later
+# writers passed datetime.now() (local, with microseconds). The fraction
+# tells them apart.
+def _history_epoch_ms_sql(expression):
+    utc = f"CAST(round((julianday({expression}) - 2440587.5) * 86400000) AS INTEGER)"
+    return f"(CASE WHEN instr({expression}, '.') = 0 THEN {utc} ELSE {_epoch_ms_sql(expression)} END)"
+
+
+# Visit starts are floored to the second: the baseline stamped a visit
+# with datetime.now() just before the whole-second history row that
+# opened it, which would otherwise fall outside the visit's window.
+def _visit_start_epoch_ms_sql(expression):
+    return _epoch_ms_sql(f"strftime('%Y-%m-%d %H:%M:%S', {expression})")
+
+
+NOW_MS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+EPOCH_MS_VERSION = 7
+
+# table -> (column definitions, table constraints, {new column: (legacy text column, converter)})
+_EPOCH_MS_TABLES = {
+    "room_status_history": (
+        (
+            "id INTEGER PRIMARY KEY AUTOINCREMENT",
+            "room_id INTEGER NOT NULL",
+            "old_status TEXT NOT NULL",
+            "new_status TEXT NOT NULL",
+            "source TEXT DEFAULT 'manual'",
+            f"timestamp_ms INTEGER NOT NULL DEFAULT ({NOW_MS_SQL})",
+        ),
+        ("FOREIGN KEY (room_id) REFERENCES rooms(id)",),
+        {"timestamp_ms": ("timestamp", _history_epoch_ms_sql)},
+    ),
+    "visits": (
+        (
+            "id INTEGER PRIMARY KEY AUTOINCREMENT",
+            "room_id INTEGER NOT NULL",
+            "start_ms INTEGER NOT NULL",
+            "end_ms INTEGER",
+        ),
+        ("FOREIGN KEY (room_id) REFERENCES rooms(id)",),
+        {"start_ms": ("start_time", _visit_start_epoch_ms_sql), "end_ms": ("end_time", _epoch_ms_sql)},
+    ),
+}
+
+
+def create_legacy_timestamp_views(conn):
+    """
+    For files opened read-only below EPOCH_MS_VERSION (older shift
+    archives): temp views that shadow visits and room_status_history with
+    the epoch-ms columns computed from the text ones, so the current
+    queries run against them unchanged.
+    """
+    for table, (_columns, _constraints, converted) in _EPOCH_MS_TABLES.items():
+        columns = {row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")}
+        if not columns or set(converted) <= columns:
+            continue
+        computed = ", ".join(f"{convert(legacy)} AS {name}" for name, (legacy, convert) in converted.items())
+        conn.execute(f"CREATE TEMP VIEW IF NOT EXISTS {table} AS SELECT *, {computed} FROM main.{table}")
+
+
+@contextmanager
+def _legacy_timestamp_views(conn):
+    # Earlier steps backfill with the current epoch-ms queries.
+    create_legacy_timestamp_views(conn)
+    try:
+        yield
+    finally:
+        for table in _EPOCH_MS_TABLES:
+            conn.execute(f"DROP VIEW IF EXISTS temp.{table}")
+
+
+def _create_phase_aggregates(conn):
+    # Imported lazily: the aggregate module depends on database.db, which
+    # imports this module.
+    from database.metrics_aggregates import rebuild_phase_aggregates
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS visit_phase_durations (
+            visit_id INTEGER NOT NULL,
+            phase TEXT NOT NULL,
+            room_id INTEGER NOT NULL,
+            hour_bucket TEXT NOT NULL,
+            seconds REAL NOT NULL,
+            PRIMARY KEY (visit_id, phase)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS phase_aggregates (
+            phase TEXT NOT NULL,
+            hour_bucket TEXT NOT NULL,
+            room_id INTEGER NOT NULL,
+            total_seconds REAL NOT NULL DEFAULT 0,
+            sample_count INTEGER NOT NULL DEFAULT 0,
+            min_seconds REAL,
+            max_seconds REAL,
+            PRIMARY KEY (hour_bucket, phase, room_id)
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_visit_phase_durations_room ON visit_phase_durations (room_id)"
+    )
+    with _legacy_timestamp_views(conn):
+        rebuild_phase_aggregates(conn, include_sketches=False)
+
+
+def _merge_room_events_into_history(conn):
+    """
+    room_events duplicated every room_status_history row. Events with no
+    matching history row (same room and transition within a second; the
+    legacy writers stamped each table separately) are carried over, then
+    the table is replaced by a view over the history with INSTEAD OF
+    triggers so older writers and readers keep working.
+    """
+    kind = conn.execute(
+        "SELECT type FROM sqlite_master WHERE name = 'room_events'"
+    ).fetchone()
+
+    if kind is not None and kind[0] == "table":
+        carried_over = conn.execute(
+            """
+            INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp)
+            SELECT e.room_id, e.old_status, e.new_status, e.source, e.timestamp
+            FROM room_events e
+            WHERE NOT EXISTS (
+                SELECT 1 FROM room_status_history h
+                WHERE h.new_status = e.new_status
+                AND h.room_id = e.room_id
+                AND h.old_status = e.old_status
+                AND ABS(julianday(h.timestamp) - julianday(e.timestamp)) * 86400 <= 1
+            )
+            ORDER BY e.id
+            """
+        ).rowcount
+        conn.execute("DROP TABLE room_events")
+
+        if carried_over:
+            from database.metrics_aggregates import rebuild_phase_aggregates
+
+            with _legacy_timestamp_views(conn):
+                rebuild_phase_aggregates(conn, include_sketches=False)
+
+    conn.execute(
+        """
+        CREATE VIEW IF NOT EXISTS room_events AS
+        SELECT id, room_id, old_status, new_status, source, timestamp
+        FROM room_status_history
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_room_events_insert
+        INSTEAD OF INSERT ON room_events
+        BEGIN
+            INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp)
+            VALUES (
+                NEW.room_id,
+                NEW.old_status,
+                NEW.new_status,
+                COALESCE(NEW.source, 'manual'),
+                COALESCE(NEW.timestamp, CURRENT_TIMESTAMP)
+            );
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_room_events_delete
+        INSTEAD OF DELETE ON room_events
+        BEGIN
+            DELETE FROM room_status_history WHERE id = OLD.id;
+        END
+        """
+    )
+
+
+def _create_phase_sketches(conn):
+    from database.metrics_sketches import rebuild_phase_sketches
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS phase_sketch_buckets (
+            phase TEXT NOT NULL,
+            room_id INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (phase, room_id, bucket)
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_phase_sketch_buckets_room ON phase_sketch_buckets (room_id)"
+    )
+    rebuild_phase_sketches(conn)
+
+
+def _create_room_events_view(conn):
+    conn.execute(
+        """
+        CREATE VIEW IF NOT EXISTS room_events AS
+        SELECT id, room_id, old_status, new_status, source, timestamp_ms,
+               strftime('%Y-%m-%d %H:%M:%f', timestamp_ms / 1000.0, 'unixepoch', 'localtime') AS timestamp
+        FROM room_status_history
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_room_events_insert
+        INSTEAD OF INSERT ON room_events
+        BEGIN
+            INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp_ms)
+            VALUES (
+                NEW.room_id,
+                NEW.old_status,
+                NEW.new_status,
+                COALESCE(NEW.source, 'manual'),
+                COALESCE(NEW.timestamp_ms, {_epoch_ms_sql("NEW.timestamp")}, {NOW_MS_SQL})
+            );
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_room_events_delete
+        INSTEAD OF DELETE ON room_events
+        BEGIN
+            DELETE FROM room_status_history WHERE id = OLD.id;
+        END
+        """
+    )
+
+
+def _epoch_ms_timestamps(conn):
+    """
+    History and visit times become integer epoch milliseconds. Each table
+    is rebuilt with the new columns; columns added outside the baseline
+    schema (the warehouse's shift_id) are carried over unchanged. Visit
+    times are read as local time, which is what RoomController wrote.
+    History rows without fractional seconds took the baseline UTC
+    CURRENT_TIMESTAMP default and are read as UTC; the rest are local.
+    Aggregates built from such rows before this step compared UTC history
+    with local visit times, so they are rebuilt.
+    """
+    has_utc_history = conn.execute(
+        "SELECT 1 FROM room_status_history WHERE instr(timestamp, '.') = 0 LIMIT 1"
+    ).fetchone()
+    conn.execute("DROP VIEW IF EXISTS room_events")
+
+    for table, (definitions, constraints, converted) in _EPOCH_MS_TABLES.items():
+        core = [definition.split()[0] for definition in definitions]
+        legacy = {column for column, _convert in converted.values()}
+        extras = [
+            f"{row[1]} {row[2]}".strip()
+            for row in conn.execute(f"PRAGMA table_info({table})")
+            if row[1] not in core and row[1] not in legacy
+        ]
+
+        body = ",\n".join(definitions + tuple(extras) + constraints)
+        conn.execute(f"CREATE TABLE {table}_epoch_ms (\n{body}\n)")
+
+        columns = core + [extra.split()[0] for extra in extras]
+        selects = [
+            converted[name][1](converted[name][0]) if name in converted else name for name in columns
+        ]
+        conn.execute(
+            f"""
+            INSERT INTO {table}_epoch_ms ({", ".join(columns)})
+            SELECT {", ".join(selects)} FROM {table}
+            """
+        )
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_epoch_ms RENAME TO {table}")
+
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS idx_room_status_history_status_room_ts ON room_status_history (new_status, room_id, timestamp_ms)",
+        "CREATE INDEX IF NOT EXISTS idx_room_status_history_room_ts ON room_status_history (room_id, timestamp_ms)",
+        "CREATE INDEX IF NOT EXISTS idx_visits_room_end ON visits (room_id, end_ms)",
+        "CREATE INDEX IF NOT EXISTS idx_visits_start ON visits (start_ms)",
+    ):
+        conn.execute(statement)
+
+    _create_room_events_view(conn)
+
+    if has_utc_history:
+        from database.metrics_aggregates import rebuild_phase_aggregates
+
+        rebuild_phase_aggregates(conn)
+
+
+MIGRATIONS = [
+    (
+        1,
+        "Indexes backing the metrics queries",
+        """
+        CREATE INDEX IF NOT EXISTS idx_room_status_history_status_room_ts
+            ON room_status_history (new_status, room_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_visits_room_end
+            ON visits (room_id, end_time);
+        CREATE INDEX IF NOT EXISTS idx_visits_start
+            ON visits (start_time);
+        CREATE INDEX IF NOT EXISTS idx_rooms_status
+            ON rooms (status);
+        """,
+    ),
+    (
+        2,
+        "Index for the single-pass visit phase join",
+        """
+        CREATE INDEX IF NOT EXISTS idx_room_status_history_room_ts
+            ON room_status_history (room_id, timestamp);
+        """,
+    ),
+    (
+        3,
+        "Running phase aggregates, backfilled from existing history",
+        _create_phase_aggregates,
+    ),
+    (
+        4,
+        "Change counters bumped by triggers on room membership changes",
+        """
+        CREATE TABLE IF NOT EXISTS change_counters (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        INSERT OR IGNORE INTO change_counters (name, version) VALUES ('room_set', 0);
+
+        CREATE TRIGGER IF NOT EXISTS trg_rooms_insert_room_set
+        AFTER INSERT ON rooms
+        BEGIN
+            UPDATE change_counters SET version = version + 1 WHERE name = 'room_set';
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_rooms_delete_room_set
+        AFTER DELETE ON rooms
+        BEGIN
+            UPDATE change_counters SET version = version + 1 WHERE name = 'room_set';
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_rooms_rename_room_set
+        AFTER UPDATE OF name ON rooms
+        BEGIN
+            UPDATE change_counters SET version = version + 1 WHERE name = 'room_set';
+        END;
+        """,
+    ),
+    (
+        5,
+        "Single event log: room_events becomes a view over room_status_history",
+        _merge_room_events_into_history,
+    ),
+    (
+        6,
+        "Quantile sketches per phase and room, backfilled from the ledger",
+        _create_phase_sketches,
+    ),
+    (
+        EPOCH_MS_VERSION,
+        "History and visit times stored as integer epoch milliseconds",
+        _epoch_ms_timestamps,
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _read_baseline_schema():
+    global _baseline_schema
+    if _baseline_schema is None:
+        _baseline_schema = BASELINE_SCHEMA_PATH.read_text(encoding="utf-8")
+    return _baseline_schema
+
+
+def _execute_script(conn, script):
+    """
+    Runs a multi-statement script one statement at a time, so it joins the
+    open transaction (executescript would commit it first).
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        conn.execute(statement)
+
+
+def _run_step(conn, target, step):
+    """
+    Applies one step unless another connection already has. BEGIN IMMEDIATE
+    takes the write lock first, so user_version is re-read under it and two
+    processes opening the same file never both run a step. Returns whether
+    this connection applied it.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if current_version(conn) >= target:
+            conn.rollback()
+            return False
+        step(conn)
+        conn.execute(f"PRAGMA user_version = {int(target)}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def ensure_schema(conn, target_version=None):
+    """
+    Brings a connection's file up to date: the baseline schema for files
+    still at version 0, then any pending migrations. Returns the list of
+    migration versions applied (empty when the file was already current).
+    """
+    version = current_version(conn)
+    target = LATEST_VERSION if target_version is None else target_version
+    if version >= target:
+        return []
+
+    if version == 0:
+        # The baseline leaves user_version at 0 and is all IF NOT EXISTS,
+        # so running it again before the first migration lands is harmless.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if current_version(conn) == 0:
+                _execute_script(conn, _read_baseline_schema())
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return apply_migrations(conn, target_version=target_version)
+
+
+def apply_migrations(conn, target_version=None):
+    """
+    Applies every migration newer than the file's user_version, up to
+    target_version when given. Returns the list of versions that were applied.
+    """
+    applied = []
+    version = current_version(conn)
+
+    for target, _description, step in MIGRATIONS:
+        if target <= version:
+            continue
+        if target_version is not None and target > target_version:
+            break
+
+        if not callable(step):
+            step = partial(_execute_script, script=step)
+        if _run_step(conn, target, step):
+            applied.append(target)
+
+    return applied
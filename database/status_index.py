@@ -0,0 +1,173 @@
+"""
+In-memory index of each room's current status and when it entered it.
+
+The index is loaded once per connection with one indexed lookup per room
+and then kept current by RoomController writes on that connection.
+Commits from any other connection (the QR server's writer, another
+process) change ``PRAGMA data_version`` and any other write on this
+connection changes ``total_changes``; either triggers a reload on the
+next read. Entered-at times are the epoch milliseconds stored in history,
+so thresholds are plain integer comparisons with no UTC offset to get
+wrong. A min-heap of entered-at times per status answers "which room
+breaches next" for any threshold without scanning.
+"""
+
+import heapq
+import threading
+import weakref
+
+from database.db import data_version
+from utils.time_utils import from_epoch_ms, now_ms, to_epoch_ms
+
+
+class RoomStatusIndex:
+    def __init__(self, conn):
+        # Holds the connection, not the Database, so the weak registry
+        # below can drop the index along with its Database.
+        self.conn = conn
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._data_version = None
+        self._rooms = {}      # room_id -> (status, entered_at)
+        self._by_status = {}  # status -> {room_id: entered_at}
+        self._heaps = {}      # status -> [(entered_at, room_id)], stale entries skipped
+
+    # ---------------------------
+    # Loading
+    # ---------------------------
+    def _current_data_version(self):
+        return data_version(self.conn)
+
+    def _sync(self):
+        version = self._current_data_version()
+        if self._loaded and version == self._data_version:
+            return
+        self._load()
+        self._data_version = version
+
+    def _load(self):
+        rows = self.conn.execute(
+            """
+            SELECT r.id, r.status,
+                   (SELECT MAX(h.timestamp_ms) FROM room_status_history h
+                    WHERE h.new_status = r.status AND h.room_id = r.id) AS entered_at
+            FROM rooms r
+            """
+        ).fetchall()
+
+        self._rooms = {}
+        self._by_status = {}
+        self._heaps = {}
+        for room_id, status, entered_at in rows:
+            self._set(room_id, status, entered_at)
+        self._loaded = True
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    # ---------------------------
+    # Writes
+    # ---------------------------
+    def _set(self, room_id, status, entered_at):
+        previous = self._rooms.get(room_id)
+        if previous is not None:
+            self._by_status.get(previous[0], {}).pop(room_id, None)
+
+        self._rooms[room_id] = (status, entered_at)
+        self._by_status.setdefault(status, {})[room_id] = entered_at
+        if entered_at is not None:
+            heap = self._heaps.setdefault(status, [])
+            heapq.heappush(heap, (entered_at, room_id))
+            if len(heap) > 2 * len(self._by_status[status]) + 16:
+                # Too many stale entries: rebuild from the live rooms.
+                heap[:] = [(at, rid) for rid, at in self._by_status[status].items() if at is not None]
+                heapq.heapify(heap)
+
+    def version(self):
+        """Data version to pass to apply()/remove(); read it before writing."""
+        return self._current_data_version()
+
+    def apply(self, transitions, before):
+        """
+        Records committed (room_id, status, entered_at) transitions made on
+        this connection. before is version() from ahead of the write; if
+        the index was stale then, or another connection committed since,
+        the index reloads on the next read instead of claiming their rows.
+        """
+        with self._lock:
+            if self._advance(before):
+                for room_id, status, entered_at in transitions:
+                    self._set(room_id, status, entered_at)
+
+    def remove(self, room_id, before):
+        with self._lock:
+            if self._advance(before):
+                previous = self._rooms.pop(room_id, None)
+                if previous is not None:
+                    self._by_status.get(previous[0], {}).pop(room_id, None)
+
+    def _advance(self, before):
+        after = self._current_data_version()
+        # data_version itself only moves on other connections' commits.
+        if self._loaded and before == self._data_version and after[0] == before[0]:
+            self._data_version = after
+            return True
+        self._loaded = False
+        return False
+
+    # ---------------------------
+    # Reads
+    # ---------------------------
+    def rooms_in_status(self, status):
+        """{room_id: entered_at_ms} for every room currently in status."""
+        with self._lock:
+            self._sync()
+            return dict(self._by_status.get(status, {}))
+
+    def stuck_rooms(self, status, threshold_seconds, now=None):
+        """
+        Sorted ids of rooms in status for longer than threshold_seconds;
+        now may be a datetime or epoch ms (default: the current time).
+        """
+        cutoff = (now_ms() if now is None else to_epoch_ms(now)) - threshold_seconds * 1000
+        with self._lock:
+            self._sync()
+            rooms = self._by_status.get(status, {})
+            return sorted(
+                room_id
+                for room_id, entered_at in rooms.items()
+                if entered_at is not None and entered_at < cutoff
+            )
+
+    def next_breach(self, status, threshold_seconds):
+        """
+        (room_id, deadline) of the room in status that crosses
+        threshold_seconds first, including ones already past it, with the
+        deadline as a local datetime; None when no room is in status.
+        """
+        with self._lock:
+            self._sync()
+            heap = self._heaps.get(status, [])
+            rooms = self._by_status.get(status, {})
+            # Drop entries for rooms that have since moved on.
+            while heap and rooms.get(heap[0][1]) != heap[0][0]:
+                heapq.heappop(heap)
+            if not heap:
+                return None
+            entered_at, room_id = heap[0]
+            return room_id, from_epoch_ms(entered_at + threshold_seconds * 1000)
+
+
+_indexes = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def status_index_for(db):
+    """The status index bound to a Database (one per connection)."""
+    with _indexes_lock:
+        index = _indexes.get(db)
+        if index is None:
+            index = RoomStatusIndex(db.conn)
+            _indexes[db] = index
+        return index
@@ -0,0 +1,16 @@
+from models.enums import RoomStatus
+
+# ----------------------------
+# Color mapping for statuses
+# ----------------------------
+
+STATUS_COLORS = {
+    RoomStatus.AVAILABLE: "#4CAF50",       # Green
+    RoomStatus.WAITING: "#FFEB3B",         # Yellow
+    RoomStatus.SEEING_PROVIDER: "#FF0000", # Purple
+    #RoomStatus.OCCUPIED: "#F44336",        # Red
+    RoomStatus.NEEDS_CLEANING: "#FF9800",  # Orange
+    RoomStatus.CLEANING: "#2196F3",        # Blue
+    RoomStatus.MAINTENANCE: "#444444",     # Gray
+    RoomStatus.OUT_OF_SERVICE: "#FFFFFF",   # White
+}
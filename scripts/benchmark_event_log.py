@@ -0,0 +1,133 @@
+"""
+Compare write cost per room transition with and without the duplicate
+room_events table.
+
+"before" opens a current shift DB, puts back the version 4 room_events
+table and writes every transition to both tables in one transaction, as
+the controller used to. "after" uses the current schema, where room_events is
+a view over room_status_history. Bytes written are measured as WAL growth
+with auto-checkpointing disabled.
+
+Usage:
+  python scripts/benchmark_event_log.py --rooms 20 --cycles 50
+"""
+
+import argparse
+import os
+from pathlib import Path
+import sys
+import tempfile
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from controllers.room_controller import RoomController
+from database.db import Database
+from models.enums import RoomStatus, UpdateSource
+
+LIFECYCLE = [
+    RoomStatus.WAITING,
+    RoomStatus.SEEING_PROVIDER,
+    RoomStatus.NEEDS_CLEANING,
+    RoomStatus.CLEANING,
+    RoomStatus.AVAILABLE,
+]
+
+# room_events as it was before schema version 5.
+LEGACY_ROOM_EVENTS_DDL = """
+DROP VIEW room_events;
+CREATE TABLE room_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_id INTEGER NOT NULL,
+    old_status TEXT NOT NULL,
+    new_status TEXT NOT NULL,
+    source TEXT NOT NULL,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (room_id) REFERENCES rooms(id)
+);
+"""
+
+
+def _open(db_path, legacy):
+    db = Database(db_path)
+    if legacy:
+        db.conn.executescript(LEGACY_ROOM_EVENTS_DDL)
+
+    db.conn.execute("PRAGMA journal_mode=WAL")
+    db.conn.execute("PRAGMA wal_autocheckpoint=0")
+    return db
+
+
+def _legacy_update(controller, room_id, status, source=UpdateSource.MANUAL):
+    old_status = controller.get_room(room_id)["status"]
+    controller.update_status(room_id, status, source, commit=False)
+    # The same row the controller wrote to room_events before version 5.
+    controller.db.conn.execute(
+        """
+        INSERT INTO room_events (room_id, old_status, new_status, source)
+        VALUES (?, ?, ?, ?)
+        """,
+        (room_id, old_status, status.value, source.value),
+    )
+    controller.db.conn.commit()
+
+
+def run(db_path, rooms, cycles, legacy):
+    db = _open(db_path, legacy)
+    controller = RoomController(db)
+    room_ids = [controller.create_room(f"Bench {i:03d}") for i in range(rooms)]
+    db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    wal_path = f"{db_path}-wal"
+    wal_before = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+    commits = []
+    db.conn.set_trace_callback(lambda sql: commits.append(sql) if sql.strip().upper() == "COMMIT" else None)
+
+    transitions = 0
+    for _ in range(cycles):
+        for status in LIFECYCLE:
+            for room_id in room_ids:
+                if legacy:
+                    _legacy_update(controller, room_id, status)
+                else:
+                    controller.update_status(room_id, status)
+                transitions += 1
+
+    db.conn.set_trace_callback(None)
+    wal_bytes = os.path.getsize(wal_path) - wal_before
+    db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    page_size = db.conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = db.conn.execute("PRAGMA page_count").fetchone()[0]
+    db.close()
+
+    return {
+        "transitions": transitions,
+        "wal_bytes_per_transition": wal_bytes / transitions,
+        "commits_per_transition": len(commits) / transitions,
+        "db_bytes": page_size * page_count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark event log write amplification.")
+    parser.add_argument("--rooms", type=int, default=20, help="Rooms cycled through the lifecycle")
+    parser.add_argument("--cycles", type=int, default=50, help="Full lifecycles per room")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            "before": run(os.path.join(tmp, "before.db"), args.rooms, args.cycles, legacy=True),
+            "after": run(os.path.join(tmp, "after.db"), args.rooms, args.cycles, legacy=False),
+        }
+
+    print(f"{'':8} {'transitions':>12} {'WAL B/transition':>17} {'commits/transition':>19} {'DB bytes':>10}")
+    for label, result in results.items():
+        print(
+            f"{label:8} {result['transitions']:>12} {result['wal_bytes_per_transition']:>17.0f} "
+            f"{result['commits_per_transition']:>19.2f} {result['db_bytes']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
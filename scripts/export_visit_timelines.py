@@ -0,0 +1,38 @@
+import argparse
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services.shift_service import active_db_path
+from services.visit_export import DEFAULT_CHUNK_SIZE, export_visit_timelines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export per-visit phase timelines in a columnar format.")
+    parser.add_argument("--db", action="append", default=[], help="Shift or warehouse DB to export (repeatable). Defaults to the active shift DB.")
+    parser.add_argument("--all-shifts", action="store_true", help="Export every DB under --shifts-dir")
+    parser.add_argument("--shifts-dir", default="data/shifts", help="Directory holding per-shift DB files")
+    parser.add_argument("--out", default="artifacts/export/visit_timelines.parquet", help="Output file")
+    parser.add_argument("--format", default="auto", choices=["auto", "parquet", "arrow", "npz", "csv"])
+    parser.add_argument("--start", help="Only visits starting at or after this timestamp")
+    parser.add_argument("--end", help="Only visits starting before this timestamp")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows read and written per chunk")
+    args = parser.parse_args()
+
+    paths = list(args.db)
+    if args.all_shifts:
+        paths.extend(str(path) for path in sorted(Path(args.shifts_dir).glob("*.db")))
+    if not paths:
+        paths.append(active_db_path())
+
+    out_path, fmt, rows = export_visit_timelines(
+        paths, args.out, fmt=args.format, start=args.start, end=args.end, chunk_size=args.chunk_size
+    )
+    print(f"Wrote {rows} visits to {out_path} ({fmt})")
+
+
+if __name__ == "__main__":
+    main()
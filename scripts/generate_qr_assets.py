@@ -9,18 +9,13 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from database.db import Database
-from services.shift_service import ShiftService
+from services.shift_service import active_db_path
 from web.qr_server import create_shared_form_url, create_signed_form_url, guess_reachable_host
 
 
 DISALLOWED_QR_HOSTS = {"0.0.0.0", "127.0.0.1", "localhost"}
 
 
-def _active_db_path():
-    active = ShiftService().get_active_db_path()
-    return str(active) if active else "clinic.db"
-
-
 def validate_base_url(base_url: str, allow_local_only: bool):
     parsed = urlparse(base_url)
     if parsed.scheme not in {"http", "https"}:
@@ -59,7 +54,7 @@ def main():
     rows = []
 
     if not args.shared_only:
-        db = Database(_active_db_path())
+        db = Database(active_db_path())
         rooms = db.fetch_all("SELECT id, name FROM rooms ORDER BY name")
         db.close()
 
@@ -0,0 +1,34 @@
+import argparse
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services.analytics_warehouse import DEFAULT_SHIFTS_DIR, DEFAULT_WAREHOUSE_PATH, AnalyticsWarehouse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolidate archived shift DBs into the analytics warehouse.")
+    parser.add_argument("--warehouse", default=DEFAULT_WAREHOUSE_PATH, help="Analytics DB to write")
+    parser.add_argument("--shifts-dir", default=DEFAULT_SHIFTS_DIR, help="Directory holding archived shift DB files")
+    parser.add_argument("--db", action="append", default=[], help="Archived shift DB to ingest (repeatable). Defaults to every archive under --shifts-dir.")
+    parser.add_argument("--force", action="store_true", help="Re-ingest files even if they are unchanged")
+    args = parser.parse_args()
+
+    warehouse = AnalyticsWarehouse(args.warehouse, args.shifts_dir)
+    try:
+        results = warehouse.ingest(args.db or None, force=args.force)
+    finally:
+        warehouse.close()
+
+    for result in results:
+        if result.ingested:
+            print(f"Ingested {result.shift_id}: {result.visits} visits, {result.events} events")
+        else:
+            print(f"Skipped {result.shift_id}: unchanged since last ingest")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from database.db import Database
+from database.metrics_aggregates import rebuild_phase_aggregates
+from services.shift_service import active_db_path
+
+
+def rebuild(db_path):
+    db = Database(db_path)
+    try:
+        phases = rebuild_phase_aggregates(db.conn)
+        db.conn.commit()
+    finally:
+        db.close()
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill running phase aggregates from raw room history.")
+    parser.add_argument("--db", action="append", default=[], help="Shift DB to rebuild (repeatable). Defaults to the active shift DB.")
+    parser.add_argument("--all-shifts", action="store_true", help="Rebuild every DB under --shifts-dir, including archived shifts")
+    parser.add_argument("--shifts-dir", default="data/shifts", help="Directory holding per-shift DB files")
+    args = parser.parse_args()
+
+    paths = list(args.db)
+    if args.all_shifts:
+        paths.extend(str(path) for path in sorted(Path(args.shifts_dir).glob("*.db")))
+    if not paths:
+        paths.append(active_db_path())
+
+    for path in paths:
+        phases = rebuild(path)
+        print(f"Rebuilt {path}: {phases} phase durations")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Long-term analytics store consolidated from archived shift databases.
+
+Each archived ``clinic_shift_*_ended_*.db`` is copied into one warehouse
+DB that uses the regular shift schema, so ``MetricsQueries`` runs across
+weeks of shifts against a single file. Rooms are matched by name (room
+ids restart in every shift file); visits and history rows are renumbered
+and tagged with the shift they came from. Re-ingesting a shift replaces
+its partition, and unchanged files are skipped.
+"""
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from database.db import Database
+from database.metrics_aggregates import record_visit_phases
+from database.metrics_queries import MetricsQueries
+from database.metrics_sketches import rebuild_phase_sketches
+
+
+DEFAULT_WAREHOUSE_PATH = "data/analytics.db"
+DEFAULT_SHIFTS_DIR = "data/shifts"
+ARCHIVE_GLOB = "clinic_shift_*_ended_*.db"
+
+PARTITIONED_TABLES = ("visits", "room_status_history")
+
+WAREHOUSE_DDL = """
+CREATE TABLE IF NOT EXISTS ingested_shifts (
+    shift_id TEXT PRIMARY KEY,
+    source_path TEXT NOT NULL,
+    source_size INTEGER NOT NULL,
+    source_mtime_ns INTEGER NOT NULL,
+    visit_count INTEGER NOT NULL,
+    event_count INTEGER NOT NULL,
+    first_event TEXT,
+    last_event TEXT,
+    ingested_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_visits_shift ON visits (shift_id);
+CREATE INDEX IF NOT EXISTS idx_room_status_history_shift ON room_status_history (shift_id);
+"""
+
+
+@dataclass
+class IngestResult:
+    shift_id: str
+    source_path: Path
+    ingested: bool
+    visits: int = 0
+    events: int = 0
+
+
+def shift_id_for(path) -> str:
+    """clinic_shift_20240101_080000_ended_20240101_170000.db -> clinic_shift_20240101_080000"""
+    return Path(path).stem.partition("_ended_")[0]
+
+
+class AnalyticsWarehouse:
+    def __init__(self, db_path=DEFAULT_WAREHOUSE_PATH, shifts_dir=DEFAULT_SHIFTS_DIR):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.shifts_dir = Path(shifts_dir)
+        self.db = Database(self.db_path)
+        self._ensure_warehouse_schema()
+
+    def close(self):
+        self.db.close()
+
+    def metrics(self):
+        """MetricsQueries over every ingested shift."""
+        return MetricsQueries(self.db)
+
+    def shifts(self):
+        return self.db.fetch_all("SELECT * FROM ingested_shifts ORDER BY shift_id")
+
+    # ---------------------------
+    # Schema
+    # ---------------------------
+    def _ensure_warehouse_schema(self):
+        conn = self.db.conn
+        for table in PARTITIONED_TABLES:
+            columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if "shift_id" not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN shift_id TEXT")
+        conn.executescript(WAREHOUSE_DDL)
+        conn.commit()
+
+    # ---------------------------
+    # Ingestion
+    # ---------------------------
+    def archived_files(self):
+        return sorted(self.shifts_dir.glob(ARCHIVE_GLOB))
+
+    def ingest(self, paths=None, force=False):
+        """
+        Ingests every archived shift file (or the given paths) that is new
+        or changed since its last ingest. Returns one IngestResult per file.
+        """
+        paths = self.archived_files() if paths is None else [Path(path) for path in paths]
+        return [self.ingest_file(path, force=force) for path in paths]
+
+    def ingest_file(self, path, force=False):
+        path = Path(path)
+        shift_id = shift_id_for(path)
+        stat = os.stat(path)
+
+        previous = self.db.conn.execute(
+            "SELECT source_size, source_mtime_ns FROM ingested_shifts WHERE shift_id = ?",
+            (shift_id,),
+        ).fetchone()
+        if (
+            not force
+            and previous is not None
+            and (previous["source_size"], previous["source_mtime_ns"]) == (stat.st_size, stat.st_mtime_ns)
+        ):
+            return IngestResult(shift_id, path, ingested=False)
+
+        # Read-only Database: archives older than the epoch-ms schema are
+        # read through its compatibility views.
+        source_db = Database(path, read_only=True)
+        source = source_db.conn
+        conn = self.db.conn
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._drop_partition(shift_id)
+                visits, events = self._copy_shift(source, shift_id)
+                conn.execute(
+                    """
+                    INSERT INTO ingested_shifts
+                        (shift_id, source_path, source_size, source_mtime_ns,
+                         visit_count, event_count, first_event, last_event)
+                    SELECT ?, ?, ?, ?, ?, ?,
+                           strftime('%Y-%m-%d %H:%M:%S', MIN(timestamp_ms) / 1000, 'unixepoch', 'localtime'),
+                           strftime('%Y-%m-%d %H:%M:%S', MAX(timestamp_ms) / 1000, 'unixepoch', 'localtime')
+                    FROM room_status_history WHERE shift_id = ?
+                    """,
+                    (shift_id, str(path), stat.st_size, stat.st_mtime_ns, visits, events, shift_id),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        finally:
+            source_db.close()
+
+        return IngestResult(shift_id, path, ingested=True, visits=visits, events=events)
+
+    def _drop_partition(self, shift_id):
+        conn = self.db.conn
+        buckets = [
+            row[0]
+            for row in conn.execute(
+                """
+                SELECT DISTINCT d.hour_bucket
+                FROM visit_phase_durations d
+                JOIN visits v ON v.id = d.visit_id
+                WHERE v.shift_id = ?
+                """,
+                (shift_id,),
+            )
+        ]
+
+        room_ids = [
+            row[0]
+            for row in conn.execute("SELECT DISTINCT room_id FROM visits WHERE shift_id = ?", (shift_id,))
+        ]
+
+        conn.execute(
+            "DELETE FROM visit_phase_durations WHERE visit_id IN (SELECT id FROM visits WHERE shift_id = ?)",
+            (shift_id,),
+        )
+        for table in PARTITIONED_TABLES:
+            conn.execute(f"DELETE FROM {table} WHERE shift_id = ?", (shift_id,))
+        conn.execute("DELETE FROM ingested_shifts WHERE shift_id = ?", (shift_id,))
+
+        # Aggregates are sums; re-derive the touched buckets from the ledger.
+        for bucket in buckets:
+            conn.execute("DELETE FROM phase_aggregates WHERE hour_bucket = ?", (bucket,))
+            conn.execute(
+                """
+                INSERT INTO phase_aggregates
+                    (phase, hour_bucket, room_id, total_seconds, sample_count, min_seconds, max_seconds)
+                SELECT phase, hour_bucket, room_id, SUM(seconds), COUNT(*), MIN(seconds), MAX(seconds)
+                FROM visit_phase_durations
+                WHERE hour_bucket = ?
+                GROUP BY phase, hour_bucket, room_id
+                """,
+                (bucket,),
+            )
+        rebuild_phase_sketches(conn, room_ids)
+
+    def _copy_shift(self, source, shift_id):
+        cursor = self.db.conn.cursor()
+
+        room_map = {}
+        for room in source.execute("SELECT id, name, status FROM rooms ORDER BY id"):
+            cursor.execute(
+                """
+                INSERT INTO rooms (name, status) VALUES (?, ?)
+                ON CONFLICT (name) DO UPDATE SET status = excluded.status
+                """,
+                (room["name"], room["status"]),
+            )
+            room_map[room["id"]] = cursor.execute(
+                "SELECT id FROM rooms WHERE name = ?", (room["name"],)
+            ).fetchone()[0]
+
+        # A visit still open when the shift ended is closed at the shift's
+        # last event; left open, its window would take in the same room's
+        # history from every later shift.
+        last_event_ms = source.execute("SELECT MAX(timestamp_ms) FROM room_status_history").fetchone()[0]
+
+        visit_ids = []
+        for visit in source.execute("SELECT room_id, start_ms, end_ms FROM visits ORDER BY id"):
+            room_id = room_map.get(visit["room_id"])
+            if room_id is None:
+                continue
+            end_ms = visit["end_ms"]
+            if end_ms is None:
+                end_ms = max(last_event_ms or visit["start_ms"], visit["start_ms"])
+            cursor.execute(
+                "INSERT INTO visits (room_id, start_ms, end_ms, shift_id) VALUES (?, ?, ?, ?)",
+                (room_id, visit["start_ms"], end_ms, shift_id),
+            )
+            visit_ids.append(cursor.lastrowid)
+
+        history = (
+            (room_map[row["room_id"]], row["old_status"], row["new_status"], row["source"], row["timestamp_ms"], shift_id)
+            for row in source.execute(
+                "SELECT room_id, old_status, new_status, source, timestamp_ms FROM room_status_history ORDER BY id"
+            )
+            if row["room_id"] in room_map
+        )
+        cursor.executemany(
+            """
+            INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp_ms, shift_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            history,
+        )
+        events = cursor.execute(
+            "SELECT COUNT(*) FROM room_status_history WHERE shift_id = ?", (shift_id,)
+        ).fetchone()[0]
+
+        for visit_id in visit_ids:
+            record_visit_phases(cursor, visit_id)
+
+        return len(visit_ids), events
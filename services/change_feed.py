@@ -0,0 +1,115 @@
+"""
+In-process feed of committed room status changes.
+
+Writers publish after their transaction commits and every change gets the
+next sequence number. Readers ask for everything after the last number
+they saw, blocking (``since``) or awaiting (``since_async``) until there
+is something new. Recent changes are kept in a bounded ring, so a
+subscriber that reconnects with its last id (SSE ``Last-Event-ID``)
+misses nothing; one that fell further behind gets None and must re-read
+the rooms instead.
+
+A change is a room's new status. It carries the room's name when the
+room is new to the reader or was renamed, and a status of None when the
+room was removed.
+"""
+
+import asyncio
+import itertools
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+
+FEED_HISTORY = 4096
+
+
+@dataclass(frozen=True)
+class RoomChange:
+    seq: int
+    room_id: int
+    status: str
+    name: str = None
+
+    def to_dict(self):
+        change = {"seq": self.seq, "room_id": self.room_id, "status": self.status}
+        if self.name is not None:
+            change["name"] = self.name
+        return change
+
+
+class ChangeFeed:
+    def __init__(self, max_history=FEED_HISTORY):
+        self._cond = threading.Condition()
+        self._changes = deque(maxlen=max_history)
+        self._seq = 0
+        # (loop, future) per awaiting asyncio subscriber; resolved on publish.
+        self._async_waiters = []
+
+    @property
+    def latest_seq(self):
+        with self._cond:
+            return self._seq
+
+    def publish(self, changes):
+        """Appends (room_id, status[, name]) tuples in order and wakes every subscriber."""
+        with self._cond:
+            published = []
+            for room_id, status, *name in changes:
+                self._seq += 1
+                change = RoomChange(self._seq, room_id, status, *name)
+                self._changes.append(change)
+                published.append(change)
+            if not published:
+                return published
+
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+        return published
+
+    def since(self, seq, timeout=None):
+        """
+        Changes after seq, waiting up to timeout seconds for the first one.
+        Returns [] on timeout and None when seq is no longer covered by
+        the kept history (or is from before a restart).
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != seq, timeout)
+            return self._collect(seq)
+
+    async def since_async(self, seq, timeout=None):
+        """since() for asyncio callers; waiting costs a future, not a thread."""
+        with self._cond:
+            if self._seq != seq:
+                return self._collect(seq)
+            future = asyncio.get_running_loop().create_future()
+            self._async_waiters.append((asyncio.get_running_loop(), future))
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                self._async_waiters = [entry for entry in self._async_waiters if entry[1] is not future]
+
+        with self._cond:
+            return self._collect(seq)
+
+    def _collect(self, seq):
+        if seq > self._seq:
+            return None
+        if seq == self._seq:
+            return []
+        first = self._changes[0].seq
+        if seq < first - 1:
+            return None
+        return list(itertools.islice(self._changes, seq - first + 1, None))
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
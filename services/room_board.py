@@ -0,0 +1,144 @@
+"""
+Shared live room board for the QR server.
+
+RoomBoard is a ChangeFeed that also keeps the current name and status of
+every room in memory, so any number of board viewers are served a
+snapshot and then deltas without touching SQLite. Changes published by
+the server's writer are folded into the board as they commit. One
+watcher thread covers everything else, e.g. the desktop app or a shift
+rotation: it checks the active DB's data version once per interval, and
+only when that moved does it re-read the rooms and publish the
+difference. Changes that would not alter the board are dropped, so a
+transition seen by both paths goes out once.
+"""
+
+import threading
+
+from database.db import ConnectionPool, data_version
+from services.change_feed import FEED_HISTORY, ChangeFeed
+
+
+BOARD_POLL_SECONDS = 1.0
+
+
+class RoomBoard(ChangeFeed):
+    def __init__(self, db_path_resolver, poll_seconds=BOARD_POLL_SECONDS, max_history=FEED_HISTORY):
+        super().__init__(max_history)
+        self.db_path_resolver = db_path_resolver
+        self.poll_seconds = poll_seconds
+
+        # Serializes publish() and sync() so a stale re-read never
+        # overwrites a transition committed while it ran.
+        self._state_lock = threading.RLock()
+        # room_id -> (name, status); None until first loaded.
+        self._rooms = None
+        # (db path, data version) the rooms were last read at. data_version
+        # is only comparable on one connection, hence the private pool.
+        self._source = None
+        self._pool = ConnectionPool(max_idle=1)
+
+        self._lifecycle_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+    def start(self):
+        with self._lifecycle_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._watch, args=(self._stop,), name="room-board-watcher", daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        with self._lifecycle_lock:
+            thread = self._thread
+            self._thread = None
+            self._stop.set()
+        if thread is not None:
+            thread.join(timeout)
+        with self._state_lock:
+            self._source = None
+            self._pool.close_all()
+
+    def _watch(self, stop):
+        while not stop.is_set():
+            try:
+                self.sync()
+            except Exception:
+                # e.g. the shift file is mid-rotation; the next pass retries.
+                pass
+            stop.wait(self.poll_seconds)
+
+    # ---------------------------
+    # Board state
+    # ---------------------------
+    def snapshot(self):
+        """(seq, rooms) where rooms is every room as a compact dict, sorted by name."""
+        if self._source is None:
+            # Not loaded yet, or stopped since: read before serving.
+            self.sync()
+        with self._cond:
+            rooms = [
+                {"room_id": room_id, "name": name, "status": status}
+                for room_id, (name, status) in self._rooms.items()
+            ]
+            seq = self._seq
+        rooms.sort(key=lambda room: (room["name"] or "", room["room_id"]))
+        return seq, rooms
+
+    def sync(self):
+        """
+        Re-reads the rooms when the active DB moved since the last read and
+        publishes what differs. Costs one PRAGMA read when nothing changed.
+        """
+        with self._state_lock:
+            db_path = str(self.db_path_resolver())
+            with self._pool.connection(db_path) as db:
+                source = (db_path, data_version(db.conn))
+                if source == self._source:
+                    return []
+                rows = db.fetch_all("SELECT id, name, status FROM rooms")
+            self._source = source
+
+            if self._rooms is None:
+                with self._cond:
+                    self._rooms = {row["id"]: (row["name"], row["status"]) for row in rows}
+                return []
+
+            latest = {row["id"] for row in rows}
+            changes = [(row["id"], row["status"], row["name"]) for row in rows]
+            changes.extend((room_id, None) for room_id in self._rooms if room_id not in latest)
+            return self.publish(changes)
+
+    def publish(self, changes):
+        with self._state_lock, self._cond:
+            if self._rooms is None:
+                return super().publish(changes)
+            return super().publish(self._fold(changes))
+
+    def _fold(self, changes):
+        """Applies changes to the board; returns only those that altered it."""
+        effective = []
+        for room_id, status, *name in changes:
+            current = self._rooms.get(room_id)
+            if status is None:
+                if current is not None:
+                    del self._rooms[room_id]
+                    effective.append((room_id, None))
+                continue
+
+            name = name[0] if name else (current[0] if current else None)
+            if current == (name, status):
+                continue
+
+            self._rooms[room_id] = (name, status)
+            if current is None or current[0] != name:
+                effective.append((room_id, status, name))
+            else:
+                effective.append((room_id, status))
+        return effective
@@ -1,30 +1,103 @@
+import os
+import threading
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 
 
+DEFAULT_ACTIVE_FILE = "data/active_shift.txt"
+
+
 @dataclass
 class ShiftInfo:
     start_time: datetime
     db_path: Path
 
 
+class ActiveShiftResolver:
+    """
+    Cached view of the active shift pointer file.
+
+    The pointer is only re-read when its stat signature (mtime, size,
+    inode) changes, so a lookup costs a single stat() call while a shift
+    rotation by any process is still picked up on the next lookup.
+    """
+
+    def __init__(self, active_file=DEFAULT_ACTIVE_FILE):
+        self.active_file = Path(active_file)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._db_path = None
+        self._loaded = False
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.active_file)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def get_active_db_path(self):
+        signature = self._stat_signature()
+
+        with self._lock:
+            if self._loaded and signature == self._signature:
+                return self._db_path
+
+            db_path = None
+            if signature is not None:
+                try:
+                    raw = self.active_file.read_text(encoding="utf-8").strip()
+                except FileNotFoundError:
+                    raw = ""
+                    signature = None
+                if raw:
+                    db_path = Path(raw)
+
+            self._signature = signature
+            self._db_path = db_path
+            self._loaded = True
+            return db_path
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+
+_resolvers = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_active_shift_resolver(active_file=DEFAULT_ACTIVE_FILE):
+    """Returns the process-wide resolver for a pointer file."""
+    key = os.path.abspath(active_file)
+    with _resolvers_lock:
+        resolver = _resolvers.get(key)
+        if resolver is None:
+            resolver = ActiveShiftResolver(active_file)
+            _resolvers[key] = resolver
+        return resolver
+
+
+def active_db_path(default="clinic.db"):
+    """Active shift DB path as a string, or ``default`` when no shift is running."""
+    active = get_active_shift_resolver().get_active_db_path()
+    return str(active) if active else default
+
+
 class ShiftService:
     """Manage per-shift SQLite database files."""
 
-    def __init__(self, base_dir="data/shifts", active_file="data/active_shift.txt"):
+    def __init__(self, base_dir="data/shifts", active_file=DEFAULT_ACTIVE_FILE):
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(parents=True, exist_ok=True)
 
         self.active_file = Path(active_file)
         self.active_file.parent.mkdir(parents=True, exist_ok=True)
+        self.resolver = get_active_shift_resolver(active_file)
 
     def get_active_db_path(self):
-        if self.active_file.exists():
-            raw = self.active_file.read_text(encoding="utf-8").strip()
-            if raw:
-                return Path(raw)
-        return None
+        return self.resolver.get_active_db_path()
 
     def start_shift(self):
         active = self.get_active_db_path()
@@ -34,6 +107,7 @@ class ShiftService:
         now = datetime.now()
         db_path = self.base_dir / f"clinic_shift_{now.strftime('%Y%m%d_%H%M%S')}.db"
         self.active_file.write_text(str(db_path), encoding="utf-8")
+        self.resolver.invalidate()
         return db_path, True
 
     def end_shift(self):
@@ -51,5 +125,6 @@ class ShiftService:
 
         if self.active_file.exists():
             self.active_file.unlink()
+        self.resolver.invalidate()
 
         return active, archived, True
\ No newline at end of file
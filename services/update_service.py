@@ -0,0 +1,185 @@
+"""
+Single-writer queue for room status updates.
+
+Callers from any thread submit transitions and get a Future back. One
+writer thread drains the queue in submission order, applies a burst of
+transitions with one ``update_status_many`` call and commits once. A
+rejected transition is reported to its own caller without sinking its
+neighbours. Per-room ordering follows from the single FIFO writer.
+Applied transitions are published to an optional ChangeFeed once the
+commit has landed.
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from controllers.room_controller import RoomController
+from database.db import ConnectionPool
+from models.enums import RoomStatus, UpdateSource
+from services.shift_service import active_db_path
+
+
+MAX_BATCH_SIZE = 64
+# How long the writer lingers for more work once a burst has started.
+BATCH_WAIT_SECONDS = 0.005
+
+_STOP = object()
+
+
+@dataclass
+class StatusUpdate:
+    room_id: int
+    new_status: RoomStatus
+    source: UpdateSource = UpdateSource.MANUAL
+    future: Future = field(default_factory=Future)
+
+
+@dataclass
+class StatusBatch:
+    """Several transitions submitted together; resolves to per-item outcomes."""
+
+    updates: list
+    future: Future = field(default_factory=Future)
+
+
+class UpdateQueue:
+    def __init__(
+        self,
+        db_path_resolver=active_db_path,
+        max_batch_size=MAX_BATCH_SIZE,
+        batch_wait_seconds=BATCH_WAIT_SECONDS,
+        change_feed=None,
+    ):
+        self.db_path_resolver = db_path_resolver
+        self.max_batch_size = max_batch_size
+        self.batch_wait_seconds = batch_wait_seconds
+        self.change_feed = change_feed
+
+        self._queue = queue.Queue()
+        self._pool = ConnectionPool(max_idle=1)
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.batches_committed = 0
+        self.updates_applied = 0
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="room-update-writer", daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        self._pool.close_all()
+
+    # ---------------------------
+    # Submission
+    # ---------------------------
+    def submit(self, room_id: int, new_status: RoomStatus, source: UpdateSource = UpdateSource.MANUAL):
+        update = StatusUpdate(room_id, new_status, source)
+        self._queue.put(update)
+        return update.future
+
+    def update_status(self, room_id: int, new_status: RoomStatus, source: UpdateSource = UpdateSource.MANUAL, timeout=None):
+        """Blocking convenience wrapper: waits for the group commit."""
+        self.start()
+        return self.submit(room_id, new_status, source).result(timeout)
+
+    def submit_many(self, updates):
+        """Queues (room_id, status, source) tuples to land in one transaction."""
+        batch = StatusBatch([tuple(update) for update in updates])
+        self._queue.put(batch)
+        return batch.future
+
+    def update_status_many(self, updates, timeout=None):
+        """Blocking wrapper around submit_many; returns the outcome dicts."""
+        self.start()
+        return self.submit_many(updates).result(timeout)
+
+    # ---------------------------
+    # Writer
+    # ---------------------------
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+
+        batch = [first]
+        while len(batch) < self.max_batch_size:
+            try:
+                item = self._queue.get(timeout=self.batch_wait_seconds)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Finish this batch, then stop on the next read.
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._apply_batch(batch)
+
+    def _apply_batch(self, batch):
+        updates = []
+        for entry in batch:
+            if isinstance(entry, StatusBatch):
+                updates.extend(entry.updates)
+            else:
+                updates.append((entry.room_id, entry.new_status, entry.source))
+
+        try:
+            with self._pool.connection(self.db_path_resolver()) as db:
+                conn = db.conn
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    outcomes = RoomController(db).update_status_many(updates, commit=False)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        except Exception as exc:
+            for entry in batch:
+                if not entry.future.done():
+                    entry.future.set_exception(exc)
+            return
+
+        self.batches_committed += 1
+        self.updates_applied += sum(1 for outcome in outcomes if outcome["ok"])
+        if self.change_feed is not None:
+            self.change_feed.publish(
+                (outcome["room_id"], outcome["new_status"]) for outcome in outcomes if outcome["ok"]
+            )
+
+        position = 0
+        for entry in batch:
+            if isinstance(entry, StatusBatch):
+                count = len(entry.updates)
+                entry.future.set_result(outcomes[position:position + count])
+                position += count
+                continue
+
+            outcome = outcomes[position]
+            position += 1
+            if outcome["ok"]:
+                entry.future.set_result(None)
+            else:
+                entry.future.set_exception(ValueError(outcome["error"]))
@@ -0,0 +1,39 @@
+"""
+Signatures for QR server URLs.
+
+Every link the server hands out (room forms, the change feed, the room
+board) carries an HMAC of its scope and role under ``NEXUS_QR_SECRET``.
+Kept apart from the server so subscribers such as the desktop app can
+build a feed URL without importing the server and its shared state.
+"""
+
+import hashlib
+import hmac
+import os
+
+
+SECRET = os.getenv("NEXUS_QR_SECRET", "change-me")
+
+# /events and /board are signed like the forms, under their own scope and role.
+FEED_SCOPE = "feed"
+FEED_ROLE = "viewer"
+
+
+def sign(scope: str, role: str) -> str:
+    payload = f"{scope}:{role.lower()}".encode("utf-8")
+    return hmac.new(SECRET.encode("utf-8"), payload, hashlib.sha256).hexdigest()
+
+
+def verify(scope: str, role: str, signature: str) -> bool:
+    expected = sign(scope, role)
+    return hmac.compare_digest(expected, signature)
+
+
+def create_feed_url(base_url: str) -> str:
+    sig = sign(FEED_SCOPE, FEED_ROLE)
+    return f"{base_url.rstrip('/')}/events?sig={sig}"
+
+
+def create_board_url(base_url: str) -> str:
+    sig = sign(FEED_SCOPE, FEED_ROLE)
+    return f"{base_url.rstrip('/')}/board?sig={sig}"
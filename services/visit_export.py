@@ -0,0 +1,273 @@
+"""
+Columnar export of per-visit phase timelines.
+
+One row per visit: shift, visit and room, the first time each tracked
+status was entered, and every phase duration. Rows are read from one or
+more shift DBs (or the analytics warehouse) in chunks with ``fetchmany``
+and handed to a writer chunk by chunk, so memory stays bounded by the
+chunk size however many shifts are exported.
+
+Formats: Parquet or Arrow IPC when pyarrow is installed, NumPy ``.npz``
+when only numpy is, and CSV as the last resort.
+"""
+
+import csv
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from database.db import Database
+from database.metrics_queries import PHASE_STATUSES, VISIT_PHASES, visit_phase_query
+from services.analytics_warehouse import shift_id_for
+from utils.time_utils import from_epoch_ms, to_epoch_ms
+
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+TIMESTAMP_COLUMNS = ("start_time", "end_time") + tuple(f"{status}_at" for status in PHASE_STATUSES)
+# Exported timestamp column -> epoch-ms column of the timeline query.
+TIMESTAMP_SOURCES = {
+    "start_time": "start_ms",
+    "end_time": "end_ms",
+    **{f"{status}_at": f"{status}_at_ms" for status in PHASE_STATUSES},
+}
+DURATION_COLUMNS = tuple(f"{phase}_seconds" for phase in VISIT_PHASES)
+ID_COLUMNS = ("visit_id", "room_id")
+LABEL_COLUMNS = ("shift", "room_name")
+COLUMNS = ("shift", "visit_id", "room_id", "room_name") + TIMESTAMP_COLUMNS + DURATION_COLUMNS
+
+FORMAT_SUFFIXES = {"parquet": ".parquet", "arrow": ".arrow", "npz": ".npz", "csv": ".csv"}
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def iter_visit_timeline_chunks(db_paths, start=None, end=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields dicts of column lists, at most chunk_size rows each. The shift
+    column comes from visits.shift_id in the warehouse, otherwise from the
+    shift file name.
+    """
+    for db_path in db_paths:
+        db = Database(db_path, read_only=True)
+        try:
+            visit_columns = {row["name"] for row in db.conn.execute("PRAGMA table_info(visits)")}
+            extra_columns = ("shift_id",) if "shift_id" in visit_columns else ()
+            room_names = {row["id"]: row["name"] for row in db.conn.execute("SELECT id, name FROM rooms")}
+            file_shift = shift_id_for(db_path)
+
+            clauses = []
+            params = []
+            if start:
+                clauses.append("v.start_ms >= ?")
+                params.append(to_epoch_ms(start))
+            if end:
+                clauses.append("v.start_ms < ?")
+                params.append(to_epoch_ms(end))
+            where = "WHERE " + " AND ".join(clauses) if clauses else ""
+
+            query, params = visit_phase_query(where, params, extra_columns=extra_columns)
+            cursor = db.conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+
+                chunk = {column: [] for column in COLUMNS}
+                for row in rows:
+                    chunk["shift"].append(row["shift_id"] if extra_columns else file_shift)
+                    chunk["visit_id"].append(row["visit_id"])
+                    chunk["room_id"].append(row["room_id"])
+                    chunk["room_name"].append(room_names.get(row["room_id"]))
+                    for column in TIMESTAMP_COLUMNS:
+                        chunk[column].append(from_epoch_ms(row[TIMESTAMP_SOURCES[column]]))
+                    for column in DURATION_COLUMNS:
+                        value = row[column]
+                        chunk[column].append(None if value is None else float(value))
+                yield chunk
+        finally:
+            db.close()
+
+
+# ---------------------------
+# Writers
+# ---------------------------
+class _ArrowWriter:
+    def __init__(self, path, fmt):
+        import pyarrow as pa
+
+        self.pa = pa
+        # Plain strings: Parquet dictionary-encodes them per row group, and
+        # IPC files cannot change a dictionary between batches.
+        fields = [pa.field("shift", pa.string())]
+        fields += [pa.field(column, pa.int64()) for column in ID_COLUMNS]
+        fields += [pa.field("room_name", pa.string())]
+        fields += [pa.field(column, pa.timestamp("us")) for column in TIMESTAMP_COLUMNS]
+        fields += [pa.field(column, pa.float64()) for column in DURATION_COLUMNS]
+        self.schema = pa.schema(fields)
+
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(str(path), self.schema)
+        else:
+            self._sink = pa.OSFile(str(path), "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write(self, chunk):
+        arrays = [self.pa.array(chunk[field.name], type=field.type) for field in self.schema]
+        batch = self.pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        self._writer.write_batch(batch)
+
+    def close(self):
+        self._writer.close()
+        sink = getattr(self, "_sink", None)
+        if sink is not None:
+            sink.close()
+
+
+class _NpzWriter:
+    """
+    Streams each column to a temporary file as raw array bytes, then
+    assembles the .npz members once the final length is known. Label
+    columns are stored as int32 codes plus a ``<column>_labels`` array.
+    """
+
+    def __init__(self, path):
+        import numpy as np
+
+        self.np = np
+        self.path = Path(path)
+        self.rows = 0
+        self.dtypes = {column: np.dtype("int32") for column in LABEL_COLUMNS}
+        self.dtypes.update({column: np.dtype("int64") for column in ID_COLUMNS})
+        self.dtypes.update({column: np.dtype("datetime64[us]") for column in TIMESTAMP_COLUMNS})
+        self.dtypes.update({column: np.dtype("float64") for column in DURATION_COLUMNS})
+        self.labels = {column: {} for column in LABEL_COLUMNS}
+
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._spools = {
+            column: open(Path(self._tmpdir.name) / column, "wb") for column in COLUMNS
+        }
+
+    def _column_array(self, column, values):
+        np = self.np
+        if column in LABEL_COLUMNS:
+            codes = self.labels[column]
+            return np.array(
+                [codes.setdefault("" if value is None else value, len(codes)) for value in values],
+                dtype=self.dtypes[column],
+            )
+        if column in TIMESTAMP_COLUMNS:
+            micros = [
+                np.iinfo(np.int64).min if value is None else (value - _EPOCH) // timedelta(microseconds=1)
+                for value in values
+            ]
+            return np.array(micros, dtype=np.int64).view(self.dtypes[column])
+        if column in DURATION_COLUMNS:
+            return np.array([np.nan if value is None else value for value in values], dtype=self.dtypes[column])
+        return np.array(values, dtype=self.dtypes[column])
+
+    def write(self, chunk):
+        for column in COLUMNS:
+            self._spools[column].write(self._column_array(column, chunk[column]).tobytes())
+        self.rows += len(chunk["visit_id"])
+
+    def close(self):
+        np = self.np
+        fmt = np.lib.format
+        try:
+            with zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+                for column in COLUMNS:
+                    self._spools[column].close()
+                    header = {
+                        "descr": fmt.dtype_to_descr(self.dtypes[column]),
+                        "fortran_order": False,
+                        "shape": (self.rows,),
+                    }
+                    with archive.open(f"{column}.npy", "w", force_zip64=True) as member:
+                        fmt.write_array_header_2_0(member, header)
+                        with open(Path(self._tmpdir.name) / column, "rb") as spool:
+                            shutil.copyfileobj(spool, member)
+
+                for column, codes in self.labels.items():
+                    labels = np.array(sorted(codes, key=codes.get), dtype=str)
+                    with archive.open(f"{column}_labels.npy", "w", force_zip64=True) as member:
+                        fmt.write_array(member, labels)
+        finally:
+            for spool in self._spools.values():
+                spool.close()
+            self._tmpdir.cleanup()
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+
+    def write(self, chunk):
+        columns = [chunk[column] for column in COLUMNS]
+        self._writer.writerows(
+            ["" if value is None else value.isoformat(sep=" ") if isinstance(value, datetime) else value for value in row]
+            for row in zip(*columns)
+        )
+
+    def close(self):
+        self._file.close()
+
+
+def _available_format(requested):
+    """Returns the requested format, or the best one the installed packages allow."""
+    try:
+        import pyarrow  # noqa: F401
+        has_arrow = True
+    except ImportError:
+        has_arrow = False
+    try:
+        import numpy  # noqa: F401
+        has_numpy = True
+    except ImportError:
+        has_numpy = False
+
+    if requested in ("parquet", "arrow") and has_arrow:
+        return requested
+    if requested in ("parquet", "arrow", "npz") and has_numpy:
+        return "npz"
+    if requested == "auto":
+        if has_arrow:
+            return "parquet"
+        if has_numpy:
+            return "npz"
+    return "csv"
+
+
+def export_visit_timelines(db_paths, out_path, fmt="auto", start=None, end=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Writes the per-visit timeline of every DB in db_paths to out_path.
+    When the requested format's library is missing the next available
+    format is used and the suffix adjusted. Returns (path, format, rows).
+    """
+    fmt = _available_format(fmt)
+    out_path = Path(out_path)
+    if out_path.suffix != FORMAT_SUFFIXES[fmt]:
+        out_path = out_path.with_suffix(FORMAT_SUFFIXES[fmt])
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if fmt in ("parquet", "arrow"):
+        writer = _ArrowWriter(out_path, fmt)
+    elif fmt == "npz":
+        writer = _NpzWriter(out_path)
+    else:
+        writer = _CsvWriter(out_path)
+
+    rows = 0
+    try:
+        for chunk in iter_visit_timeline_chunks(db_paths, start, end, chunk_size):
+            writer.write(chunk)
+            rows += len(chunk["visit_id"])
+    finally:
+        writer.close()
+
+    return out_path, fmt, rows
@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import controllers.room_controller as room_controller_module
+from utils.time_utils import to_epoch_ms
+
+
+class _Clock:
+    def __init__(self, start):
+        self.current = start
+
+    def now(self):
+        return self.current
+
+    def advance(self, seconds):
+        self.current += timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time for status updates; starts at 2026-01-01 08:00 local."""
+    clock = _Clock(datetime(2026, 1, 1, 8, 0, 0))
+    monkeypatch.setattr(room_controller_module, "next_stamp_ms", lambda: to_epoch_ms(clock.now()))
+    return clock
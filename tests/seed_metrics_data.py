@@ -13,7 +13,9 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 
 from database.db import Database
+from database.metrics_aggregates import rebuild_phase_aggregates
 from models.enums import RoomStatus, UpdateSource
+from utils.time_utils import to_epoch_ms
 
 @dataclass
 class SeedConfig:
@@ -27,19 +29,11 @@ class SeedConfig:
 
 
 def _insert_transition(db: Database, room_id: int, old: RoomStatus, new: RoomStatus, ts: datetime):
-    payload = (room_id, old.value, new.value, UpdateSource.MANUAL.value, ts.isoformat(sep=" "))
+    payload = (room_id, old.value, new.value, UpdateSource.MANUAL.value, to_epoch_ms(ts))
 
     db.execute(
         """
-        INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp)
-        VALUES (?, ?, ?, ?, ?)
-        """,
-        payload,
-    )
-
-    db.execute(
-        """
-        INSERT INTO room_events (room_id, old_status, new_status, source, timestamp)
+        INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp_ms)
         VALUES (?, ?, ?, ?, ?)
         """,
         payload,
@@ -59,8 +53,8 @@ def _insert_completed_visit(db: Database, room_id: int, start_ts: datetime):
     available_ts = cleaning_ts + timedelta(seconds=cleaning_s)
 
     db.execute(
-        "INSERT INTO visits (room_id, start_time, end_time) VALUES (?, ?, ?)",
-        (room_id, waiting_ts.isoformat(sep=" "), available_ts.isoformat(sep=" ")),
+        "INSERT INTO visits (room_id, start_ms, end_ms) VALUES (?, ?, ?)",
+        (room_id, to_epoch_ms(waiting_ts), to_epoch_ms(available_ts)),
     )
 
     _insert_transition(db, room_id, RoomStatus.AVAILABLE, RoomStatus.WAITING, waiting_ts)
@@ -87,8 +81,8 @@ def _insert_stuck_visit(db: Database, room_id: int, start_ts: datetime):
         needs_cleaning_ts = now - timedelta(seconds=stuck_age_s)
 
     db.execute(
-        "INSERT INTO visits (room_id, start_time, end_time) VALUES (?, ?, NULL)",
-        (room_id, waiting_ts.isoformat(sep=" "),),
+        "INSERT INTO visits (room_id, start_ms, end_ms) VALUES (?, ?, NULL)",
+        (room_id, to_epoch_ms(waiting_ts)),
     )
 
     _insert_transition(db, room_id, RoomStatus.AVAILABLE, RoomStatus.WAITING, waiting_ts)
@@ -103,7 +97,6 @@ def seed_fake_metrics(config: SeedConfig):
     db = Database(config.db_path)
 
     if config.reset:
-        db.execute("DELETE FROM room_events")
         db.execute("DELETE FROM room_status_history")
         db.execute("DELETE FROM visits")
         db.execute("DELETE FROM rooms")
@@ -133,6 +126,10 @@ def seed_fake_metrics(config: SeedConfig):
         stuck_start = datetime.now() - timedelta(hours=random.randint(2, 8))
         _insert_stuck_visit(db, room_id, stuck_start)
 
+    # History above bypasses RoomController, so backfill the running aggregates
+    rebuild_phase_aggregates(db.conn)
+    db.conn.commit()
+
     summary = {
         "rooms": db.fetch_one("SELECT COUNT(*) FROM rooms"),
         "visits": db.fetch_one("SELECT COUNT(*) FROM visits"),
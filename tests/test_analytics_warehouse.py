@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+from controllers.room_controller import RoomController
+from database.db import Database
+from models.enums import RoomStatus
+from services.analytics_warehouse import AnalyticsWarehouse, shift_id_for
+from utils.time_utils import to_epoch_ms
+
+
+def _archive_shift(shifts_dir, clock, tag, room_names, wait_s):
+    path = shifts_dir / f"clinic_shift_{tag}_ended_{tag}.db"
+    db = Database(path)
+    controller = RoomController(db)
+    for name in room_names:
+        room_id = controller.create_room(name)
+        for status in (RoomStatus.WAITING, RoomStatus.SEEING_PROVIDER, RoomStatus.NEEDS_CLEANING):
+            controller.update_status(room_id, status)
+            clock.advance(wait_s)
+        controller.update_status(room_id, RoomStatus.CLEANING)
+        clock.advance(60)
+        controller.update_status(room_id, RoomStatus.AVAILABLE)
+    db.close()
+    return path
+
+
+def test_archived_shifts_are_ingested_incrementally_and_idempotently(tmp_path, clock):
+    shifts_dir = tmp_path / "shifts"
+    shifts_dir.mkdir()
+    first = _archive_shift(shifts_dir, clock, "20260101_080000", ["Exam 1", "Exam 2"], 300)
+    clock.advance(86400)
+    second = _archive_shift(shifts_dir, clock, "20260102_080000", ["Exam 2", "Exam 3"], 600)
+    # The active shift is not archived yet and stays out of the warehouse.
+    Database(shifts_dir / "clinic_shift_20260103_080000.db").close()
+
+    assert shift_id_for(first) == "clinic_shift_20260101_080000"
+
+    warehouse = AnalyticsWarehouse(tmp_path / "analytics.db", shifts_dir)
+    results = warehouse.ingest()
+    assert [(result.shift_id, result.ingested, result.visits) for result in results] == [
+        ("clinic_shift_20260101_080000", True, 2),
+        ("clinic_shift_20260102_080000", True, 2),
+    ]
+
+    db = warehouse.db
+    # Rooms are matched by name across shifts.
+    assert db.fetch_one("SELECT COUNT(*) FROM rooms") == 3
+    metrics = warehouse.metrics()
+    stats = metrics.aggregated_phase_stats()
+    assert stats["wait"]["count"] == 4
+    assert stats["wait"]["avg"] == pytest.approx(450)
+    assert metrics.phase_stats()["wait"]["avg"] == pytest.approx(450)
+    assert metrics.total_turnovers() == 4
+
+    day_two = metrics.aggregated_phase_stats(start="2026-01-02 00:00:00")
+    assert day_two["wait"]["count"] == 2
+
+    # Unchanged files are skipped; a forced re-ingest replaces the partition.
+    assert [result.ingested for result in warehouse.ingest()] == [False, False]
+    warehouse.ingest([second], force=True)
+    assert db.fetch_one("SELECT COUNT(*) FROM visits") == 4
+    assert warehouse.metrics().aggregated_phase_stats() == stats
+
+    # A changed archive is picked up on the next run.
+    archived = Database(first)
+    archived.execute("DELETE FROM room_status_history WHERE new_status = 'available'")
+    archived.close()
+    os.utime(first, ns=(0, os.stat(first).st_mtime_ns + 1))
+    assert [result.ingested for result in warehouse.ingest()] == [True, False]
+    assert db.fetch_one("SELECT COUNT(*) FROM room_status_history WHERE shift_id = ?", ["clinic_shift_20260101_080000"]) == 8
+    assert warehouse.metrics().aggregated_phase_stats()["cleaning"]["count"] == 2
+
+    assert [row["shift_id"] for row in warehouse.shifts()] == [
+        "clinic_shift_20260101_080000",
+        "clinic_shift_20260102_080000",
+    ]
+    warehouse.close()
+
+
+def test_open_visit_does_not_reach_into_later_shifts(tmp_path, clock):
+    shifts_dir = tmp_path / "shifts"
+    shifts_dir.mkdir()
+
+    # The shift ends with Exam 1's patient still waiting.
+    open_path = shifts_dir / "clinic_shift_20260101_080000_ended_20260101_080000.db"
+    db = Database(open_path)
+    controller = RoomController(db)
+    room_id = controller.create_room("Exam 1")
+    controller.update_status(room_id, RoomStatus.WAITING)
+    clock.advance(120)
+    controller.update_status(controller.create_room("Exam 2"), RoomStatus.OUT_OF_SERVICE)
+    last_event_ms = to_epoch_ms(clock.now())
+    db.close()
+
+    clock.advance(86400)
+    _archive_shift(shifts_dir, clock, "20260102_080000", ["Exam 1"], 300)
+
+    warehouse = AnalyticsWarehouse(tmp_path / "analytics.db", shifts_dir)
+    warehouse.ingest()
+    rows = warehouse.metrics().visit_phases()
+    assert [row["end_ms"] for row in rows][0] == last_event_ms
+    assert rows[0]["wait_seconds"] is None
+    assert rows[0]["seeing_provider_at_ms"] is None
+
+    stats = warehouse.metrics().aggregated_phase_stats()
+    assert stats["wait"]["count"] == 1
+    assert stats["wait"]["avg"] == 300
+    warehouse.close()
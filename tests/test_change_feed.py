@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+from services.change_feed import ChangeFeed
+
+
+def test_since_returns_changes_after_the_cursor_in_order():
+    feed = ChangeFeed()
+    assert feed.since(0, timeout=0) == []
+
+    feed.publish([(1, "waiting"), (2, "cleaning")])
+    feed.publish([(1, "seeing_provider")])
+
+    changes = feed.since(1, timeout=0)
+    assert [(change.seq, change.room_id, change.status) for change in changes] == [
+        (2, 2, "cleaning"),
+        (3, 1, "seeing_provider"),
+    ]
+    assert changes[-1].to_dict() == {"seq": 3, "room_id": 1, "status": "seeing_provider"}
+    assert feed.since(3, timeout=0) == []
+
+
+def test_cursors_outside_the_kept_history_need_a_resync():
+    feed = ChangeFeed(max_history=2)
+    feed.publish([(room_id, "waiting") for room_id in range(5)])
+
+    assert [change.seq for change in feed.since(3, timeout=0)] == [4, 5]
+    assert feed.since(2, timeout=0) is None
+    # e.g. a client that saw ids from before a server restart
+    assert feed.since(9, timeout=0) is None
+
+
+def test_blocking_and_async_subscribers_wake_on_publish():
+    feed = ChangeFeed()
+    received = []
+    waiter = threading.Thread(target=lambda: received.append(feed.since(0, timeout=5)))
+    waiter.start()
+
+    async def subscribe():
+        task = asyncio.create_task(feed.since_async(0, timeout=5))
+        await asyncio.sleep(0.01)
+        threading.Thread(target=feed.publish, args=([(7, "cleaning")],)).start()
+        return await task
+
+    changes = asyncio.run(subscribe())
+    waiter.join(timeout=5)
+
+    assert [change.room_id for change in changes] == [7]
+    assert [change.room_id for change in received[0]] == [7]
+
+
+def test_async_subscriber_times_out_with_no_changes():
+    feed = ChangeFeed()
+    assert asyncio.run(feed.since_async(0, timeout=0.01)) == []
+    assert feed._async_waiters == []
@@ -0,0 +1,97 @@
+import sqlite3
+import threading
+
+import pytest
+
+from database.db import ConnectionPool, Database
+
+
+def test_pool_reuses_connections_and_initializes_schema_once(tmp_path, monkeypatch):
+    calls = []
+    original = Database._initialize_schema
+
+    def counting_initialize(self):
+        calls.append(str(self.db_path))
+        original(self)
+
+    monkeypatch.setattr(Database, "_initialize_schema", counting_initialize)
+
+    pool = ConnectionPool()
+    db_path = tmp_path / "shift.db"
+
+    with pool.connection(db_path) as first:
+        first.execute("INSERT INTO rooms (name, status) VALUES ('Exam 1', 'available')")
+        assert first.fetch_one("PRAGMA journal_mode") == "wal"
+        assert first.fetch_one("PRAGMA busy_timeout") == 5000
+
+    with pool.connection(db_path) as second:
+        assert second is first
+        assert second.fetch_one("SELECT COUNT(*) FROM rooms") == 1
+
+    assert calls == [str(db_path)]
+    pool.close_all()
+
+
+def test_concurrent_threads_get_distinct_connections(tmp_path):
+    pool = ConnectionPool()
+    db_path = tmp_path / "shift.db"
+    barrier = threading.Barrier(3)
+    seen = []
+
+    def worker():
+        with pool.connection(db_path) as db:
+            seen.append(db)
+            barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(db) for db in seen}) == 3
+    pool.close_all()
+
+
+def test_rotation_retires_connections_to_previous_shift(tmp_path):
+    pool = ConnectionPool()
+    old_path = tmp_path / "old.db"
+    new_path = tmp_path / "new.db"
+
+    with pool.connection(old_path) as old_db:
+        pass
+
+    with pool.connection(old_path) as in_flight:
+        assert in_flight is old_db
+        # The shift rotates while this request is still running.
+        with pool.connection(new_path) as new_db:
+            assert new_db is not old_db
+            assert new_db.db_path == new_path
+
+    with pool.connection(new_path) as reused:
+        assert reused is new_db
+
+    # The stale connection was closed on release instead of re-pooled.
+    with pytest.raises(sqlite3.ProgrammingError):
+        old_db.conn.execute("SELECT 1")
+    pool.close_all()
+
+
+def test_data_version_moves_only_on_committed_writes(tmp_path):
+    db_path = tmp_path / "shift.db"
+    db = Database(db_path)
+    version = db.data_version()
+
+    db.fetch_all("SELECT * FROM rooms")
+    assert db.data_version() == version
+
+    db.execute("INSERT INTO rooms (name, status) VALUES ('Exam 1', 'available')")
+    assert db.data_version() != version
+    version = db.data_version()
+
+    other = Database(db_path)
+    other.execute("UPDATE rooms SET status = 'waiting'")
+    other.close()
+    assert db.data_version() != version
+
+    db.close()
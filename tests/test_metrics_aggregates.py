@@ -0,0 +1,186 @@
+from datetime import datetime
+
+from controllers.metrics_controller import MetricsController
+from controllers.room_controller import RoomController
+from database.db import Database
+from database.metrics_aggregates import rebuild_phase_aggregates
+from database.metrics_queries import MetricsQueries
+from models.enums import RoomStatus
+
+
+def _run_visit(controller, clock, room_id, wait_s, provider_s, cleaning_s):
+    controller.update_status(room_id, RoomStatus.WAITING)
+    clock.advance(wait_s)
+    controller.update_status(room_id, RoomStatus.SEEING_PROVIDER)
+    clock.advance(provider_s)
+    controller.update_status(room_id, RoomStatus.NEEDS_CLEANING)
+    clock.advance(60)
+    controller.update_status(room_id, RoomStatus.CLEANING)
+    clock.advance(cleaning_s)
+    controller.update_status(room_id, RoomStatus.AVAILABLE)
+
+
+def _aggregate_rows(db):
+    return [tuple(row) for row in db.fetch_all("SELECT * FROM phase_aggregates ORDER BY hour_bucket, phase, room_id")]
+
+
+def test_update_status_maintains_aggregates_in_step_with_raw_history(clock):
+    db = Database(":memory:")
+    controller = RoomController(db)
+    metrics = MetricsQueries(db)
+    room_a = controller.create_room("Exam A")
+    room_b = controller.create_room("Exam B")
+
+    _run_visit(controller, clock, room_a, 300, 900, 240)
+    clock.advance(3600)
+    _run_visit(controller, clock, room_b, 120, 600, 180)
+
+    aggregated = metrics.aggregated_phase_stats()
+    raw = metrics.phase_stats()
+    for phase in ("wait", "provider", "cleaning_wait", "cleaning"):
+        assert aggregated[phase]["count"] == raw[phase]["count"]
+        assert aggregated[phase]["avg"] == raw[phase]["avg"]
+        assert aggregated[phase]["min"] == raw[phase]["min"]
+        assert aggregated[phase]["max"] == raw[phase]["max"]
+
+    assert aggregated["wait"]["avg"] == 210.0
+    assert metrics.aggregated_phase_stats(by_room=True)[room_b]["provider"]["total"] == 600
+
+    summary = MetricsController(db).get_summary()
+    assert summary["avg_wait"] == "03m 30s"
+    assert summary["turnovers"] == 2
+
+    db.close()
+
+
+def test_open_visit_contributes_completed_phases_only_once(clock):
+    db = Database(":memory:")
+    controller = RoomController(db)
+    metrics = MetricsQueries(db)
+    room_id = controller.create_room("Exam A")
+
+    controller.update_status(room_id, RoomStatus.WAITING)
+    clock.advance(300)
+    controller.update_status(room_id, RoomStatus.SEEING_PROVIDER)
+    clock.advance(30)
+    # Bouncing back and forth must not re-count the already completed wait.
+    controller.update_status(room_id, RoomStatus.WAITING)
+    clock.advance(30)
+    controller.update_status(room_id, RoomStatus.SEEING_PROVIDER)
+
+    stats = metrics.aggregated_phase_stats()
+    assert stats["wait"]["count"] == 1
+    assert stats["wait"]["total"] == 300
+    assert stats["provider"]["count"] == 0
+
+    db.close()
+
+
+def test_rebuild_matches_incremental_aggregates_and_hour_filters(clock):
+    db = Database(":memory:")
+    controller = RoomController(db)
+    metrics = MetricsQueries(db)
+    room_id = controller.create_room("Exam A")
+
+    _run_visit(controller, clock, room_id, 300, 900, 240)
+    clock.current = datetime(2026, 1, 1, 14, 5, 0)
+    _run_visit(controller, clock, room_id, 600, 300, 120)
+
+    incremental = _aggregate_rows(db)
+    rebuild_phase_aggregates(db.conn)
+    db.conn.commit()
+
+    assert _aggregate_rows(db) == incremental
+    assert metrics.aggregated_phase_stats("2026-01-01 14:00:00")["wait"]["avg"] == 600.0
+    assert metrics.aggregated_phase_stats(end="2026-01-01 11:00:00")["wait"]["avg"] == 300.0
+
+    db.close()
+
+
+def test_partial_hour_bounds_select_the_same_visits_as_turnovers(clock):
+    db = Database(":memory:")
+    controller = RoomController(db)
+    metrics = MetricsQueries(db)
+    room_id = controller.create_room("Exam A")
+
+    for hour, minute, wait_s in ((8, 0, 300), (8, 40, 600), (9, 30, 120), (10, 10, 240)):
+        clock.current = datetime(2026, 1, 1, hour, minute, 0)
+        _run_visit(controller, clock, room_id, wait_s, 300, 120)
+    # Still open at the end of the range: its wait is complete, the visit is not.
+    clock.current = datetime(2026, 1, 1, 10, 50, 0)
+    controller.update_status(room_id, RoomStatus.WAITING)
+    clock.advance(60)
+    controller.update_status(room_id, RoomStatus.SEEING_PROVIDER)
+
+    # The 08:40 visit shares an hour bucket with the 08:00 one but starts after end.
+    assert metrics.aggregated_phase_stats(end="2026-01-01 08:30:00")["wait"]["avg"] == 300.0
+    assert metrics.total_turnovers(end="2026-01-01 08:30:00") == 1
+
+    ranges = [
+        (None, "2026-01-01 08:30:00"),
+        ("2026-01-01 08:30:00", "2026-01-01 10:30:00"),
+        ("2026-01-01 08:30:00", "2026-01-01 08:50:00"),
+        ("2026-01-01 09:00:00", "2026-01-01 11:00:00"),
+        ("2026-01-01 10:30:00", None),
+    ]
+    for start, end in ranges:
+        aggregated = metrics.aggregated_phase_stats(start, end)
+        raw = metrics.phase_stats(start, end)
+        for phase in ("wait", "provider", "cleaning_wait", "cleaning"):
+            for key in ("count", "avg", "min", "max"):
+                assert aggregated[phase][key] == raw[phase][key], (start, end, phase, key)
+        assert metrics.total_turnovers(start, end) == raw["visits"], (start, end)
+
+    assert metrics.total_turnovers("2026-01-01 08:30:00", "2026-01-01 10:30:00") == 3
+    assert metrics.aggregated_phase_stats("2026-01-01 10:30:00")["wait"]["count"] == 1
+
+    db.close()
+
+
+def test_delete_room_drops_its_aggregates(clock):
+    db = Database(":memory:")
+    controller = RoomController(db)
+    room_id = controller.create_room("Exam A")
+
+    _run_visit(controller, clock, room_id, 300, 900, 240)
+    controller.delete_room(room_id)
+
+    assert db.fetch_one("SELECT COUNT(*) FROM phase_aggregates") == 0
+    assert db.fetch_one("SELECT COUNT(*) FROM visit_phase_durations") == 0
+
+    db.close()
+
+
+def test_multi_shift_summary_merges_sums_and_counts(tmp_path, clock):
+    paths = []
+    # Shift one: one 100s wait. Shift two: three 400s waits. Shift three
+    # predates the aggregate tables: one 1000s wait.
+    for index, waits in enumerate(([100], [400, 400, 400], [1000])):
+        path = tmp_path / f"shift_{index}.db"
+        db = Database(path)
+        controller = RoomController(db)
+        room_id = controller.create_room("Exam A")
+        for wait_s in waits:
+            _run_visit(controller, clock, room_id, wait_s, 600, 120)
+            clock.advance(600)
+        if index == 2:
+            db.conn.execute("DROP TABLE phase_aggregates")
+            db.conn.commit()
+        db.close()
+        paths.append(path)
+    mtimes = [path.stat().st_mtime_ns for path in paths]
+
+    current = Database(":memory:")
+    summary = MetricsController(current).get_summary(shift_paths=paths, max_workers=2)
+
+    # (100 + 3 * 400 + 1000) / 5, not the mean of the per-shift averages.
+    assert summary["avg_wait"] == "07m 40s"
+    assert summary["avg_provider"] == "10m 00s"
+    assert summary["turnovers"] == 5
+    assert summary["stuck_rooms"] == []
+    # Shift files are only read.
+    assert [path.stat().st_mtime_ns for path in paths] == mtimes
+
+    single = MetricsController(current).get_summary(shift_paths=paths[:1])
+    assert single["avg_wait"] == "01m 40s"
+    current.close()
@@ -0,0 +1,89 @@
+import sys
+
+import pytest
+
+from controllers.metrics_controller import MetricsController
+from controllers.room_controller import RoomController
+from database.db import Database
+from database.metrics_queries import MetricsQueries
+from models.enums import RoomStatus
+
+
+@pytest.fixture
+def seeded_db(clock):
+    db = Database(":memory:")
+    controller = RoomController(db)
+    rooms = [controller.create_room("Exam A"), controller.create_room("Exam B")]
+    waits = [60, 120, 240, 300, 420, 600, 900, 1200, 2400, 3600]
+    for index, wait_s in enumerate(waits):
+        room_id = rooms[index % 2]
+        controller.update_status(room_id, RoomStatus.WAITING)
+        clock.advance(wait_s)
+        controller.update_status(room_id, RoomStatus.SEEING_PROVIDER)
+        clock.advance(600)
+        controller.update_status(room_id, RoomStatus.NEEDS_CLEANING)
+        controller.update_status(room_id, RoomStatus.CLEANING)
+        clock.advance(180 + 60 * index)
+        controller.update_status(room_id, RoomStatus.AVAILABLE)
+    yield db, rooms, waits
+    db.close()
+
+
+def test_vectorized_percentiles_match_reference(seeded_db):
+    np = pytest.importorskip("numpy")
+    from database.metrics_distributions import PhaseDistributions
+
+    db, rooms, waits = seeded_db
+    summary = PhaseDistributions(db).summary()
+    wait = summary["phases"]["wait"]
+
+    assert wait["count"] == len(waits)
+    assert wait["avg"] == pytest.approx(np.mean(waits))
+    for key, q in (("p50", 50), ("p90", 90), ("p99", 99)):
+        assert wait[key] == pytest.approx(np.percentile(waits, q))
+    assert wait["max"] == 3600
+
+    reference = MetricsQueries(db).phase_stats()
+    # Both paths share metrics_queries.percentile, so they agree exactly.
+    for phase in ("wait", "provider", "cleaning"):
+        for key in ("p50", "p90"):
+            assert summary["phases"][phase][key] == reference[phase][key]
+
+    # Bins: [0,5) [5,10) [10,15) [15,20) [20,30) [30,45) [45,60) [60,90) ... minutes
+    assert wait["histogram"] == [3, 2, 1, 1, 1, 1, 0, 1, 0, 0]
+    assert sum(summary["phases"]["cleaning"]["histogram"]) == len(waits)
+
+    room_a = summary["by_room"][rooms[0]]["wait"]
+    assert room_a["count"] == 5
+    assert room_a["p50"] == pytest.approx(np.percentile(waits[0::2], 50))
+
+    assert set(summary["by_hour"]) <= set(range(24))
+    assert sum(entry["wait"]["count"] for entry in summary["by_hour"].values()) == len(waits)
+
+
+def test_summary_carries_formatted_percentiles(seeded_db):
+    pytest.importorskip("numpy")
+    db, _, _ = seeded_db
+
+    assert "p90_wait" not in MetricsController(db).get_summary()
+
+    summary = MetricsController(db).get_summary(include_distributions=True)
+    assert summary["avg_wait"] == "16m 24s"
+    assert summary["p50_wait"] == "08m 30s"
+    assert summary["p90_wait"] == "42m 00s"
+    assert summary["distributions"]["phases"]["wait"]["count"] == 10
+
+    empty = MetricsController(db).get_summary(start="2030-01-01T00:00:00", include_distributions=True)
+    assert empty["p90_wait"] == "-"
+    assert empty["distributions"]["phases"]["wait"]["histogram"] == [0] * 10
+
+
+def test_summary_without_numpy_keeps_averages(seeded_db, monkeypatch):
+    db, _, _ = seeded_db
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    monkeypatch.delitem(sys.modules, "database.metrics_distributions", raising=False)
+
+    summary = MetricsController(db).get_summary(include_distributions=True)
+    assert summary["avg_wait"] == "16m 24s"
+    assert summary["p90_wait"] == "-"
+    assert summary["distributions"] is None
@@ -0,0 +1,120 @@
+import re
+
+import pytest
+
+from controllers.metrics_controller import MetricsController
+from database.db import Database
+from database.metrics_queries import MetricsQueries
+from database.migrations import LATEST_VERSION, current_version
+
+
+START = "2026-01-01 00:00:00"
+END = "2026-01-02 00:00:00"
+
+FILTERED_CALLS = [
+    ("avg_wait_time", (START, END)),
+    ("avg_provider_time", (START, END)),
+    ("avg_cleaning_time", (START, END)),
+    ("total_turnovers", (START, END)),
+    ("phase_stats", (START, END)),
+    ("aggregated_phase_stats", (START, END)),
+    ("aggregated_phase_stats", ("2026-01-01 08:30:00", "2026-01-01 17:15:00")),
+]
+
+UNFILTERED_CALLS = [
+    ("avg_wait_time", ()),
+    ("avg_provider_time", ()),
+    ("avg_cleaning_time", ()),
+    ("total_turnovers", ()),
+    ("phase_stats", ()),
+]
+
+
+def _captured_selects(db, method_name, args):
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        getattr(MetricsQueries(db), method_name)(*args)
+    finally:
+        db.conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+def _table_scans(db, sql, allowed=()):
+    """
+    Returns every SCAN step in the plan that reads a base table or index
+    end to end. Scans of materialized subqueries are not table scans.
+    """
+    plan = [row[3] for row in db.conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    materialized = {
+        match.group(1)
+        for detail in plan
+        for match in [re.match(r"(?:MATERIALIZE|CO-ROUTINE) (\w+)", detail)]
+        if match
+    }
+
+    scans = []
+    for detail in plan:
+        match = re.match(r"SCAN (\w+)", detail)
+        if not match:
+            continue
+        target = match.group(1)
+        if target in materialized or target in allowed:
+            continue
+        scans.append(detail)
+    return scans
+
+
+@pytest.fixture
+def db():
+    database = Database(":memory:")
+    yield database
+    database.close()
+
+
+def test_migrations_bring_new_databases_to_latest_version(db):
+    assert current_version(db.conn) == LATEST_VERSION
+
+
+@pytest.mark.parametrize("method_name,args", FILTERED_CALLS)
+def test_filtered_metrics_queries_never_scan_a_table(db, method_name, args):
+    statements = _captured_selects(db, method_name, args)
+    assert statements
+
+    for sql in statements:
+        assert _table_scans(db, sql) == [], sql
+
+
+@pytest.mark.parametrize("method_name,args", UNFILTERED_CALLS)
+def test_unfiltered_metrics_queries_only_walk_visits(db, method_name, args):
+    # Without a date range every visit is read by definition, but history
+    # must still be reached through an index.
+    statements = _captured_selects(db, method_name, args)
+    assert statements
+
+    for sql in statements:
+        assert _table_scans(db, sql, allowed={"v", "visits"}) == [], sql
+
+
+def test_status_index_load_reaches_history_through_an_index(db):
+    # The stuck-room index is loaded by walking rooms once; each room's
+    # entered-at time must still be an indexed history lookup.
+    statements = _captured_selects(db, "rooms_stuck_needing_cleaning", (1800,))
+    assert statements
+
+    for sql in statements:
+        assert _table_scans(db, sql, allowed={"r", "rooms"}) == [], sql
+
+
+def test_summary_refresh_does_not_read_per_visit_durations(db):
+    # Percentiles walk visit_phase_durations; a plain refresh must not.
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        MetricsController(db).get_summary(START, END)
+        MetricsController(db).get_summary()
+    finally:
+        db.conn.set_trace_callback(None)
+
+    assert statements
+    assert not [sql for sql in statements if "visit_phase_durations" in sql]
@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from controllers.metrics_controller import MetricsController
+from controllers.room_controller import RoomController
+from database.db import Database
+from database.metrics_aggregates import rebuild_phase_aggregates
+from database.metrics_sketches import RELATIVE_ACCURACY, QuantileSketch, load_phase_sketches
+from models.enums import RoomStatus
+
+
+FRACTIONS = (0.01, 0.25, 0.5, 0.9, 0.99, 0.999, 1.0)
+
+
+def _bucket_rows(db):
+    return [tuple(row) for row in db.fetch_all("SELECT * FROM phase_sketch_buckets ORDER BY phase, room_id, bucket")]
+
+
+def test_sketch_stays_within_relative_error_of_exact_percentiles():
+    np = pytest.importorskip("numpy")
+    rng = random.Random(7)
+    values = [rng.lognormvariate(6, 1.2) for _ in range(20000)] + [0.0] * 50
+
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+
+    assert sketch.count == len(values)
+    for fraction in FRACTIONS:
+        exact = np.percentile(values, fraction * 100, method="lower")
+        assert abs(sketch.quantile(fraction) - exact) <= RELATIVE_ACCURACY * exact
+
+    # Merging sketches of two halves is exactly the sketch of the whole.
+    left, right = QuantileSketch(), QuantileSketch()
+    for index, value in enumerate(values):
+        (left if index % 2 else right).add(value)
+    assert left.merge(right).buckets == sketch.buckets
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_sketches_follow_updates_and_merge_across_shifts(tmp_path, clock):
+    np = pytest.importorskip("numpy")
+    rng = random.Random(3)
+
+    waits = []
+    paths = []
+    for shift in range(2):
+        path = tmp_path / f"shift_{shift}.db"
+        db = Database(path)
+        controller = RoomController(db)
+        rooms = [controller.create_room(f"Exam {i}") for i in range(3)]
+        for visit in range(30):
+            wait_s = rng.randint(30, 3600)
+            waits.append(wait_s)
+            room_id = rooms[visit % 3]
+            controller.update_status(room_id, RoomStatus.WAITING)
+            clock.advance(wait_s)
+            controller.update_status(room_id, RoomStatus.SEEING_PROVIDER)
+            clock.advance(600)
+            controller.update_status(room_id, RoomStatus.NEEDS_CLEANING)
+            controller.update_status(room_id, RoomStatus.CLEANING)
+            controller.update_status(room_id, RoomStatus.AVAILABLE)
+
+        # Incremental maintenance matches a rebuild from the ledger.
+        incremental = _bucket_rows(db)
+        rebuild_phase_aggregates(db.conn)
+        db.conn.commit()
+        assert _bucket_rows(db) == incremental
+        db.close()
+        paths.append(path)
+
+    current = Database(paths[1])
+    metrics = MetricsController(current)
+    merged = metrics.get_sketch_percentiles(shift_paths=paths)
+    assert merged["wait"]["count"] == len(waits)
+    assert merged["provider"]["count"] == len(waits)
+    assert merged["cleaning"]["count"] == 0
+    for key, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+        exact = np.percentile(waits, fraction * 100, method="lower")
+        assert abs(merged["wait"][key] - exact) <= RELATIVE_ACCURACY * exact
+
+    room_one = metrics.get_sketch_percentiles(room_id=1)
+    assert room_one["wait"]["count"] == 10
+    assert metrics.get_sketch_percentiles()["wait"]["count"] == 30
+
+    RoomController(current).delete_room(1)
+    assert load_phase_sketches(current, room_id=1)["wait"].count == 0
+    current.close()
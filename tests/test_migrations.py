@@ -0,0 +1,220 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from controllers.room_controller import RoomController
+from database.db import Database
+from database.metrics_queries import MetricsQueries
+from database.migrations import LATEST_VERSION, _read_baseline_schema, current_version, ensure_schema
+from models.enums import RoomStatus
+from utils.time_utils import to_epoch_ms
+
+
+@pytest.fixture
+def utc_minus_six(monkeypatch):
+    # Local time must differ from UTC for offset bugs to show.
+    monkeypatch.setenv("TZ", "America/Chicago")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def _open_at(db_path, version):
+    db = Database(db_path, initialize_schema=False)
+    ensure_schema(db.conn, target_version=version)
+    return db
+
+
+def test_room_events_are_deduplicated_into_one_event_log(tmp_path):
+    db_path = tmp_path / "shift.db"
+    db = _open_at(db_path, 4)
+    assert current_version(db.conn) == 4
+
+    db.execute("INSERT INTO rooms (name, status) VALUES ('Exam 1', 'waiting')")
+    # Legacy dual writes: the two tables were stamped separately.
+    db.execute(
+        "INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp) "
+        "VALUES (1, 'available', 'waiting', 'manual', '2024-01-01 08:00:00')"
+    )
+    db.execute(
+        "INSERT INTO room_events (room_id, old_status, new_status, source, timestamp) "
+        "VALUES (1, 'available', 'waiting', 'manual', '2024-01-01 08:00:01')"
+    )
+    # An event the history never got.
+    db.execute(
+        "INSERT INTO room_events (room_id, old_status, new_status, source, timestamp) "
+        "VALUES (1, 'waiting', 'seeing_provider', 'api', '2024-01-01 08:10:00')"
+    )
+    db.close()
+
+    db = Database(db_path)
+    assert current_version(db.conn) == LATEST_VERSION
+    assert db.fetch_one("SELECT type FROM sqlite_master WHERE name = 'room_events'") == "view"
+
+    history = db.fetch_all("SELECT new_status, source FROM room_status_history ORDER BY timestamp_ms")
+    assert [tuple(row) for row in history] == [("waiting", "manual"), ("seeing_provider", "api")]
+    assert db.fetch_one("SELECT COUNT(*) FROM room_events") == 2
+
+    # The view stays writable for older tools and mirrors the controller's writes.
+    db.execute(
+        "INSERT INTO room_events (room_id, old_status, new_status, source) "
+        "VALUES (1, 'seeing_provider', 'needs_cleaning', 'manual')"
+    )
+    controller = RoomController(db)
+    controller.update_status(1, RoomStatus.CLEANING)
+    assert db.fetch_one("SELECT COUNT(*) FROM room_status_history") == 4
+    assert {row["new_status"] for row in controller.get_room_events(1)} == {
+        "waiting",
+        "seeing_provider",
+        "needs_cleaning",
+        "cleaning",
+    }
+
+    controller.delete_room(1)
+    assert db.fetch_one("SELECT COUNT(*) FROM room_events") == 0
+    db.close()
+
+
+
+def test_opening_a_current_db_runs_no_ddl(tmp_path):
+    db_path = tmp_path / "shift.db"
+    Database(db_path).close()
+
+    db = Database(db_path, initialize_schema=False)
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    assert ensure_schema(db.conn) == []
+    db.conn.set_trace_callback(None)
+
+    assert statements == ["PRAGMA user_version"]
+    db.close()
+
+
+def test_fresh_db_gets_baseline_and_every_migration(tmp_path):
+    db = Database(tmp_path / "shift.db", initialize_schema=False)
+    assert ensure_schema(db.conn) == list(range(1, LATEST_VERSION + 1))
+    assert current_version(db.conn) == LATEST_VERSION
+    assert db.fetch_one("SELECT COUNT(*) FROM change_counters") == 1
+    db.close()
+
+
+def test_text_timestamps_become_local_epoch_ms(tmp_path):
+    db_path = tmp_path / "shift.db"
+    db = _open_at(db_path, 6)
+    db.execute("ALTER TABLE visits ADD COLUMN shift_id TEXT")
+    db.execute("INSERT INTO rooms (name, status) VALUES ('Exam 1', 'available')")
+    db.execute(
+        "INSERT INTO visits (room_id, start_time, end_time, shift_id) "
+        "VALUES (1, '2024-01-01 08:00:00', '2024-01-01 08:30:00.250000', 'shift_a')"
+    )
+    # Writers after the baseline stamped history with local datetime.now().
+    for status, ts in (("waiting", "2024-01-01 08:00:00.000100"), ("seeing_provider", "2024-01-01 08:05:00.000100")):
+        db.execute(
+            "INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp) "
+            "VALUES (1, 'available', ?, 'manual', ?)",
+            (status, ts),
+        )
+    db.close()
+
+    # An archive opened read-only is not migrated but reads the same way.
+    archive = Database(db_path, read_only=True)
+    assert current_version(archive.conn) == 6
+    archived = [dict(row) for row in MetricsQueries(archive).visit_phases()]
+    archive.close()
+
+    db = Database(db_path)
+    visit = db.conn.execute("SELECT start_ms, end_ms, shift_id FROM visits").fetchone()
+    assert tuple(visit) == (
+        to_epoch_ms(datetime(2024, 1, 1, 8, 0)),
+        to_epoch_ms(datetime(2024, 1, 1, 8, 30, 0, 250000)),
+        "shift_a",
+    )
+
+    rows = [dict(row) for row in MetricsQueries(db).visit_phases()]
+    assert rows[0]["wait_seconds"] == 300
+    assert {key: rows[0][key] for key in archived[0]} == archived[0]
+
+    # Legacy writers still insert text through the room_events view.
+    db.execute(
+        "INSERT INTO room_events (room_id, old_status, new_status, source, timestamp) "
+        "VALUES (1, 'seeing_provider', 'needs_cleaning', 'manual', '2024-01-01T08:20:00')"
+    )
+    assert db.fetch_one("SELECT MAX(timestamp_ms) FROM room_status_history") == to_epoch_ms(
+        datetime(2024, 1, 1, 8, 20)
+    )
+    db.close()
+
+
+def test_baseline_history_is_read_as_utc_and_lines_up_with_visits(tmp_path, utc_minus_six):
+    db_path = tmp_path / "shift.db"
+    db = Database(db_path, initialize_schema=False)
+    db.conn.executescript(_read_baseline_schema())
+    db.execute("INSERT INTO rooms (name, status) VALUES ('Exam 1', 'available')")
+    # The baseline writer: visits from local datetime.now(), history from
+    # UTC CURRENT_TIMESTAMP (whole seconds), 6 hours ahead in January.
+    db.execute(
+        "INSERT INTO visits (room_id, start_time, end_time) "
+        "VALUES (1, '2024-01-01 08:00:00.136462', '2024-01-01 08:40:00.512000')"
+    )
+    for old, new, ts in (
+        ("available", "waiting", "2024-01-01 14:00:00"),
+        ("waiting", "seeing_provider", "2024-01-01 14:05:00"),
+        ("seeing_provider", "needs_cleaning", "2024-01-01 14:20:00"),
+        ("needs_cleaning", "cleaning", "2024-01-01 14:25:00"),
+        ("cleaning", "available", "2024-01-01 14:40:00"),
+    ):
+        db.execute(
+            "INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp) "
+            "VALUES (1, ?, ?, 'manual', ?)",
+            (old, new, ts),
+        )
+    db.close()
+
+    db = Database(db_path)
+    assert current_version(db.conn) == LATEST_VERSION
+    assert db.fetch_one("SELECT MIN(timestamp_ms) FROM room_status_history") == to_epoch_ms(
+        datetime(2024, 1, 1, 8, 0)
+    )
+
+    row = MetricsQueries(db).visit_phases()[0]
+    assert (row["wait_seconds"], row["provider_seconds"], row["cleaning_wait_seconds"], row["cleaning_seconds"]) == (
+        300,
+        900,
+        300,
+        900,
+    )
+    stats = MetricsQueries(db).aggregated_phase_stats()
+    assert stats["wait"]["avg"] == 300
+    assert stats["cleaning"]["avg"] == 900
+    db.close()
+
+
+def test_concurrent_openers_apply_each_migration_once(tmp_path):
+    for attempt in range(5):
+        db_path = tmp_path / f"shift_{attempt}.db"
+        barrier = threading.Barrier(2)
+        applied = []
+        errors = []
+
+        def open_file():
+            conn = sqlite3.connect(db_path, timeout=30)
+            try:
+                barrier.wait()
+                applied.extend(ensure_schema(conn))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                conn.close()
+
+        openers = [threading.Thread(target=open_file) for _ in range(2)]
+        for opener in openers:
+            opener.start()
+        for opener in openers:
+            opener.join()
+
+        assert errors == []
+        assert sorted(applied) == list(range(1, LATEST_VERSION + 1))
@@ -0,0 +1,467 @@
+import asyncio
+import http.client
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+import web.qr_server as qr_server
+from controllers.room_controller import RoomController
+from database.db import Database
+from services.url_signing import sign
+from web.async_server import AsyncQRServer
+
+
+@pytest.fixture
+def shift_db(tmp_path, monkeypatch):
+    db_path = tmp_path / "shift.db"
+    db = Database(db_path)
+    controller = RoomController(db)
+    room_id = controller.create_room("Exam 1")
+    controller.create_room("Exam 2")
+    db.close()
+
+    monkeypatch.setattr(qr_server, "active_db_path", lambda: str(db_path))
+    qr_server.FORM_CACHE.clear()
+    yield db_path, room_id
+    qr_server.UPDATE_QUEUE.stop(timeout=5)
+    qr_server.CHANGE_FEED.stop(timeout=5)
+    qr_server.DB_POOL.close_all()
+
+
+@pytest.fixture
+def server(shift_db):
+    _, room_id = shift_db
+    httpd = qr_server.ThreadingHTTPServer(("127.0.0.1", 0), qr_server.QRHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{httpd.server_port}", room_id
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def async_server(shift_db):
+    _, room_id = shift_db
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    server = AsyncQRServer(host="127.0.0.1", port=0, max_in_flight=4, read_workers=2)
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result(timeout=5)
+
+    yield server, room_id
+
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+    loop.close()
+
+
+def _get(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, dict(exc.headers), exc.read()
+
+
+def _post(url, fields):
+    data = urllib.parse.urlencode(fields).encode("utf-8")
+    with urllib.request.urlopen(url, data) as response:
+        return response.status, response.read()
+
+
+def test_form_is_served_with_etag_and_answers_conditional_get(server):
+    base_url, room_id = server
+    url = qr_server.create_signed_form_url(base_url, room_id, "patient")
+
+    status, headers, body = _get(url)
+    assert status == 200
+    assert b"Exam 1" in body
+    etag = headers["ETag"]
+    assert headers["Last-Modified"]
+
+    status, _, body = _get(url, {"If-None-Match": etag})
+    assert status == 304
+    assert body == b""
+
+    status, _, _ = _get(url, {"If-Modified-Since": headers["Last-Modified"]})
+    assert status == 304
+
+    # A status change produces a new page and a new validator.
+    _post(
+        f"{base_url}/update",
+        {
+            "scope": str(room_id),
+            "room_id": room_id,
+            "role": "patient",
+            "sig": sign(str(room_id), "patient"),
+            "new_status": "waiting",
+        },
+    )
+    status, headers, body = _get(url, {"If-None-Match": etag})
+    assert status == 200
+    assert headers["ETag"] != etag
+    assert b"<b>Current status:</b> waiting" in body
+
+
+def test_form_validators_survive_changes_within_one_second():
+    cache = qr_server.FormCache()
+    first = cache.get_or_render("form", "available", lambda: "available")
+    second = cache.get_or_render("form", "waiting", lambda: "waiting")
+    back = cache.get_or_render("form", "available", lambda: "available")
+
+    # The header has whole seconds: every change must land on a later one.
+    assert first.last_modified < second.last_modified < back.last_modified
+    assert back.etag == first.etag
+
+    since = {"If-Modified-Since": qr_server.formatdate(first.last_modified, usegmt=True)}
+    assert qr_server._not_modified(since, first)
+    assert not qr_server._not_modified(since, second)
+    # A stale ETag is not rescued by a matching date.
+    assert not qr_server._not_modified({"If-None-Match": second.etag, **since}, first)
+
+
+def test_shared_form_is_rendered_once_per_room_set(server, monkeypatch):
+    base_url, _ = server
+    url = qr_server.create_shared_form_url(base_url, "provider")
+
+    renders = []
+    original = qr_server.QRHandler._render_multi_room_form
+
+    def counting_render(self, rooms, role, signature):
+        renders.append(len(rooms))
+        return original(self, rooms, role, signature)
+
+    monkeypatch.setattr(qr_server.QRHandler, "_render_multi_room_form", counting_render)
+
+    first = _get(url)
+    second = _get(url)
+    assert first[0] == second[0] == 200
+    assert first[2] == second[2]
+    assert renders == [2]
+
+
+def test_async_server_routes_reads_and_writes_over_one_keep_alive_connection(async_server):
+    server, room_id = async_server
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    scope = str(room_id)
+
+    connection.request("GET", "/health")
+    response = connection.getresponse()
+    assert response.status == 200
+    assert response.read() == b"ok"
+    sock = connection.sock
+
+    form_path = "/form?" + urllib.parse.urlencode(
+        {"room_id": scope, "role": "provider", "sig": sign(scope, "provider")}
+    )
+    connection.request("GET", form_path)
+    response = connection.getresponse()
+    assert response.status == 200
+    etag = response.getheader("ETag")
+    assert b"Exam 1" in response.read()
+
+    body = urllib.parse.urlencode(
+        {
+            "scope": scope,
+            "room_id": room_id,
+            "role": "provider",
+            "sig": sign(scope, "provider"),
+            "new_status": "cleaning",
+        }
+    )
+    connection.request(
+        "POST",
+        "/update",
+        body=body,
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    response = connection.getresponse()
+    assert response.status == 200
+    assert b"Success" in response.read()
+
+    connection.request("GET", form_path, headers={"If-None-Match": etag})
+    response = connection.getresponse()
+    assert response.status == 200
+    assert b"<b>Current status:</b> cleaning" in response.read()
+
+    connection.request("GET", "/missing")
+    response = connection.getresponse()
+    assert response.status == 404
+    response.read()
+
+    assert connection.sock is sock
+    connection.close()
+
+
+def test_async_server_posts_share_one_group_commit(async_server, shift_db, monkeypatch):
+    server, _ = async_server
+    db_path, _ = shift_db
+    db = Database(db_path)
+    controller = RoomController(db)
+    for name in ("Exam 3", "Exam 4"):
+        controller.create_room(name)
+    room_ids = [room["id"] for room in controller.get_all_rooms()]
+    db.close()
+
+    # Long enough a linger that every POST in flight joins the burst.
+    monkeypatch.setattr(qr_server.UPDATE_QUEUE, "batch_wait_seconds", 0.5)
+    committed = qr_server.UPDATE_QUEUE.batches_committed
+
+    # More POSTs than pool threads: none may hold a thread while it waits.
+    base_url = f"http://127.0.0.1:{server.port}"
+    posts = [threading.Thread(target=_post_status, args=(base_url, room_id, "waiting")) for room_id in room_ids]
+    for post in posts:
+        post.start()
+    for post in posts:
+        post.join(timeout=5)
+
+    assert qr_server.UPDATE_QUEUE.batches_committed == committed + 1
+    db = Database(db_path)
+    assert {room["status"] for room in RoomController(db).get_all_rooms()} == {"waiting"}
+    db.close()
+
+
+def test_batch_update_endpoint_returns_per_item_results(server):
+    base_url, room_id = server
+
+    def post_batch(payload):
+        request = urllib.request.Request(
+            f"{base_url}/update/batch",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as exc:
+            return exc.code, json.loads(exc.read())
+
+    updates = [
+        {"room_id": room_id, "new_status": "waiting"},
+        {"room_id": room_id + 1, "new_status": "out_of_service"},
+        {"room_id": 999, "new_status": "waiting"},
+    ]
+    status, body = post_batch({"role": "provider", "sig": sign(str(room_id), "provider"), "updates": updates})
+    assert status == 403
+
+    status, body = post_batch({"role": "provider", "sig": "x", "updates": [{"room_id": room_id}]})
+    assert status == 400
+
+    status, body = post_batch(
+        {"role": "provider", "sig": sign(qr_server.ANY_ROOM_SCOPE, "provider"), "updates": updates}
+    )
+    assert status == 200
+    assert [result["ok"] for result in body["results"]] == [True, True, False]
+    assert body["results"][1]["new_status"] == "out_of_service"
+
+    status, _, page = _get(qr_server.create_signed_form_url(base_url, room_id, "patient"))
+    assert b"<b>Current status:</b> waiting" in page
+
+
+def _read_sse_event(response):
+    """Next dispatched SSE event as (id, event, data); comments are skipped."""
+    fields = {}
+    while True:
+        line = response.readline().decode("utf-8").rstrip("\r\n")
+        if not line:
+            if "event" in fields:
+                return fields.get("id"), fields["event"], fields.get("data")
+            fields = {}
+            continue
+        name, _, value = line.partition(":")
+        if name:
+            fields[name] = value.strip()
+
+
+def _post_status(base_url, room_id, status):
+    _post(
+        f"{base_url}/update",
+        {
+            "scope": qr_server.ANY_ROOM_SCOPE,
+            "room_id": room_id,
+            "role": "provider",
+            "sig": sign(qr_server.ANY_ROOM_SCOPE, "provider"),
+            "new_status": status,
+        },
+    )
+
+
+def test_events_stream_pushes_committed_transitions(server):
+    base_url, room_id = server
+    status, _, _ = _get(f"{base_url}/events?sig=bad")
+    assert status == 403
+
+    feed_url = qr_server.create_feed_url(base_url)
+    with urllib.request.urlopen(feed_url, timeout=5) as stream:
+        assert stream.headers["Content-Type"] == "text/event-stream"
+        _post_status(base_url, room_id, "waiting")
+        _post_status(base_url, room_id, "seeing_provider")
+
+        first_id, event, data = _read_sse_event(stream)
+        assert event == "status"
+        assert json.loads(data) == {"seq": int(first_id), "room_id": room_id, "status": "waiting"}
+        second_id, _, data = _read_sse_event(stream)
+        assert json.loads(data)["status"] == "seeing_provider"
+        assert int(second_id) == int(first_id) + 1
+
+    # Reconnecting with Last-Event-ID replays what was missed.
+    request = urllib.request.Request(feed_url, headers={"Last-Event-ID": first_id})
+    with urllib.request.urlopen(request, timeout=5) as stream:
+        event_id, _, data = _read_sse_event(stream)
+        assert event_id == second_id
+        assert json.loads(data)["status"] == "seeing_provider"
+
+    # A cursor the server cannot account for asks the client to resync.
+    request = urllib.request.Request(feed_url, headers={"Last-Event-ID": str(int(second_id) + 1000)})
+    with urllib.request.urlopen(request, timeout=5) as stream:
+        event_id, event, _ = _read_sse_event(stream)
+        assert event == "resync"
+        assert event_id == second_id
+
+
+def test_async_server_streams_events_on_the_loop(async_server):
+    server, room_id = async_server
+    base_url = f"http://127.0.0.1:{server.port}"
+
+    with urllib.request.urlopen(qr_server.create_feed_url(base_url), timeout=5) as stream:
+        _post_status(base_url, room_id, "waiting")
+        _, event, data = _read_sse_event(stream)
+        assert event == "status"
+        assert json.loads(data)["room_id"] == room_id
+
+
+def test_async_server_closes_with_subscribers_and_idle_connections_attached(async_server):
+    server, room_id = async_server
+    base_url = f"http://127.0.0.1:{server.port}"
+
+    stream = urllib.request.urlopen(qr_server.create_feed_url(base_url), timeout=5)
+    idle = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    idle.request("GET", "/health")
+    assert idle.getresponse().read() == b"ok"
+
+    started = time.monotonic()
+    asyncio.run_coroutine_threadsafe(server.close(), server._server.get_loop()).result(timeout=5)
+    # Well inside the keep-alive timeout: nothing waited for clients to leave.
+    assert time.monotonic() - started < 2
+
+    # Both connections were ended by the server: reads hit EOF at once.
+    stream.read()
+    assert idle.sock.recv(1) == b""
+    stream.close()
+    idle.close()
+
+
+def test_change_listener_is_notified_of_phone_updates(server):
+    from ui.change_listener import ChangeListener
+
+    base_url, room_id = server
+    notified = threading.Event()
+    calls = []
+
+    def on_change():
+        calls.append(1)
+        if len(calls) > 1:
+            notified.set()
+
+    listener = ChangeListener(on_change, url=qr_server.create_feed_url(base_url), reconnect_seconds=0.1).start()
+    try:
+        assert listener.connected.wait(5)
+        _post_status(base_url, room_id, "waiting")
+        # One call on connect, one for the pushed change.
+        assert notified.wait(5)
+    finally:
+        listener.stop(timeout=5)
+
+
+def test_board_streams_a_snapshot_then_deltas_from_every_writer(server, shift_db):
+    base_url, room_id = server
+    db_path, _ = shift_db
+    status, _, _ = _get(f"{base_url}/board?sig=bad")
+    assert status == 403
+
+    status, headers, page = _get(qr_server.create_board_url(base_url))
+    assert status == 200
+    assert b"/board/events" in page
+    assert _get(qr_server.create_board_url(base_url), {"If-None-Match": headers["ETag"]})[0] == 304
+
+    sig = sign(qr_server.FEED_SCOPE, qr_server.FEED_ROLE)
+    with urllib.request.urlopen(f"{base_url}/board/events?sig={sig}", timeout=5) as stream:
+        _, event, data = _read_sse_event(stream)
+        assert event == "snapshot"
+        assert [(room["name"], room["status"]) for room in json.loads(data)["rooms"]] == [
+            ("Exam 1", "available"),
+            ("Exam 2", "available"),
+        ]
+
+        _post_status(base_url, room_id, "waiting")
+        _, event, data = _read_sse_event(stream)
+        assert event == "status"
+        assert json.loads(data)["status"] == "waiting"
+
+        # Writes that bypass the server (the desktop app) reach the board too.
+        db = Database(db_path)
+        new_room = RoomController(db).create_room("Exam 3")
+        db.close()
+        _, event, data = _read_sse_event(stream)
+        change = json.loads(data)
+        assert (change["room_id"], change["name"], change["status"]) == (new_room, "Exam 3", "available")
+
+
+def test_async_server_streams_the_board(async_server):
+    server, room_id = async_server
+    base_url = f"http://127.0.0.1:{server.port}"
+    sig = sign(qr_server.FEED_SCOPE, qr_server.FEED_ROLE)
+
+    with urllib.request.urlopen(f"{base_url}/board/events?sig={sig}", timeout=5) as stream:
+        _, event, data = _read_sse_event(stream)
+        assert event == "snapshot"
+        assert len(json.loads(data)["rooms"]) == 2
+
+        _post_status(base_url, room_id, "waiting")
+        _, event, data = _read_sse_event(stream)
+        assert (event, json.loads(data)["room_id"]) == ("status", room_id)
+
+
+def test_async_server_takes_board_resync_snapshots_off_the_loop(async_server, monkeypatch):
+    server, _ = async_server
+    base_url = f"http://127.0.0.1:{server.port}"
+    sig = sign(qr_server.FEED_SCOPE, qr_server.FEED_ROLE)
+
+    feed = qr_server.CHANGE_FEED
+    since_async = feed.since_async
+    snapshot = feed.snapshot
+    gaps = [None]
+    snapshot_on_loop = []
+
+    async def gap_once(cursor, timeout):
+        if gaps:
+            return gaps.pop()
+        return await since_async(cursor, timeout)
+
+    def recording_snapshot():
+        try:
+            asyncio.get_running_loop()
+            snapshot_on_loop.append(True)
+        except RuntimeError:
+            snapshot_on_loop.append(False)
+        return snapshot()
+
+    monkeypatch.setattr(feed, "since_async", gap_once)
+    monkeypatch.setattr(feed, "snapshot", recording_snapshot)
+
+    with urllib.request.urlopen(f"{base_url}/board/events?sig={sig}", timeout=5) as stream:
+        assert _read_sse_event(stream)[1] == "snapshot"
+        # The history gap sends the viewer a fresh snapshot.
+        assert _read_sse_event(stream)[1] == "snapshot"
+
+    assert snapshot_on_loop == [False, False]
@@ -0,0 +1,113 @@
+import time
+
+from controllers.room_controller import RoomController
+from database.db import Database
+from models.enums import RoomStatus
+from ui.refresh_worker import RefreshWorker
+
+
+class FakeRoot:
+    """Stands in for the Tk root: records after() callbacks instead of running them."""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay_ms, callback):
+        self.scheduled.append(callback)
+
+
+def _seed(db_path):
+    db = Database(db_path)
+    controller = RoomController(db)
+    room_ids = [controller.create_room(f"Exam {n}") for n in (1, 2)]
+    db.close()
+    return room_ids
+
+
+def _wait_for_results(worker, results, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while len(results) < count and time.monotonic() < deadline:
+        worker.deliver()
+        time.sleep(0.01)
+    assert len(results) == count
+
+
+def test_full_read_only_after_the_db_changes(tmp_path):
+    db_path = tmp_path / "shift.db"
+    room_ids = _seed(db_path)
+    results = []
+    worker = RefreshWorker(FakeRoot(), results.append).start()
+    worker.bind(db_path)
+
+    try:
+        worker.request()
+        _wait_for_results(worker, results, 1)
+        assert [room["id"] for room in results[0].rooms] == room_ids
+        assert results[0].summary["turnovers"] == 0
+        assert "p90_wait" in results[0].summary
+        assert results[0].stuck == {"stuck_rooms": [], "next_breach": None}
+
+        # Nothing committed since: only the stuck rooms are re-read.
+        worker.request()
+        _wait_for_results(worker, results, 2)
+        assert results[1].rooms is None and results[1].summary is None
+        assert results[1].stuck is not None
+
+        other = Database(db_path)
+        RoomController(other).update_status(room_ids[0], RoomStatus.WAITING)
+        other.close()
+
+        worker.request()
+        _wait_for_results(worker, results, 3)
+        statuses = {room["id"]: room["status"] for room in results[2].rooms}
+        assert statuses[room_ids[0]] == RoomStatus.WAITING.value
+        # Percentiles were read moments ago; a change alone does not repeat that.
+        assert "p90_wait" not in results[2].summary
+    finally:
+        worker.stop(timeout=5)
+
+
+def test_pending_requests_coalesce_and_keep_force(tmp_path):
+    db_path = tmp_path / "shift.db"
+    _seed(db_path)
+    worker = RefreshWorker(FakeRoot(), lambda result: None)
+    worker.bind(db_path)
+
+    # Not started: requests pile up as a single pending one.
+    worker.request(force=True)
+    worker.request(start="2024-01-01T00:00:00")
+    worker.request(start="2024-02-01T00:00:00")
+
+    request = worker._next_request()
+    assert request.ticket == 3
+    assert request.force
+    assert request.start == "2024-02-01T00:00:00"
+    assert worker._pending is None
+    worker.stop()
+
+
+def test_results_for_a_rebound_db_or_before_a_forced_refresh_are_dropped(tmp_path):
+    db_path = tmp_path / "shift.db"
+    _seed(db_path)
+    results = []
+    worker = RefreshWorker(FakeRoot(), results.append)
+    worker.bind(db_path)
+
+    worker.request()
+    stale = worker._read(worker._next_request())
+    # A new date range was asked for while the first read ran.
+    worker.request(force=True)
+    current = worker._read(worker._next_request())
+    worker._results.put(stale)
+    worker._results.put(current)
+    worker.deliver()
+    assert results == [current]
+    assert current.rooms is not None
+
+    worker.request()
+    in_flight = worker._read(worker._next_request())
+    worker.bind(tmp_path / "next_shift.db")
+    worker._results.put(in_flight)
+    worker.deliver()
+    assert results == [current]
+    worker.stop()
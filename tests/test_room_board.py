@@ -0,0 +1,72 @@
+from controllers.room_controller import RoomController
+from database.db import Database
+from models.enums import RoomStatus
+from services.room_board import RoomBoard
+
+
+def _board(tmp_path):
+    db_path = tmp_path / "shift.db"
+    db = Database(db_path)
+    controller = RoomController(db)
+    room_ids = [controller.create_room(name) for name in ("Exam 2", "Exam 1")]
+    return RoomBoard(lambda: db_path), db, room_ids
+
+
+def test_snapshot_is_served_from_memory_once_loaded(tmp_path, monkeypatch):
+    board, db, (exam_2, exam_1) = _board(tmp_path)
+    seq, rooms = board.snapshot()
+    assert seq == 0
+    assert rooms == [
+        {"room_id": exam_1, "name": "Exam 1", "status": "available"},
+        {"room_id": exam_2, "name": "Exam 2", "status": "available"},
+    ]
+
+    def no_database(*args, **kwargs):
+        raise AssertionError("snapshot read the database")
+
+    monkeypatch.setattr(board._pool, "connection", no_database)
+    board.publish([(exam_1, "waiting")])
+    seq, rooms = board.snapshot()
+    assert seq == 1
+    assert rooms[0]["status"] == "waiting"
+
+    board.stop()
+    db.close()
+
+
+def test_sync_publishes_only_what_changed_outside_the_writer(tmp_path):
+    board, db, (exam_2, exam_1) = _board(tmp_path)
+    board.snapshot()
+
+    # Nothing committed: no read and no changes.
+    assert board.sync() == []
+
+    db.execute("UPDATE rooms SET status = 'maintenance' WHERE id = ?", (exam_1,))
+    db.execute("UPDATE rooms SET name = 'Exam 2B' WHERE id = ?", (exam_2,))
+    exam_3 = RoomController(db).create_room("Exam 3")
+    db.execute("DELETE FROM rooms WHERE id = ?", (exam_1,))
+
+    changes = {change.room_id: change.to_dict() for change in board.sync()}
+    assert changes[exam_2]["name"] == "Exam 2B"
+    assert changes[exam_3]["name"] == "Exam 3"
+    assert changes[exam_1]["status"] is None
+    assert [room["name"] for room in board.snapshot()[1]] == ["Exam 2B", "Exam 3"]
+
+    board.stop()
+    db.close()
+
+
+def test_a_transition_seen_by_both_paths_is_published_once(tmp_path):
+    board, db, (_, exam_1) = _board(tmp_path)
+    board.snapshot()
+
+    RoomController(db).update_status(exam_1, RoomStatus.WAITING)
+    # The watcher noticed the commit before the writer published it.
+    first = board.sync()
+    assert [(change.room_id, change.status) for change in first] == [(exam_1, "waiting")]
+    assert "name" not in first[0].to_dict()
+    assert board.publish([(exam_1, "waiting")]) == []
+    assert board.latest_seq == 1
+
+    board.stop()
+    db.close()
@@ -0,0 +1,103 @@
+import pytest
+
+import controllers.room_controller as room_controller_module
+from controllers.room_controller import RoomController
+from database.db import Database
+from models.enums import RoomStatus, UpdateSource
+
+
+def test_get_room_and_batch_lookup_use_primary_keys():
+    db = Database(":memory:")
+    controller = RoomController(db)
+    first = controller.create_room("Exam 1")
+    second = controller.create_room("Exam 2", RoomStatus.CLEANING)
+
+    assert controller.get_room(second)["status"] == RoomStatus.CLEANING.value
+    assert controller.get_room(999) is None
+
+    rows = controller.get_rooms([second, 999, first, second])
+    assert [row["id"] for row in rows] == [second, first]
+
+    db.close()
+
+
+def test_room_directory_is_cached_until_room_set_changes(tmp_path):
+    db_path = tmp_path / "shift.db"
+    db = Database(db_path)
+    controller = RoomController(db)
+    controller.create_room("exam b")
+    controller.create_room("Exam A")
+
+    directory = controller.get_room_directory()
+    assert [room["name"] for room in directory] == ["Exam A", "exam b"]
+    # Status changes do not touch the directory.
+    controller.update_status(directory[0]["id"], RoomStatus.WAITING)
+    assert controller.get_room_directory() is directory
+
+    # A second connection (e.g. the desktop UI) adds a room; the trigger-bumped
+    # counter makes this process notice without any explicit invalidation.
+    other = Database(db_path)
+    other.execute("INSERT INTO rooms (name, status) VALUES ('Exam C', 'available')")
+    other.close()
+
+    refreshed = controller.get_room_directory()
+    assert [room["name"] for room in refreshed] == ["Exam A", "exam b", "Exam C"]
+
+    controller.delete_room(refreshed[0]["id"])
+    assert [room["name"] for room in controller.get_room_directory()] == ["exam b", "Exam C"]
+
+    db.close()
+
+
+def test_update_status_many_applies_in_order_with_per_item_outcomes(monkeypatch):
+    db = Database(":memory:")
+    controller = RoomController(db)
+    first = controller.create_room("Exam 1")
+    second = controller.create_room("Exam 2")
+
+    # Disallow leaving out_of_service so one item is rejected mid-batch.
+    monkeypatch.setattr(
+        room_controller_module,
+        "is_transition_allowed",
+        lambda old, new: old != RoomStatus.OUT_OF_SERVICE,
+    )
+
+    outcomes = controller.update_status_many(
+        [
+            (first, RoomStatus.WAITING, UpdateSource.API),
+            (first, RoomStatus.SEEING_PROVIDER, UpdateSource.API),
+            (first, RoomStatus.NEEDS_CLEANING, UpdateSource.API),
+            (first, RoomStatus.CLEANING, UpdateSource.API),
+            (first, RoomStatus.AVAILABLE, UpdateSource.API),
+            # A new visit starts after the first one ended in the same batch.
+            (first, RoomStatus.WAITING, UpdateSource.API),
+            (second, RoomStatus.OUT_OF_SERVICE),
+            (second, RoomStatus.AVAILABLE),
+            (999, RoomStatus.WAITING),
+        ]
+    )
+
+    assert [outcome["ok"] for outcome in outcomes] == [True] * 7 + [False, False]
+    assert "Invalid transition" in outcomes[7]["error"]
+    assert "does not exist" in outcomes[8]["error"]
+
+    assert controller.get_room(first)["status"] == RoomStatus.WAITING.value
+    assert controller.get_room(second)["status"] == RoomStatus.OUT_OF_SERVICE.value
+
+    visits = db.fetch_all("SELECT room_id, end_ms FROM visits ORDER BY id")
+    assert [row["room_id"] for row in visits] == [first, first]
+    assert visits[0]["end_ms"] is not None
+    assert visits[1]["end_ms"] is None
+
+    history = db.fetch_all("SELECT room_id, source FROM room_status_history ORDER BY id")
+    assert len(history) == 7
+    assert db.fetch_one("SELECT COUNT(*) FROM room_events") == 7
+    assert history[-1]["source"] == UpdateSource.MANUAL.value
+
+    phases = db.fetch_all("SELECT phase FROM visit_phase_durations ORDER BY phase")
+    assert [row["phase"] for row in phases] == ["cleaning", "cleaning_wait", "provider", "wait"]
+
+    with pytest.raises(ValueError):
+        controller.update_status(second, RoomStatus.AVAILABLE)
+
+    db.close()
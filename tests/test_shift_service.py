@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from services.shift_service import ActiveShiftResolver, ShiftService, get_active_shift_resolver
+
+
+def test_resolver_only_rereads_pointer_when_it_changes(tmp_path, monkeypatch):
+    pointer = tmp_path / "active_shift.txt"
+    pointer.write_text("data/shifts/first.db", encoding="utf-8")
+    resolver = ActiveShiftResolver(pointer)
+
+    reads = []
+    original_read_text = Path.read_text
+
+    def counting_read_text(self, *args, **kwargs):
+        reads.append(self)
+        return original_read_text(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "read_text", counting_read_text)
+
+    assert resolver.get_active_db_path() == Path("data/shifts/first.db")
+    assert resolver.get_active_db_path() == Path("data/shifts/first.db")
+    assert len(reads) == 1
+
+    pointer.write_text("data/shifts/second-shift.db", encoding="utf-8")
+    assert resolver.get_active_db_path() == Path("data/shifts/second-shift.db")
+    assert len(reads) == 2
+
+    pointer.unlink()
+    assert resolver.get_active_db_path() is None
+
+
+def test_shift_rotation_is_visible_to_shared_resolver(tmp_path):
+    pointer = tmp_path / "active_shift.txt"
+    service = ShiftService(base_dir=tmp_path / "shifts", active_file=pointer)
+    resolver = get_active_shift_resolver(pointer)
+
+    assert service.resolver is resolver
+    assert resolver.get_active_db_path() is None
+
+    db_path, created = service.start_shift()
+    assert created
+    assert resolver.get_active_db_path() == db_path
+
+    service.end_shift()
+    assert resolver.get_active_db_path() is None
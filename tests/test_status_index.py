@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+from controllers.room_controller import RoomController
+from database.db import Database
+from database.metrics_queries import MetricsQueries
+from database.status_index import status_index_for
+from models.enums import RoomStatus
+from utils.time_utils import from_epoch_ms, to_epoch_ms
+
+
+def _to_needs_cleaning(controller, room_id):
+    for status in (RoomStatus.WAITING, RoomStatus.SEEING_PROVIDER, RoomStatus.NEEDS_CLEANING):
+        controller.update_status(room_id, status)
+
+
+def test_stuck_rooms_compare_epoch_entered_at_times():
+    db = Database(":memory:")
+    controller = RoomController(db)
+    room_a = controller.create_room("Exam A")
+    room_b = controller.create_room("Exam B")
+    _to_needs_cleaning(controller, room_a)
+    _to_needs_cleaning(controller, room_b)
+
+    index = status_index_for(db)
+    entered = index.rooms_in_status("needs_cleaning")
+    assert set(entered) == {room_a, room_b}
+
+    # Nothing is stuck yet; 31 minutes later both are.
+    assert MetricsQueries(db).rooms_stuck_needing_cleaning(1800) == []
+    later = max(entered.values()) + 31 * 60 * 1000
+    assert index.stuck_rooms("needs_cleaning", 1800, now=later) == [room_a, room_b]
+
+    # Leaving the status drops the room from the index without a reload.
+    controller.update_status(room_a, RoomStatus.CLEANING)
+    assert index.stuck_rooms("needs_cleaning", 1800, now=later) == [room_b]
+
+    db.close()
+
+
+def test_next_breach_skips_rooms_that_moved_on():
+    db = Database(":memory:")
+    controller = RoomController(db)
+    first = controller.create_room("Exam 1")
+    second = controller.create_room("Exam 2")
+    _to_needs_cleaning(controller, first)
+    _to_needs_cleaning(controller, second)
+
+    metrics = MetricsQueries(db)
+    room_id, deadline = metrics.next_room_to_breach(600)
+    assert room_id == first
+    entered_at = status_index_for(db).rooms_in_status("needs_cleaning")[first]
+    assert deadline == from_epoch_ms(entered_at + 600 * 1000)
+
+    controller.update_status(first, RoomStatus.CLEANING)
+    assert metrics.next_room_to_breach(600)[0] == second
+
+    controller.update_status(second, RoomStatus.CLEANING)
+    assert metrics.next_room_to_breach(600) is None
+
+    db.close()
+
+
+def test_index_reloads_after_writes_from_another_connection(tmp_path):
+    db_path = tmp_path / "shift.db"
+    db = Database(db_path)
+    controller = RoomController(db)
+    room_id = controller.create_room("Exam 1")
+    metrics = MetricsQueries(db)
+    assert metrics.rooms_stuck_needing_cleaning(1800) == []
+
+    # Another connection (e.g. the QR server's writer) moves the room.
+    entered_at = to_epoch_ms(datetime.now() - timedelta(hours=1))
+    other = Database(db_path)
+    other.execute("UPDATE rooms SET status = 'needs_cleaning' WHERE id = ?", (room_id,))
+    other.execute(
+        "INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp_ms) VALUES (?, 'seeing_provider', 'needs_cleaning', 'manual', ?)",
+        (room_id, entered_at),
+    )
+    other.close()
+
+    assert metrics.rooms_stuck_needing_cleaning(1800) == [room_id]
+
+    controller.delete_room(room_id)
+    assert metrics.rooms_stuck_needing_cleaning(1800) == []
+
+    db.close()
+
+
+def test_local_write_after_a_foreign_commit_does_not_hide_it(tmp_path):
+    db_path = tmp_path / "shift.db"
+    db = Database(db_path)
+    controller = RoomController(db)
+    first = controller.create_room("Exam 1")
+    second = controller.create_room("Exam 2")
+    metrics = MetricsQueries(db)
+    assert metrics.rooms_stuck_needing_cleaning(1800) == []
+
+    # Another connection commits first...
+    entered_at = to_epoch_ms(datetime.now() - timedelta(hours=1))
+    other = Database(db_path)
+    other.execute("UPDATE rooms SET status = 'needs_cleaning' WHERE id = ?", (second,))
+    other.execute(
+        "INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp_ms) VALUES (?, 'seeing_provider', 'needs_cleaning', 'manual', ?)",
+        (second, entered_at),
+    )
+    other.close()
+
+    # ...then this connection writes before anything reads the index.
+    controller.update_status(first, RoomStatus.WAITING)
+    assert metrics.rooms_stuck_needing_cleaning(1800) == [second]
+    assert status_index_for(db).rooms_in_status("waiting").keys() == {first}
+
+    db.close()
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from controllers.room_controller import RoomController
+from database.db import Database
+from models.enums import RoomStatus, UpdateSource
+from services.update_service import UpdateQueue
+
+
+@pytest.fixture
+def shift_db(tmp_path):
+    db_path = tmp_path / "shift.db"
+    db = Database(db_path)
+    controller = RoomController(db)
+    room_ids = [controller.create_room(f"Exam {i}") for i in range(1, 4)]
+    db.close()
+    return str(db_path), room_ids
+
+
+def test_burst_is_group_committed_with_per_caller_results(shift_db):
+    db_path, room_ids = shift_db
+    updates = UpdateQueue(db_path_resolver=lambda: db_path)
+
+    # Queue the burst before the writer starts so it is drained as one batch.
+    lifecycle = [
+        RoomStatus.WAITING,
+        RoomStatus.SEEING_PROVIDER,
+        RoomStatus.NEEDS_CLEANING,
+        RoomStatus.CLEANING,
+        RoomStatus.AVAILABLE,
+    ]
+    futures = [
+        updates.submit(room_id, status, UpdateSource.API)
+        for status in lifecycle
+        for room_id in room_ids
+    ]
+    missing = updates.submit(999, RoomStatus.WAITING, UpdateSource.API)
+
+    updates.start()
+    for future in futures:
+        assert future.result(timeout=5) is None
+    with pytest.raises(ValueError):
+        missing.result(timeout=5)
+    updates.stop(timeout=5)
+
+    assert updates.batches_committed == 1
+    assert updates.updates_applied == len(futures)
+
+    db = Database(db_path)
+    for room_id in room_ids:
+        history = db.fetch_all(
+            "SELECT new_status FROM room_status_history WHERE room_id = ? ORDER BY id",
+            [room_id],
+        )
+        assert [row[0] for row in history] == [status.value for status in lifecycle]
+    assert db.fetch_one("SELECT COUNT(*) FROM visits WHERE end_ms IS NOT NULL") == len(room_ids)
+    db.close()
+
+
+def test_concurrent_callers_share_the_single_writer(shift_db):
+    db_path, room_ids = shift_db
+    updates = UpdateQueue(db_path_resolver=lambda: db_path).start()
+    errors = []
+
+    def worker(room_id):
+        try:
+            for status in (RoomStatus.WAITING, RoomStatus.SEEING_PROVIDER, RoomStatus.NEEDS_CLEANING):
+                updates.update_status(room_id, status, UpdateSource.API, timeout=5)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(room_id,)) for room_id in room_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    updates.stop(timeout=5)
+
+    assert errors == []
+    assert updates.updates_applied == 3 * len(room_ids)
+    assert updates.batches_committed <= updates.updates_applied
+
+    db = Database(db_path)
+    statuses = {row["id"]: row["status"] for row in db.fetch_all("SELECT id, status FROM rooms")}
+    assert set(statuses.values()) == {RoomStatus.NEEDS_CLEANING.value}
+    db.close()
@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 
 from database.db import Database
 from database.metrics_queries import MetricsQueries
+from utils.time_utils import to_epoch_ms
 
 
 def _insert_visit_with_history(db, room_id, start_dt, wait_s, provider_s, cleaning_s):
@@ -11,8 +12,8 @@ def _insert_visit_with_history(db, room_id, start_dt, wait_s, provider_s, cleani
     available_dt = cleaning_dt + timedelta(seconds=cleaning_s)
 
     db.execute(
-        "INSERT INTO visits (room_id, start_time, end_time) VALUES (?, ?, ?)",
-        (room_id, start_dt.isoformat(sep=" "), available_dt.isoformat(sep=" ")),
+        "INSERT INTO visits (room_id, start_ms, end_ms) VALUES (?, ?, ?)",
+        (room_id, to_epoch_ms(start_dt), to_epoch_ms(available_dt)),
     )
 
     transitions = [
@@ -27,10 +28,10 @@ def _insert_visit_with_history(db, room_id, start_dt, wait_s, provider_s, cleani
         db.execute(
             """
             INSERT INTO room_status_history
-            (room_id, old_status, new_status, source, timestamp)
+            (room_id, old_status, new_status, source, timestamp_ms)
             VALUES (?, ?, ?, 'manual', ?)
             """,
-            (room_id, old_status, new_status, ts.isoformat(sep=" ")),
+            (room_id, old_status, new_status, to_epoch_ms(ts)),
         )
 
 
@@ -59,6 +60,56 @@ def test_visit_backed_metrics_and_filters():
     assert metrics.avg_cleaning_time("2026-01-01 11:00:00", "2026-01-01 12:30:00") == 150.0
     assert metrics.total_turnovers("2026-01-01 11:00:00", "2026-01-01 12:30:00") == 2
 
+    # The three averages share one pass until the data changes.
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    metrics.avg_wait_time()
+    metrics.avg_provider_time()
+    metrics.avg_cleaning_time()
+    db.conn.set_trace_callback(None)
+    assert len([sql for sql in statements if "room_status_history" in sql]) == 1
+
+    _insert_visit_with_history(db, room_b, datetime(2026, 1, 1, 13, 0, 0), 740, 600, 180)
+    assert metrics.avg_wait_time() == 440.0
+
+    db.close()
+
+
+def test_visit_phases_single_pass_table_and_stats():
+    db = Database(":memory:")
+    metrics = MetricsQueries(db)
+
+    db.execute("INSERT INTO rooms (name, status) VALUES ('Exam A', 'available')")
+    room_a = db.fetch_one("SELECT id FROM rooms")
+
+    _insert_visit_with_history(db, room_a, datetime(2026, 1, 1, 10, 0, 0), 300, 900, 240)
+    _insert_visit_with_history(db, room_a, datetime(2026, 1, 1, 12, 0, 0), 600, 300, 120)
+    open_start = to_epoch_ms("2026-01-01 14:00:00")
+    db.execute(
+        "INSERT INTO visits (room_id, start_ms, end_ms) VALUES (?, ?, NULL)",
+        (room_a, open_start),
+    )
+    db.execute(
+        "INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp_ms) VALUES (?, 'available', 'waiting', 'manual', ?)",
+        (room_a, open_start),
+    )
+
+    rows = metrics.visit_phases()
+    assert [row["wait_seconds"] for row in rows] == [300, 600, None]
+    assert [row["cleaning_wait_seconds"] for row in rows] == [60, 60, None]
+    assert rows[2]["waiting_at_ms"] == open_start
+    assert rows[2]["seeing_provider_at_ms"] is None
+
+    stats = metrics.phase_stats()
+    assert stats["visits"] == 3
+    assert stats["wait"]["count"] == 2
+    assert stats["wait"]["avg"] == 450.0
+    assert stats["wait"]["min"] == 300
+    assert stats["wait"]["max"] == 600
+    assert stats["wait"]["p50"] == 450.0
+    assert stats["wait"]["p90"] == 570.0
+    assert stats["provider"]["avg"] == 600.0
+
     db.close()
 
 
@@ -75,19 +126,19 @@ def test_stuck_rooms_only_returns_currently_stuck_ids():
     room_b = rooms[1][0]
     room_c = rooms[2][0]
 
-    old_ts = (datetime.now() - timedelta(seconds=4000)).isoformat(sep=" ")
-    recent_ts = (datetime.now() - timedelta(seconds=60)).isoformat(sep=" ")
+    old_ts = to_epoch_ms(datetime.now() - timedelta(seconds=4000))
+    recent_ts = to_epoch_ms(datetime.now() - timedelta(seconds=60))
 
     db.execute(
-        "INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp) VALUES (?, 'seeing_provider', 'needs_cleaning', 'manual', ?)",
+        "INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp_ms) VALUES (?, 'seeing_provider', 'needs_cleaning', 'manual', ?)",
         (room_a, old_ts),
     )
     db.execute(
-        "INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp) VALUES (?, 'seeing_provider', 'needs_cleaning', 'manual', ?)",
+        "INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp_ms) VALUES (?, 'seeing_provider', 'needs_cleaning', 'manual', ?)",
         (room_b, recent_ts),
     )
     db.execute(
-        "INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp) VALUES (?, 'cleaning', 'available', 'manual', ?)",
+        "INSERT INTO room_status_history (room_id, old_status, new_status, source, timestamp_ms) VALUES (?, 'cleaning', 'available', 'manual', ?)",
         (room_c, old_ts),
     )
 
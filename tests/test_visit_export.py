@@ -0,0 +1,86 @@
+import csv
+import sys
+
+import pytest
+
+from controllers.room_controller import RoomController
+from database.db import Database
+from models.enums import RoomStatus
+from services.visit_export import COLUMNS, export_visit_timelines
+
+
+@pytest.fixture
+def shift_db(tmp_path, clock):
+    path = tmp_path / "clinic_shift_20260101_080000_ended_20260101_170000.db"
+    db = Database(path)
+    controller = RoomController(db)
+    for name, wait_s in (("Exam 1", 300), ("Exam 2", 600), ("Exam 1", 120)):
+        room = next((row["id"] for row in controller.get_all_rooms() if row["name"] == name), None)
+        room_id = room or controller.create_room(name)
+        controller.update_status(room_id, RoomStatus.WAITING)
+        clock.advance(wait_s)
+        controller.update_status(room_id, RoomStatus.SEEING_PROVIDER)
+        clock.advance(900)
+        if name == "Exam 2":
+            continue  # left open
+        controller.update_status(room_id, RoomStatus.NEEDS_CLEANING)
+        controller.update_status(room_id, RoomStatus.CLEANING)
+        clock.advance(60)
+        controller.update_status(room_id, RoomStatus.AVAILABLE)
+    db.close()
+    return path
+
+
+def test_csv_export_streams_every_visit_in_start_order(shift_db, tmp_path):
+    out_path, fmt, rows = export_visit_timelines([shift_db], tmp_path / "out.csv", fmt="csv", chunk_size=2)
+    assert (fmt, rows, out_path.suffix) == ("csv", 3, ".csv")
+
+    with open(out_path, newline="", encoding="utf-8") as f:
+        records = list(csv.DictReader(f))
+    assert tuple(records[0]) == COLUMNS
+    assert [record["room_name"] for record in records] == ["Exam 1", "Exam 2", "Exam 1"]
+    assert {record["shift"] for record in records} == {"clinic_shift_20260101_080000"}
+    assert [record["wait_seconds"] for record in records] == ["300.0", "600.0", "120.0"]
+    assert records[1]["end_time"] == "" and records[1]["cleaning_seconds"] == ""
+
+
+def test_missing_libraries_fall_back_to_csv(shift_db, tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    out_path, fmt, rows = export_visit_timelines([shift_db], tmp_path / "out.parquet")
+    assert (fmt, out_path.name, rows) == ("csv", "out.csv", 3)
+
+
+def test_npz_export_matches_rows(shift_db, tmp_path, monkeypatch):
+    np = pytest.importorskip("numpy")
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+    out_path, fmt, rows = export_visit_timelines([shift_db], tmp_path / "out.parquet", chunk_size=2)
+    assert (fmt, out_path.suffix, rows) == ("npz", ".npz", 3)
+
+    data = np.load(out_path)
+    assert data["visit_id"].tolist() == [1, 2, 3]
+    assert data["room_name_labels"][data["room_name"]].tolist() == ["Exam 1", "Exam 2", "Exam 1"]
+    assert data["wait_seconds"].tolist() == [300.0, 600.0, 120.0]
+    assert np.isnan(data["cleaning_seconds"][1]) and np.isnat(data["end_time"][1])
+    assert data["start_time"][0] == np.datetime64("2026-01-01T08:00:00")
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_arrow_export_matches_rows(shift_db, tmp_path, fmt):
+    pa = pytest.importorskip("pyarrow")
+
+    out_path, written_fmt, rows = export_visit_timelines([shift_db], tmp_path / "out", fmt=fmt, chunk_size=2)
+    assert (written_fmt, rows) == (fmt, 3)
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(out_path)
+    else:
+        table = pa.ipc.open_file(str(out_path)).read_all()
+
+    assert table.column_names == list(COLUMNS)
+    assert table.column("wait_seconds").to_pylist() == [300.0, 600.0, 120.0]
+    assert table.column("room_name").to_pylist() == ["Exam 1", "Exam 2", "Exam 1"]
+    assert table.column("end_time").to_pylist()[1] is None
@@ -0,0 +1,107 @@
+"""
+Push notifications for the desktop dashboard.
+
+Subscribes to the QR server's ``/events`` stream on a background thread
+and calls ``on_change`` (from that thread) whenever a room changes or the
+server asks for a resync. The dashboard keeps polling as a fallback, so
+the listener just reconnects quietly while the server is down.
+"""
+
+import http.client
+import os
+import socket
+import threading
+from urllib.parse import urlsplit
+
+from services.url_signing import create_feed_url
+
+
+RECONNECT_SECONDS = 5
+# Longer than the server's keep-alive interval, so a dead stream is noticed.
+READ_TIMEOUT_SECONDS = 45
+
+
+def default_feed_url():
+    port = os.getenv("NEXUS_QR_PORT", "8787")
+    return os.getenv("NEXUS_QR_FEED_URL") or create_feed_url(f"http://127.0.0.1:{port}")
+
+
+class ChangeListener:
+    def __init__(self, on_change, url=None, reconnect_seconds=RECONNECT_SECONDS):
+        self.on_change = on_change
+        self.url = url or default_feed_url()
+        self.reconnect_seconds = reconnect_seconds
+
+        self.connected = threading.Event()
+        self._stopped = threading.Event()
+        self._sock = None
+        self._last_event_id = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="dashboard-change-listener", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        sock = self._sock
+        if sock is not None:
+            # Closing the response from here would not wake a blocked read.
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except (OSError, ValueError, http.client.HTTPException):
+                pass
+            finally:
+                self.connected.clear()
+                self._sock = None
+            self._stopped.wait(self.reconnect_seconds)
+
+    def _listen(self):
+        headers = {"Accept": "text/event-stream"}
+        if self._last_event_id is not None:
+            headers["Last-Event-ID"] = self._last_event_id
+
+        url = urlsplit(self.url)
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=READ_TIMEOUT_SECONDS)
+        try:
+            target = f"{url.path}?{url.query}" if url.query else url.path
+            connection.request("GET", target, headers=headers)
+            self._sock = connection.sock
+            response = connection.getresponse()
+            if response.status == 200:
+                self._read_events(response)
+            response.close()
+        finally:
+            connection.close()
+
+    def _read_events(self, response):
+        self.connected.set()
+        # Anything may have changed while disconnected.
+        self.on_change()
+
+        event = None
+        for raw in response:
+            if self._stopped.is_set():
+                return
+            line = raw.decode("utf-8").rstrip("\r\n")
+            if not line:
+                if event in ("status", "resync"):
+                    self.on_change()
+                event = None
+            elif line.startswith("id:"):
+                self._last_event_id = line[3:].strip()
+            elif line.startswith("event:"):
+                event = line[6:].strip()
@@ -2,10 +2,12 @@ import customtkinter as ctk
 from tkinter import messagebox
 from controllers.room_controller import RoomController
 from database.db import Database
-from models.enums import RoomStatus, UpdateSource
-from controllers.metrics_controller import MetricsController
+from models.enums import RoomStatus
 from datetime import datetime, timedelta
 from services.shift_service import ShiftService
+from ui.change_listener import ChangeListener
+from ui.refresh_worker import RefreshWorker
+from ui.room_grid import RoomGrid
 
 # ----------------------------
 # Initialize DB and controller
@@ -28,90 +30,7 @@ STATUS_PRIORITY = {
     RoomStatus.OUT_OF_SERVICE: 6,
 }
 
-# ----------------------------
-# Color mapping for statuses
-# ----------------------------
-
-STATUS_COLORS = {
-    RoomStatus.AVAILABLE: "#4CAF50",       # Green
-    RoomStatus.WAITING: "#FFEB3B",         # Yellow
-    RoomStatus.SEEING_PROVIDER: "#FF0000", # Purple
-    #RoomStatus.OCCUPIED: "#F44336",        # Red
-    RoomStatus.NEEDS_CLEANING: "#FF9800",  # Orange
-    RoomStatus.CLEANING: "#2196F3",        # Blue
-    RoomStatus.MAINTENANCE: "#444444",     # Gray
-    RoomStatus.OUT_OF_SERVICE: "#FFFFFF",   # White
-}
-
-# ----------------------------
-# Room Tile Widget
-# ----------------------------
-class RoomTile(ctk.CTkFrame):
-    def __init__(self, master, room, controller):
-        super().__init__(master, corner_radius=10, border_width=1, border_color="black")
-        self.room = room
-        self.controller = controller
-        self.grid_propagate(True)
-
-        # Room Name
-        self.name_label = ctk.CTkLabel(self, text=room["name"], font=("Arial", 14, "bold"))
-        self.name_label.grid(row=0, column=0, columnspan=3, pady=(5, 0))
-
-        # Status Label
-        self.status_label = ctk.CTkLabel(
-            self,
-            text=room["status"],
-            fg_color=STATUS_COLORS.get(RoomStatus(room["status"]), "#FFFFFF"),
-            corner_radius=5,
-        )
-        self.status_label.grid(row=1, column=0, columnspan=3, pady=5, sticky="ew")
-
-        # Buttons — single loop only
-        max_cols = 3  # number of buttons per row
-        self.buttons = []
-        for idx, status in enumerate(RoomStatus):
-            row = 2 + (idx // max_cols)
-            col = idx % max_cols
-            btn = ctk.CTkButton(
-                self,
-                text=status.value,
-                width=60,
-                height=25,
-                fg_color=STATUS_COLORS.get(status, "#CCCCCC"),
-                command=lambda s=status: self.update_status(s),
-            )
-            btn.grid(row=row, column=col, padx=2, pady=2, sticky="ew")
-            self.buttons.append(btn)
 
-    def update_status(self, new_status):
-        current_status = RoomStatus(self.room["status"])
-        
-        # Optional: skip no-op updates
-        if new_status == current_status:
-            return
-        
-        confirmed = messagebox.askyesno(
-            "Confirm Status Change",
-            f"Are you sure you want to change status of {self.room['name']} from {current_status.value} to {new_status.value}?"
-        )
-        if not confirmed:
-            return
-        
-        self.controller.update_status(self.room["id"], new_status, UpdateSource.MANUAL)
-        self.refresh()
-
-
-
-    def refresh(self):
-        room_dict = {r["id"]: r for r in self.controller.get_all_rooms()}
-        if self.room["id"] not in room_dict:
-            self.destroy()
-            return        
-        self.room = room_dict[self.room["id"]]
-        self.status_label.configure(
-            text=self.room["status"],
-            fg_color=STATUS_COLORS.get(RoomStatus(self.room["status"]), "#CCCCCC"),
-        )
 class MainWindow(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -122,7 +41,6 @@ class MainWindow(ctk.CTk):
         self.shift_service = ShiftService()
         self.db = None
         self.controller = None
-        self.metrics_controller = None
         
         self.active_start_date = None
         self.active_end_date = None
@@ -137,11 +55,17 @@ class MainWindow(ctk.CTk):
         # Scrollable Frame
         
         self.metric_labels = {}
-        self.room_tiles = []
 
         self._build_rooms_tab()
         self._build_metrics_tab()
 
+        # Room and metrics reads run off the Tk thread; see ui/refresh_worker.py.
+        self.refresh_worker = RefreshWorker(self, self.apply_refresh).start()
+        # Phone updates through the QR server arrive as pushed events; the
+        # one-second poll in auto_refresh stays as the fallback.
+        self.change_listener = ChangeListener(self.request_refresh).start()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
         self.initialize_active_shift()
         self.auto_refresh()
 
@@ -157,8 +81,8 @@ class MainWindow(ctk.CTk):
         ctk.CTkButton(controls, text="Add Room", command=self.add_room_dialog).pack(side="left", padx=20)
         ctk.CTkButton(controls, text="Remove Room", command=self.remove_room_dialog).pack(side="left", padx=4)
         
-        self.scrollable_frame = ctk.CTkScrollableFrame(self.rooms_tab)
-        self.scrollable_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self.room_grid = RoomGrid(self.rooms_tab)
+        self.room_grid.pack(fill="both", expand=True, padx=10, pady=10)
 
     def _build_metrics_tab(self):
         metrics_frame = ctk.CTkFrame(self.metrics_tab)
@@ -211,6 +135,9 @@ class MainWindow(ctk.CTk):
         add_metric("avg_cleaning", "Average Cleaning Time:", 2)
         add_metric("turnovers", "Total Turnovers:", 3)
         add_metric("stuck_rooms", "Rooms Stuck Needing Cleaning:", 4)
+        add_metric("p90_wait", "90th Percentile Waiting Time:", 5)
+        add_metric("p90_cleaning", "90th Percentile Cleaning Time:", 6)
+        add_metric("next_breach", "Next Room Due For Cleaning:", 7)
         
     def initialize_active_shift(self):
         active = self.shift_service.get_active_db_path()
@@ -226,9 +153,8 @@ class MainWindow(ctk.CTk):
 
         self.db = Database(str(db_path))
         self.controller = RoomController(self.db)
-        self.metrics_controller = MetricsController(self.db)
+        self.refresh_worker.bind(db_path)
         self.reload_rooms()
-        self.refresh_metrics()
 
     def start_shift(self):
         db_path, created = self.shift_service.start_shift()
@@ -250,10 +176,10 @@ class MainWindow(ctk.CTk):
         if not confirmed:
             return
 
+        self.refresh_worker.bind(None)
         self.db.close()
         self.db = None
         self.controller = None
-        self.metrics_controller = None
 
         old_path, archived_path, ended = self.shift_service.end_shift()
         if not ended:
@@ -262,11 +188,12 @@ class MainWindow(ctk.CTk):
 
         self.shift_status_label.configure(text="Shift: none (click Start Shift)")
         self.clear_rooms()
+        self.clear_metrics()
 
         messagebox.showinfo(
             "Shift Ended",
             f"Archived shift database:\n{archived_path}\n\n"
-            "Next step: upload this archived DB to your long-term analytics store.",
+            "Next step: run scripts/ingest_shift_archives.py to add it to the analytics store.",
         )
 
     def add_room_dialog(self):
@@ -289,7 +216,7 @@ class MainWindow(ctk.CTk):
             messagebox.showerror("Add Room Failed", str(exc))
             return
 
-        self.reload_rooms()
+        self.request_refresh(force=True)
 
     def remove_room_dialog(self):
         if not self.controller:
@@ -317,11 +244,11 @@ class MainWindow(ctk.CTk):
             return
 
         self.controller.delete_room(match["id"])
-        self.reload_rooms()
+        self.request_refresh(force=True)
 
     def apply_date_filter(self):
         self.apply_date_range()
-        self.refresh_metrics()
+        self.request_refresh(force=True)
 
         
     def build_date_vars(self):
@@ -335,20 +262,48 @@ class MainWindow(ctk.CTk):
         self.end_month = ctk.IntVar(value=now.month)
         self.end_day = ctk.IntVar(value=now.day)
     
-    def refresh_metrics(self):
-        if not self.metrics_controller:
-            for label in self.metric_labels.values():
-                label.configure(text="-")
-            return
-
-        data = self.metrics_controller.get_summary(start=self.active_start_date, end=self.active_end_date)
+    def request_refresh(self, force=False):
+        """
+        Asks the worker for fresh rooms and metrics; results land in
+        apply_refresh. Touches no widgets, so the change listener calls it
+        from its own thread.
+        """
+        if self.db:
+            self.refresh_worker.request(start=self.active_start_date, end=self.active_end_date, force=force)
 
+    def apply_refresh(self, result):
+        if result.error is not None:
+            # Keep what is on screen; the next tick retries.
+            return
 
-        self.metric_labels["avg_wait"].configure(text=data["avg_wait"])
-        self.metric_labels["avg_provider"].configure(text=data["avg_provider"])
-        self.metric_labels["avg_cleaning"].configure(text=data["avg_cleaning"])
-        self.metric_labels["turnovers"].configure(text=str(data["turnovers"]))
-        self.metric_labels["stuck_rooms"].configure(text=", ".join(map(str, data["stuck_rooms"])) or "-")
+        if result.rooms is not None:
+            rooms = sorted(result.rooms, key=lambda r: (STATUS_PRIORITY.get(RoomStatus(r["status"]), 99), r["name"]))
+            self.room_grid.set_rooms(rooms)
+
+        data = result.summary
+        if data is not None:
+            self.set_metric("avg_wait", data["avg_wait"])
+            self.set_metric("avg_provider", data["avg_provider"])
+            self.set_metric("avg_cleaning", data["avg_cleaning"])
+            self.set_metric("turnovers", str(data["turnovers"]))
+            if "p90_wait" in data:
+                self.set_metric("p90_wait", data["p90_wait"])
+                self.set_metric("p90_cleaning", data["p90_cleaning"])
+        self.show_stuck_rooms(result.stuck)
+
+    def clear_metrics(self):
+        for label in self.metric_labels.values():
+            label.configure(text="-")
+
+    def show_stuck_rooms(self, data):
+        self.set_metric("stuck_rooms", ", ".join(map(str, data["stuck_rooms"])) or "-")
+        next_breach = data["next_breach"]
+        self.set_metric("next_breach", f"{next_breach[0]} at {next_breach[1]:%H:%M}" if next_breach else "-")
+
+    def set_metric(self, key, text):
+        label = self.metric_labels[key]
+        if label.cget("text") != text:
+            label.configure(text=text)
         
     def apply_date_range(self):
         try:
@@ -380,49 +335,23 @@ class MainWindow(ctk.CTk):
             self.active_end_date = None
         
     def clear_rooms(self):
-        for tile in self.room_tiles:
-            tile.destroy()
-        self.room_tiles = []
+        self.room_grid.reset(None)
 
     def reload_rooms(self):
-        self.clear_rooms()
-
-        if not self.controller:
-            return
-
-        rooms = self.controller.get_all_rooms()
-        rooms.sort(key=lambda r: (STATUS_PRIORITY.get(RoomStatus(r["status"]), 99), r["name"]))
-
-        for idx, room in enumerate(rooms):
-            tile = RoomTile(self.scrollable_frame, room, self.controller)
-            tile.grid(row=idx // 4, column=idx % 4, padx=10, pady=10)
-            self.room_tiles.append(tile)
-
-    def refresh_tiles(self):
-        if not self.controller:
-            return
-        
-        rooms = self.controller.get_all_rooms()
-        rooms.sort(key=lambda r: (STATUS_PRIORITY.get(RoomStatus(r["status"]), 99), r["name"]))
-
-        room_map = {tile.room["id"]: tile for tile in self.room_tiles}
-
-        if len(room_map) != len(rooms) or any(room["id"] not in room_map for room in rooms):
-            self.reload_rooms()
-            return
-
-
-        for idx, room in enumerate(rooms):
-            tile = room_map[room["id"]]
-            tile.room = room
-            tile.refresh()
-            tile.grid(row=idx // 4, column=idx % 4)
+        self.room_grid.reset(self.controller)
+        self.request_refresh(force=True)
 
     def auto_refresh(self):
-        self.refresh_tiles()
-        self.refresh_metrics()
+        # Only queues a request; the worker skips everything but the stuck
+        # rooms until some connection has committed a change.
+        self.request_refresh()
         self.after(1000, self.auto_refresh)
 
+    def on_close(self):
+        self.change_listener.stop(timeout=2)
+        self.refresh_worker.stop(timeout=2)
+        self.destroy()
+
 # ----------------------------
 # Run the app
 # ----------------------------
@@ -0,0 +1,210 @@
+"""
+Background reads for the desktop dashboard.
+
+The Tk main loop only queues refresh requests and applies finished
+results; the room list and metrics summary are read on a worker thread
+with its own connection to the shift DB. Requests that arrive while the
+worker is busy collapse into one, and a result is dropped if the shift
+was rebound or a forced refresh (e.g. a new date range) was asked for
+after it started.
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+from controllers.metrics_controller import MetricsController
+from controllers.room_controller import RoomController
+from database.db import ConnectionPool, data_version
+
+
+# How often the Tk side drains finished results.
+POLL_INTERVAL_MS = 50
+# Percentiles read every visit in range, so changes alone re-read them at
+# most this often; forced refreshes and a new shift always do.
+PERCENTILE_REFRESH_SECONDS = 60
+
+
+@dataclass
+class RefreshRequest:
+    generation: int
+    ticket: int
+    db_path: str
+    start: str = None
+    end: str = None
+    force: bool = False
+
+
+@dataclass
+class RefreshResult:
+    """
+    rooms and summary are None when the DB was unchanged since the last
+    full read; stuck is re-read every time since it ages with the clock.
+    The summary carries the percentile fields only when they were re-read.
+    """
+
+    generation: int
+    ticket: int
+    rooms: list = None
+    summary: dict = None
+    stuck: dict = None
+    error: Exception = None
+
+
+class RefreshWorker:
+    def __init__(
+        self,
+        root,
+        on_result,
+        poll_interval_ms=POLL_INTERVAL_MS,
+        percentile_refresh_seconds=PERCENTILE_REFRESH_SECONDS,
+    ):
+        self.root = root
+        self.on_result = on_result
+        self.poll_interval_ms = poll_interval_ms
+        self.percentile_refresh_seconds = percentile_refresh_seconds
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._results = queue.Queue()
+        self._pool = ConnectionPool(max_idle=1)
+        self._thread = None
+        self._stopping = False
+
+        self._db_path = None
+        self._generation = 0
+        self._ticket = 0
+        self._pending = None
+        # Oldest ticket whose result may still be shown.
+        self._min_ticket = 0
+        # Worker-side only: data version of the last full read.
+        self._seen_version = None
+        self._seen_generation = None
+        self._percentiles_read_at = None
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="dashboard-refresh", daemon=True)
+                self._thread.start()
+        self.root.after(self.poll_interval_ms, self._poll)
+        return self
+
+    def stop(self, timeout=None):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+            self._stopping = True
+        self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+        self._pool.close_all()
+
+    def bind(self, db_path):
+        """Points the worker at another shift DB (None to unbind); in-flight results are dropped."""
+        with self._lock:
+            self._db_path = str(db_path) if db_path is not None else None
+            self._generation += 1
+            self._pending = None
+        if db_path is None:
+            self._pool.close_all()
+
+    # ---------------------------
+    # Tk side
+    # ---------------------------
+    def request(self, start=None, end=None, force=False):
+        """
+        Queues a refresh and returns at once. Rooms and the summary are
+        re-read when the DB changed or force is set; otherwise only the
+        stuck rooms are. A request made while another is still pending
+        replaces it, keeping force if either asked for it.
+        """
+        with self._lock:
+            if self._db_path is None:
+                return
+            self._ticket += 1
+            if force:
+                self._min_ticket = self._ticket
+            force = force or (self._pending is not None and self._pending.force)
+            self._pending = RefreshRequest(self._generation, self._ticket, self._db_path, start, end, force)
+        self._wake.set()
+
+    def deliver(self):
+        """Hands finished, still-current results to on_result. Runs on the Tk thread."""
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                return
+            with self._lock:
+                stale = result.generation != self._generation or result.ticket < self._min_ticket
+            if not stale:
+                self.on_result(result)
+
+    def _poll(self):
+        self.deliver()
+        if not self._stopping:
+            self.root.after(self.poll_interval_ms, self._poll)
+
+    # ---------------------------
+    # Worker
+    # ---------------------------
+    def _next_request(self):
+        while True:
+            self._wake.wait()
+            with self._lock:
+                self._wake.clear()
+                if self._stopping:
+                    return None
+                request, self._pending = self._pending, None
+            if request is not None:
+                return request
+
+    def _run(self):
+        while True:
+            request = self._next_request()
+            if request is None:
+                return
+            self._results.put(self._read(request))
+
+    def _read(self, request):
+        result = RefreshResult(request.generation, request.ticket)
+        try:
+            with self._pool.connection(request.db_path) as db:
+                metrics = MetricsController(db)
+                version = data_version(db.conn)
+                unchanged = (
+                    not request.force
+                    and request.generation == self._seen_generation
+                    and version == self._seen_version
+                )
+                if unchanged:
+                    result.stuck = metrics.get_stuck_rooms()
+                    return result
+
+                read_at = time.monotonic()
+                with_percentiles = (
+                    request.force
+                    or request.generation != self._seen_generation
+                    or self._percentiles_read_at is None
+                    or read_at - self._percentiles_read_at >= self.percentile_refresh_seconds
+                )
+                result.rooms = RoomController(db).get_all_rooms()
+                result.summary = metrics.get_summary(
+                    start=request.start, end=request.end, include_distributions=with_percentiles
+                )
+                result.stuck = {key: result.summary[key] for key in ("stuck_rooms", "next_breach")}
+        except Exception as exc:
+            result.error = exc
+            return result
+
+        self._seen_version = version
+        self._seen_generation = request.generation
+        if with_percentiles:
+            self._percentiles_read_at = read_at
+        return result
@@ -0,0 +1,126 @@
+import math
+import tkinter as tk
+
+import customtkinter as ctk
+
+from ui.room_tile import RoomTile
+
+
+# Cell size in pixels, tile padding included.
+CELL_WIDTH = 240
+CELL_HEIGHT = 190
+TILE_PADDING = 10
+
+
+# ----------------------------
+# Virtualized Room Grid
+# ----------------------------
+class RoomGrid(ctk.CTkFrame):
+    """
+    Scrollable grid of room tiles that only builds widgets for the rows in
+    view. The canvas scroll region spans every room, but the tiles are a
+    small pool sized to the viewport; on scroll or resize each pooled tile
+    is moved to a visible cell and pushed that cell's row, so a shift with
+    hundreds of rooms costs the same number of widgets as a full screen.
+    """
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.controller = None
+        self.rooms = []
+        self.pool = []  # (tile, canvas window id)
+        self.columns = 1
+
+        self.canvas = tk.Canvas(self, highlightthickness=0, borderwidth=0, yscrollincrement=20)
+        self.canvas.configure(bg=self._apply_appearance_mode(self.cget("fg_color")))
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.canvas.bind("<Configure>", lambda _event: self._relayout())
+        # Wheel events go to the widget under the pointer, usually a tile;
+        # bound app-wide and filtered to this grid's descendants.
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.bind_all(sequence, self._on_mousewheel, add="+")
+
+    # ---------------------------
+    # Data
+    # ---------------------------
+    def reset(self, controller):
+        """Drops every pooled tile, e.g. when a different shift DB is bound."""
+        for tile, window in self.pool:
+            self.canvas.delete(window)
+            tile.destroy()
+        self.pool = []
+        self.rooms = []
+        self.controller = controller
+        self._relayout()
+
+    def set_rooms(self, rooms):
+        """Shows rooms (already sorted) in grid order; only visible tiles are touched."""
+        self.rooms = list(rooms)
+        self._relayout()
+
+    # ---------------------------
+    # Layout
+    # ---------------------------
+    def _relayout(self):
+        width = max(self.canvas.winfo_width(), CELL_WIDTH)
+        self.columns = max(1, width // CELL_WIDTH)
+        rows = math.ceil(len(self.rooms) / self.columns)
+        self.canvas.configure(scrollregion=(0, 0, self.columns * CELL_WIDTH, rows * CELL_HEIGHT))
+        self._layout()
+
+    def _layout(self):
+        top = self.canvas.canvasy(0)
+        first_row = max(0, int(top // CELL_HEIGHT))
+        visible_rows = math.ceil(max(self.canvas.winfo_height(), 1) / CELL_HEIGHT) + 1
+        first = first_row * self.columns
+        needed = min(visible_rows * self.columns, max(0, len(self.rooms) - first))
+
+        while len(self.pool) < needed and self.controller is not None:
+            self.pool.append(self._new_tile(self.rooms[first + len(self.pool)]))
+
+        for offset, (tile, window) in enumerate(self.pool):
+            index = first + offset
+            if offset >= needed:
+                self.canvas.itemconfigure(window, state="hidden")
+                continue
+
+            row, column = divmod(index, self.columns)
+            tile.show(self.rooms[index])
+            self.canvas.coords(window, column * CELL_WIDTH + TILE_PADDING, row * CELL_HEIGHT + TILE_PADDING)
+            self.canvas.itemconfigure(window, state="normal")
+
+    def _new_tile(self, room):
+        tile = RoomTile(self.canvas, room, self.controller)
+        window = self.canvas.create_window(
+            0,
+            0,
+            window=tile,
+            anchor="nw",
+            width=CELL_WIDTH - 2 * TILE_PADDING,
+            height=CELL_HEIGHT - 2 * TILE_PADDING,
+        )
+        return tile, window
+
+    # ---------------------------
+    # Scrolling
+    # ---------------------------
+    def _on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+        self._layout()
+
+    def _on_mousewheel(self, event):
+        widget = self.winfo_containing(event.x_root, event.y_root)
+        if widget is None or not (str(widget) == str(self) or str(widget).startswith(f"{self}.")):
+            return
+
+        if event.num == 4 or event.delta > 0:
+            step = -1
+        else:
+            step = 1
+        self.canvas.yview_scroll(step * 3, "units")
+        self._layout()
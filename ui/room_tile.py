@@ -0,0 +1,97 @@
+import tkinter as tk
+import customtkinter as ctk
+from tkinter import messagebox
+
+from models.enums import RoomStatus, UpdateSource
+from models.status_colors import STATUS_COLORS
+
+
+# ----------------------------
+# Room Tile Widget
+# ----------------------------
+class RoomTile(ctk.CTkFrame):
+    """
+    One room on the Rooms tab. The owner pushes the tile its row with
+    show(), which never queries the DB and only reconfigures what changed;
+    RoomGrid recycles a tile for another room the same way. The status
+    buttons are built on first hover or click, since most tiles are only
+    ever looked at.
+    """
+
+    def __init__(self, master, room, controller):
+        super().__init__(master, corner_radius=10, border_width=1, border_color="black")
+        self.room = room
+        self.controller = controller
+        self.buttons = []
+        self.grid_propagate(False)
+        self.grid_columnconfigure((0, 1, 2), weight=1)
+
+        # Room Name
+        self.name_label = ctk.CTkLabel(self, text=room["name"], font=("Arial", 14, "bold"))
+        self.name_label.grid(row=0, column=0, columnspan=3, pady=(5, 0))
+
+        # Status Label
+        self.status_label = ctk.CTkLabel(
+            self,
+            text=room["status"],
+            fg_color=STATUS_COLORS.get(RoomStatus(room["status"]), "#FFFFFF"),
+            corner_radius=5,
+        )
+        self.status_label.grid(row=1, column=0, columnspan=3, pady=5, sticky="ew")
+
+        # The frame itself, not CTk's inner canvas, so entering any child counts.
+        tk.Misc.bind(self, "<Enter>", lambda _event: self.ensure_buttons(), "+")
+        self.name_label.bind("<Button-1>", lambda _event: self.ensure_buttons())
+        self.status_label.bind("<Button-1>", lambda _event: self.ensure_buttons())
+
+    def ensure_buttons(self):
+        if self.buttons:
+            return
+
+        # Buttons — single loop only
+        max_cols = 3  # number of buttons per row
+        for idx, status in enumerate(RoomStatus):
+            row = 2 + (idx // max_cols)
+            col = idx % max_cols
+            btn = ctk.CTkButton(
+                self,
+                text=status.value,
+                width=60,
+                height=25,
+                fg_color=STATUS_COLORS.get(status, "#CCCCCC"),
+                command=lambda s=status: self.update_status(s),
+            )
+            btn.grid(row=row, column=col, padx=2, pady=2, sticky="ew")
+            self.buttons.append(btn)
+
+    def update_status(self, new_status):
+        current_status = RoomStatus(self.room["status"])
+        
+        # Optional: skip no-op updates
+        if new_status == current_status:
+            return
+        
+        confirmed = messagebox.askyesno(
+            "Confirm Status Change",
+            f"Are you sure you want to change status of {self.room['name']} from {current_status.value} to {new_status.value}?"
+        )
+        if not confirmed:
+            return
+        
+        self.controller.update_status(self.room["id"], new_status, UpdateSource.MANUAL)
+        # Primary-key lookup of this room only; the grid catches up on its next tick.
+        room = self.controller.get_room(self.room["id"])
+        if room is not None:
+            self.show(room)
+
+    def show(self, room):
+        """Applies a fresh row for this room, touching only what changed."""
+        previous = self.room
+        self.room = room
+        if room["name"] != previous["name"]:
+            self.name_label.configure(text=room["name"])
+        if room["status"] != previous["status"]:
+            self.status_label.configure(
+                text=room["status"],
+                fg_color=STATUS_COLORS.get(RoomStatus(room["status"]), "#CCCCCC"),
+            )
@@ -0,0 +1,50 @@
+"""
+Conversions between stored timestamps and datetimes.
+
+History and visit times are stored as integer milliseconds since the Unix
+epoch (UTC). Naive datetimes and ISO strings coming in from the UI, the
+seeders or older shift files are taken as local time, and times handed
+back out are naive local datetimes.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+_last_stamp_ms = 0
+_stamp_lock = threading.Lock()
+
+
+def now_ms():
+    return time.time_ns() // 1_000_000
+
+
+def next_stamp_ms():
+    """
+    now_ms(), bumped so successive calls in this process never repeat.
+    Transitions stamped back to back then still order strictly, which the
+    visit windows rely on.
+    """
+    global _last_stamp_ms
+    with _stamp_lock:
+        _last_stamp_ms = max(now_ms(), _last_stamp_ms + 1)
+        return _last_stamp_ms
+
+
+def to_epoch_ms(value):
+    """Epoch milliseconds for a datetime, ISO string or epoch-ms int; None passes through."""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    return round(value.timestamp() * 1000)
+
+
+def from_epoch_ms(value):
+    """Naive local datetime for epoch milliseconds; None passes through."""
+    if value is None:
+        return None
+    value = int(value)
+    return datetime.fromtimestamp(value // 1000).replace(microsecond=(value % 1000) * 1000)
@@ -0,0 +1,291 @@
+"""
+Asyncio front end for the QR update server.
+
+Connections are handled on one event loop with HTTP/1.1 keep-alive. Each
+request is routed through the same ``QRHandler`` methods as the threaded
+server, but database work is scheduled explicitly: handlers run on a
+bounded thread pool, and a semaphore caps how many requests are in flight
+at once. A ``POST`` only validates there and queues its transition with
+the shared ``UpdateQueue``; the request then awaits the commit on the
+loop, so concurrent updates reach the single writer together and share
+one group commit.
+``/events`` and ``/board/events`` streams are served on the loop itself:
+each subscriber awaits the change feed, so it holds neither a thread nor
+an in-flight slot, and board viewers are fed from memory.
+
+Run with ``python -m web.async_server``.
+"""
+
+import asyncio
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.client import parse_headers
+from urllib.parse import parse_qs, urlparse
+
+from web.qr_server import (
+    CHANGE_FEED,
+    EVENT_STREAM_PATHS,
+    HOST,
+    PORT,
+    SSE_HEADERS,
+    SSE_KEEPALIVE_SECONDS,
+    QRHandler,
+    feed_chunk,
+    guess_reachable_host,
+    open_feed_stream,
+)
+
+
+MAX_IN_FLIGHT = int(os.getenv("NEXUS_QR_MAX_IN_FLIGHT", "64"))
+READ_WORKERS = int(os.getenv("NEXUS_QR_READ_WORKERS", "8"))
+KEEP_ALIVE_TIMEOUT = float(os.getenv("NEXUS_QR_KEEP_ALIVE_TIMEOUT", "15"))
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class BufferedQRHandler(QRHandler):
+    """
+    QRHandler driven from an already-parsed request instead of a socket.
+    The full response (status line, headers, body) is collected in memory.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, method, target, version, headers, body, client_address):
+        # BaseHTTPRequestHandler.__init__ would start reading a socket.
+        self.command = method
+        self.path = target
+        self.request_version = version
+        self.requestline = f"{method} {target} {version}"
+        self.headers = headers
+        self.rfile = io.BytesIO(body)
+        self.wfile = io.BytesIO()
+        self.client_address = client_address
+        self.close_connection = False
+        # (future, respond) of a queued write, finished by the server.
+        self.pending_write = None
+
+    def run(self):
+        handler = getattr(self, f"do_{self.command}", None)
+        if handler is None:
+            self.send_error(HTTPStatus.NOT_IMPLEMENTED)
+        else:
+            handler()
+        return self.wfile.getvalue()
+
+    def _after_commit(self, future, respond):
+        # Waiting here would hold a pool thread for the whole commit.
+        self.pending_write = (future, respond)
+
+
+def _error_response(status: HTTPStatus):
+    body = f"<h1>{status.phrase}</h1>".encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: text/html; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode("latin-1")
+    return head + body
+
+
+class AsyncQRServer:
+    def __init__(
+        self,
+        host=HOST,
+        port=PORT,
+        max_in_flight=MAX_IN_FLIGHT,
+        read_workers=READ_WORKERS,
+        keep_alive_timeout=KEEP_ALIVE_TIMEOUT,
+    ):
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        self.read_workers = read_workers
+        self.keep_alive_timeout = keep_alive_timeout
+
+        self._server = None
+        self._in_flight = None
+        self._read_executor = None
+        self._streams = set()
+        # Writers of keep-alive connections waiting for their next request.
+        self._idle = set()
+        self._closing = False
+
+    async def start(self):
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._read_executor = ThreadPoolExecutor(max_workers=self.read_workers, thread_name_prefix="qr-read")
+
+        self._server = await asyncio.start_server(
+            self._serve_connection, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+        # wait_closed() waits for open connections (Python 3.12.1+), so end
+        # them first: event streams never end on their own, and an idle
+        # keep-alive connection would otherwise linger until it times out.
+        # Busy connections finish their request and then stop.
+        streams = list(self._streams)
+        for task in streams:
+            task.cancel()
+        await asyncio.gather(*streams, return_exceptions=True)
+        for writer in list(self._idle):
+            writer.close()
+        if self._server is not None:
+            await self._server.wait_closed()
+        if self._read_executor is not None:
+            self._read_executor.shutdown(wait=True)
+
+    async def _dispatch(self, handler):
+        response = await asyncio.get_running_loop().run_in_executor(self._read_executor, handler.run)
+        if handler.pending_write is None:
+            return response
+
+        # SQLite takes one writer at a time; the UpdateQueue's writer thread
+        # orders and group-commits, so waiting on it costs only a future.
+        future, respond = handler.pending_write
+        try:
+            await asyncio.wrap_future(future)
+        except Exception:
+            # respond() reports it.
+            pass
+        respond(future)
+        return handler.wfile.getvalue()
+
+    async def _read_request(self, reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        request_line, _, header_block = head.partition(b"\r\n")
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise ValueError("malformed request line")
+        method, target, version = parts
+
+        headers = parse_headers(io.BytesIO(header_block))
+        if "chunked" in headers.get("Transfer-Encoding", "").lower():
+            raise ValueError("chunked request bodies are not supported")
+
+        length = int(headers.get("Content-Length", "0") or 0)
+        if length < 0 or length > MAX_BODY_BYTES:
+            raise ValueError("request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, version, headers, body
+
+    async def _serve_connection(self, reader, writer):
+        client_address = writer.get_extra_info("peername")
+        try:
+            while not self._closing:
+                self._idle.add(writer)
+                try:
+                    request = await asyncio.wait_for(
+                        self._read_request(reader), timeout=self.keep_alive_timeout
+                    )
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except (ValueError, asyncio.LimitOverrunError):
+                    writer.write(_error_response(HTTPStatus.BAD_REQUEST))
+                    await writer.drain()
+                    break
+                finally:
+                    self._idle.discard(writer)
+
+                method, target, version, headers, body = request
+                if method == "GET" and urlparse(target).path in EVENT_STREAM_PATHS:
+                    await self._stream_events(writer, target, headers)
+                    break
+
+                handler = BufferedQRHandler(method, target, version, headers, body, client_address)
+
+                async with self._in_flight:
+                    try:
+                        response = await self._dispatch(handler)
+                    except Exception:
+                        writer.write(_error_response(HTTPStatus.INTERNAL_SERVER_ERROR))
+                        await writer.drain()
+                        break
+
+                writer.write(response)
+                await writer.drain()
+
+                connection = headers.get("Connection", "").lower()
+                if handler.close_connection or connection == "close" or (
+                    version == "HTTP/1.0" and connection != "keep-alive"
+                ):
+                    break
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _stream_events(self, writer, target, headers):
+        url = urlparse(target)
+        # The first board snapshot may need a database read.
+        opened = await asyncio.get_running_loop().run_in_executor(
+            self._read_executor, open_feed_stream, url.path, parse_qs(url.query), headers
+        )
+        if opened is None:
+            writer.write(_error_response(HTTPStatus.FORBIDDEN))
+            await writer.drain()
+            return
+        opening, cursor = opened
+
+        head = "HTTP/1.1 200 OK\r\n" + "".join(f"{name}: {value}\r\n" for name, value in SSE_HEADERS)
+        writer.write(f"{head}Connection: close\r\n\r\n".encode("latin-1") + opening)
+
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        self._streams.add(task)
+        try:
+            await writer.drain()
+            # close() cancels this task, but a wait that completes in the
+            # same tick can absorb the cancellation (asyncio.wait_for before
+            # 3.12); the flag ends the stream regardless.
+            while not self._closing:
+                changes = await CHANGE_FEED.since_async(cursor, SSE_KEEPALIVE_SECONDS)
+                if changes is None:
+                    # A board viewer that hit a gap gets a fresh snapshot,
+                    # which may read the database.
+                    chunk, cursor = await loop.run_in_executor(
+                        self._read_executor, feed_chunk, url.path, cursor, changes
+                    )
+                else:
+                    chunk, cursor = feed_chunk(url.path, cursor, changes)
+                writer.write(chunk)
+                await writer.drain()
+        except ConnectionError:
+            # The subscriber went away.
+            return
+        except asyncio.CancelledError:
+            if not self._closing:
+                raise
+            # Ended by close(); the connection closes normally from here.
+            return
+        finally:
+            self._streams.discard(task)
+
+
+def main():
+    server = AsyncQRServer()
+    print(f"Async QR server running on http://{HOST}:{PORT} (max in-flight {server.max_in_flight})")
+    if HOST == "0.0.0.0":
+        print(f"Use this LAN URL in QR generation: http://{guess_reachable_host()}:{PORT}")
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,63 @@
 import hashlib
-import hmac
+import json
 import os
 import socket
+import threading
+from collections import OrderedDict
+from concurrent.futures import wait
+from dataclasses import dataclass
 from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
 from html import escape
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from urllib.parse import parse_qs, urlparse
 
 from controllers.room_controller import RoomController
-from database.db import Database
+from database.db import ConnectionPool
 from models.enums import RoomStatus, UpdateSource
-from services.shift_service import ShiftService
+from models.status_colors import STATUS_COLORS
+from services.room_board import RoomBoard
+from services.shift_service import active_db_path
+from services.update_service import UpdateQueue
+# The feed and board URL helpers stay importable from the server.
+from services.url_signing import (  # noqa: F401
+    FEED_ROLE,
+    FEED_SCOPE,
+    create_board_url,
+    create_feed_url,
+    sign,
+    verify,
+)
 
 
 HOST = os.getenv("NEXUS_QR_HOST", "0.0.0.0")
 PORT = int(os.getenv("NEXUS_QR_PORT", "8787"))
-SECRET = os.getenv("NEXUS_QR_SECRET", "change-me")
 
 ANY_ROOM_SCOPE = "any"
 
+MAX_BATCH_UPDATES = 500
+
+# Shared by every request thread; follows the active shift DB.
+DB_POOL = ConnectionPool()
+
+# Committed status changes plus the in-memory room board, streamed to
+# /events and /board/events subscribers.
+CHANGE_FEED = RoomBoard(db_path_resolver=lambda: active_db_path())
+
+# Every status change from any request thread funnels through one writer.
+UPDATE_QUEUE = UpdateQueue(db_path_resolver=lambda: active_db_path(), change_feed=CHANGE_FEED)
+
+FORM_CACHE_SIZE = 256
+
+# An idle stream gets a comment line this often so dead clients are noticed.
+SSE_KEEPALIVE_SECONDS = 15
+SSE_RETRY_MS = 2000
+SSE_HEADERS = (
+    ("Content-Type", "text/event-stream"),
+    ("Cache-Control", "no-cache"),
+)
+EVENT_STREAM_PATHS = {"/events", "/board/events"}
+
 
 def guess_reachable_host() -> str:
     try:
@@ -32,28 +71,302 @@ def guess_reachable_host() -> str:
     return "127.0.0.1"
 
 
-def _sign(scope: str, role: str) -> str:
-    payload = f"{scope}:{role.lower()}".encode("utf-8")
-    return hmac.new(SECRET.encode("utf-8"), payload, hashlib.sha256).hexdigest()
-
-
-def _verify(scope: str, role: str, signature: str) -> bool:
-    expected = _sign(scope, role)
-    return hmac.compare_digest(expected, signature)
-
-
-def _active_db_path():
-    service = ShiftService()
-    active = service.get_active_db_path()
-    return str(active) if active else "clinic.db"
+@dataclass(frozen=True)
+class CachedPage:
+    body: bytes
+    etag: str
+    last_modified: float
+
+
+class FormCache:
+    """
+    Pre-encoded form pages keyed by (db, scope, role) plus the variant
+    (room-set version, current status) they were rendered for. A page is
+    rendered once per key and then served as bytes with a content-hash
+    ETag. Last-Modified moves forward whenever the variant served for a
+    form changes, so If-Modified-Since stays correct when a room returns
+    to a status it had before. The header only carries whole seconds, so
+    each form's stamps are whole seconds that always step to a later one.
+    """
+
+    def __init__(self, max_entries=FORM_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pages = OrderedDict()
+        self._current_variant = {}
+        self._last_modified = {}
+
+    def _stamp(self, form_key):
+        # Called with the lock held.
+        stamp = max(int(datetime.now().timestamp()), self._last_modified.get(form_key, 0) + 1)
+        self._last_modified[form_key] = stamp
+        return stamp
+
+    def get_or_render(self, form_key, variant, render):
+        key = (form_key, variant)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                if self._current_variant.get(form_key) != variant:
+                    page = CachedPage(page.body, page.etag, self._stamp(form_key))
+                    self._pages[key] = page
+                    self._current_variant[form_key] = variant
+                return page
+
+        body = render().encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:32]
+
+        with self._lock:
+            page = CachedPage(body=body, etag=f'"{digest}"', last_modified=self._stamp(form_key))
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            self._current_variant[form_key] = variant
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._current_variant.clear()
+            self._last_modified.clear()
+
+
+FORM_CACHE = FormCache()
+
+
+def _render_board_page():
+    """
+    The read-only board. Static: the script fills it from /board/events
+    (a snapshot, then one small JSON delta per change), so one encoded
+    page serves every viewer.
+    """
+    status_styles = "".join(
+        f".s-{status.value} {{ background: {color}; }}\n" for status, color in STATUS_COLORS.items()
+    )
+    return f"""
+    <html>
+      <head>
+        <meta charset="utf-8" />
+        <meta name="viewport" content="width=device-width, initial-scale=1" />
+        <title>Nexus Room Board</title>
+        <style>
+          body {{ font-family: sans-serif; max-width: 1200px; margin: 20px auto; }}
+          #rooms {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(180px, 1fr)); gap: 10px; }}
+          .room {{ border: 1px solid black; border-radius: 10px; padding: 10px; text-align: center; }}
+          .status {{ border-radius: 5px; padding: 4px; margin-top: 6px; }}
+          {status_styles}
+        </style>
+      </head>
+      <body>
+        <h1>Nexus Room Board</h1>
+        <p id="state">Connecting...</p>
+        <div id="rooms"></div>
+        <script>
+          const grid = document.getElementById("rooms");
+          const state = document.getElementById("state");
+          const tiles = new Map();
+
+          function tile(roomId) {{
+            let entry = tiles.get(roomId);
+            if (!entry) {{
+              const root = document.createElement("div");
+              root.className = "room";
+              const name = document.createElement("b");
+              const status = document.createElement("div");
+              root.append(name, status);
+              entry = {{ root, name, status }};
+              tiles.set(roomId, entry);
+            }}
+            return entry;
+          }}
+
+          function show(room) {{
+            const entry = tile(room.room_id);
+            if (room.name !== undefined) entry.name.textContent = room.name;
+            entry.status.textContent = room.status;
+            entry.status.className = "status s-" + room.status;
+            return entry;
+          }}
+
+          function sortTiles() {{
+            const ordered = [...tiles.values()].sort((a, b) => a.name.textContent.localeCompare(b.name.textContent));
+            grid.replaceChildren(...ordered.map((entry) => entry.root));
+          }}
+
+          const sig = new URLSearchParams(location.search).get("sig") || "";
+          const source = new EventSource("/board/events?sig=" + encodeURIComponent(sig));
+          source.onopen = () => {{ state.textContent = "Live"; }};
+          source.onerror = () => {{ state.textContent = "Reconnecting..."; }};
+
+          source.addEventListener("snapshot", (event) => {{
+            tiles.clear();
+            JSON.parse(event.data).rooms.forEach(show);
+            sortTiles();
+          }});
+
+          source.addEventListener("status", (event) => {{
+            const change = JSON.parse(event.data);
+            if (change.status === null) {{
+              const entry = tiles.get(change.room_id);
+              if (entry) entry.root.remove();
+              tiles.delete(change.room_id);
+              return;
+            }}
+            const isNew = !tiles.has(change.room_id);
+            show(change);
+            if (isNew || change.name !== undefined) sortTiles();
+          }});
+        </script>
+      </body>
+    </html>
+    """
+
+
+def _static_page(html):
+    body = html.encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return CachedPage(body=body, etag=f'"{digest}"', last_modified=int(datetime.now().timestamp()))
+
+
+BOARD_PAGE = _static_page(_render_board_page())
+
+
+def _not_modified(headers, page: CachedPage) -> bool:
+    # If-None-Match wins when present; If-Modified-Since is then ignored
+    # (RFC 9110 13.1.3).
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in tags or page.etag in tags or f"W/{page.etag}" in tags
+
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return page.last_modified <= since
+
+    return False
+
+
+def open_feed_stream(path, params, headers):
+    """
+    Opening bytes and cursor for an /events or /board/events subscriber,
+    or None when the signature is bad. A reconnecting client resumes
+    after Last-Event-ID (or ?since=). A new /events client starts at the
+    latest change; a new board viewer, or one whose cursor fell out of
+    the kept history, starts from a snapshot of the board.
+    """
+    if not verify(FEED_SCOPE, FEED_ROLE, params.get("sig", [""])[0]):
+        return None
+
+    CHANGE_FEED.start()
+    opening = f"retry: {SSE_RETRY_MS}\n\n".encode("utf-8")
+    try:
+        cursor = int(headers.get("Last-Event-ID") or params.get("since", [""])[0])
+    except ValueError:
+        cursor = None
+
+    if path == "/board/events" and (cursor is None or CHANGE_FEED.since(cursor, timeout=0) is None):
+        snapshot, cursor = board_snapshot_chunk()
+        return opening + snapshot, cursor
+    if cursor is None:
+        cursor = CHANGE_FEED.latest_seq
+    return opening, cursor
+
+
+def feed_chunk(path, cursor, changes):
+    """Next bytes of an event stream; a board viewer that hit a gap gets a fresh snapshot."""
+    if changes is None and path == "/board/events":
+        return board_snapshot_chunk()
+    return sse_chunk(cursor, changes)
+
+
+def board_snapshot_chunk():
+    seq, rooms = CHANGE_FEED.snapshot()
+    data = json.dumps({"seq": seq, "rooms": rooms}, separators=(",", ":"))
+    return f"id: {seq}\nevent: snapshot\ndata: {data}\n\n".encode("utf-8"), seq
+
+
+def sse_chunk(cursor, changes):
+    """
+    Encodes one CHANGE_FEED read as SSE and returns it with the cursor to
+    continue from. None (history gap) becomes a resync event telling the
+    client to re-read every room; [] (timeout) becomes a keep-alive.
+    """
+    if changes is None:
+        latest = CHANGE_FEED.latest_seq
+        return f"id: {latest}\nevent: resync\ndata: {{}}\n\n".encode("utf-8"), latest
+    if not changes:
+        return b": keep-alive\n\n", cursor
+
+    body = "".join(
+        f"id: {change.seq}\nevent: status\ndata: {json.dumps(change.to_dict(), separators=(',', ':'))}\n\n"
+        for change in changes
+    )
+    return body.encode("utf-8"), changes[-1].seq
 
 
 class QRHandler(BaseHTTPRequestHandler):
     def _send_html(self, body: str, status=200):
+        payload = body.encode("utf-8")
         self.send_response(status)
         self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
         self.end_headers()
-        self.wfile.write(body.encode("utf-8"))
+        self.wfile.write(payload)
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_page(self, page: CachedPage):
+        not_modified = _not_modified(self.headers, page)
+        self.send_response(304 if not_modified else 200)
+        self.send_header("ETag", page.etag)
+        self.send_header("Last-Modified", formatdate(page.last_modified, usegmt=True))
+        # Always revalidate: the page changes as soon as the room status does.
+        self.send_header("Cache-Control", "no-cache")
+        if not_modified:
+            self.end_headers()
+            return
+
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(page.body)))
+        self.end_headers()
+        self.wfile.write(page.body)
+
+    def _stream_events(self, path, params):
+        opened = open_feed_stream(path, params, self.headers)
+        if opened is None:
+            self._send_html("<h1>Invalid signature</h1>", 403)
+            return
+        opening, cursor = opened
+
+        self.close_connection = True
+        self.send_response(200)
+        for name, value in SSE_HEADERS:
+            self.send_header(name, value)
+        self.end_headers()
+
+        try:
+            self.wfile.write(opening)
+            self.wfile.flush()
+            while True:
+                changes = CHANGE_FEED.since(cursor, SSE_KEEPALIVE_SECONDS)
+                chunk, cursor = feed_chunk(path, cursor, changes)
+                self.wfile.write(chunk)
+                self.wfile.flush()
+        except ConnectionError:
+            # The subscriber went away.
+            return
 
     def _render_single_room_form(self, room, role: str, signature: str):
         current_status = RoomStatus(room["status"])
@@ -80,7 +393,7 @@ class QRHandler(BaseHTTPRequestHandler):
           </body>
         </html>
         """
-        self._send_html(html)
+        return html
 
     def _render_multi_room_form(self, rooms, role: str, signature: str):
         room_options = "".join(
@@ -118,7 +431,7 @@ class QRHandler(BaseHTTPRequestHandler):
           </body>
         </html>
         """
-        self._send_html(html)
+        return html
 
     def do_GET(self):
         parsed = urlparse(self.path)
@@ -126,6 +439,17 @@ class QRHandler(BaseHTTPRequestHandler):
             self._send_html("ok")
             return
 
+        if parsed.path in EVENT_STREAM_PATHS:
+            self._stream_events(parsed.path, parse_qs(parsed.query))
+            return
+
+        if parsed.path == "/board":
+            if not verify(FEED_SCOPE, FEED_ROLE, parse_qs(parsed.query).get("sig", [""])[0]):
+                self._send_html("<h1>Invalid signature</h1>", 403)
+                return
+            self._send_page(BOARD_PAGE)
+            return
+
         if parsed.path != "/form":
             self._send_html("<h1>Not Found</h1>", 404)
             return
@@ -139,20 +463,30 @@ class QRHandler(BaseHTTPRequestHandler):
             self._send_html("<h1>Invalid role</h1>", 400)
             return
 
-        if not _verify(scope, role, sig):
+        if not verify(scope, role, sig):
             self._send_html("<h1>Invalid signature</h1>", 403)
             return
 
-        db = Database(_active_db_path())
-        controller = RoomController(db)
-        try:
-            rooms = sorted(controller.get_all_rooms(), key=lambda r: r["name"].lower())
-            if not rooms:
-                self._send_html("<h1>No rooms configured</h1>", 400)
-                return
+        with DB_POOL.connection(active_db_path()) as db:
+            controller = RoomController(db)
+
+            # Read the version before the rows so a page is never cached
+            # under a newer version than the data it was rendered from.
+            room_set_version = controller.room_set_version()
+            form_key = (str(db.db_path), scope, role)
 
             if scope == ANY_ROOM_SCOPE:
-                self._render_multi_room_form(rooms, role, sig)
+                rooms = controller.get_room_directory()
+                if not rooms:
+                    self._send_html("<h1>No rooms configured</h1>", 400)
+                    return
+                self._send_page(
+                    FORM_CACHE.get_or_render(
+                        form_key,
+                        (room_set_version, None),
+                        lambda: self._render_multi_room_form(rooms, role, sig),
+                    )
+                )
                 return
 
             try:
@@ -161,16 +495,27 @@ class QRHandler(BaseHTTPRequestHandler):
                 self._send_html("<h1>Bad request</h1>", 400)
                 return
 
-            room = next((r for r in rooms if r["id"] == room_id), None)
+            room = controller.get_room(room_id)
             if not room:
-                self._send_html("<h1>Room not found</h1>", 404)
+                if not controller.get_room_directory():
+                    self._send_html("<h1>No rooms configured</h1>", 400)
+                else:
+                    self._send_html("<h1>Room not found</h1>", 404)
                 return
 
-            self._render_single_room_form(room, role, sig)
-        finally:
-            db.close()
+            self._send_page(
+                FORM_CACHE.get_or_render(
+                    form_key,
+                    (room_set_version, room["status"]),
+                    lambda: self._render_single_room_form(room, role, sig),
+                )
+            )
 
     def do_POST(self):
+        if self.path == "/update/batch":
+            self._handle_batch_update()
+            return
+
         if self.path != "/update":
             self._send_html("<h1>Not Found</h1>", 404)
             return
@@ -197,38 +542,92 @@ class QRHandler(BaseHTTPRequestHandler):
             self._send_html("<h1>Bad request</h1><p>Mismatched room scope.</p>", 400)
             return
 
-        if not _verify(scope, role, sig):
+        if not verify(scope, role, sig):
             self._send_html("<h1>Invalid signature</h1>", 403)
             return
 
-        db = Database(_active_db_path())
-        controller = RoomController(db)
         try:
-            room = next((r for r in controller.get_all_rooms() if r["id"] == room_id), None)
-            if not room:
-                self._send_html("<h1>Room not found</h1>", 404)
-                return
+            with DB_POOL.connection(active_db_path()) as db:
+                room = RoomController(db).get_room(room_id)
+        except Exception as exc:
+            self._send_html(f"<h1>Update failed</h1><p>{escape(str(exc))}</p>", 400)
+            return
+        if not room:
+            self._send_html("<h1>Room not found</h1>", 404)
+            return
 
-            controller.update_status(room_id, new_status, UpdateSource.API)
+        def respond(future):
+            try:
+                future.result()
+            except Exception as exc:
+                self._send_html(f"<h1>Update failed</h1><p>{escape(str(exc))}</p>", 400)
+                return
             self._send_html(
                 f"<h1>Success</h1><p>Room {escape(room['name'])} updated to <b>{escape(new_status.value)}</b> at {datetime.now().isoformat(timespec='seconds')}.</p>"
             )
-        except Exception as exc:
-            self._send_html(f"<h1>Update failed</h1><p>{escape(str(exc))}</p>", 400)
-        finally:
-            db.close()
+
+        self._after_commit(UPDATE_QUEUE.start().submit(room_id, new_status, UpdateSource.API), respond)
+
+    def _after_commit(self, future, respond):
+        """
+        Calls respond(future) once a queued write has committed. This
+        request thread waits for it; the async server awaits it instead.
+        """
+        wait([future])
+        respond(future)
+
+    def _handle_batch_update(self):
+        """
+        JSON body: {"role", "sig", "updates": [{"room_id", "new_status"}, ...]}.
+        The signature must be the shared (any-room) one for the role. All
+        updates are applied in one transaction; each gets its own outcome.
+        """
+        length = int(self.headers.get("Content-Length", "0"))
+        try:
+            payload = json.loads(self.rfile.read(length).decode("utf-8"))
+            role = str(payload.get("role", "")).lower()
+            sig = str(payload.get("sig", ""))
+            updates = [
+                (int(item["room_id"]), RoomStatus(item["new_status"]), UpdateSource.API)
+                for item in payload["updates"]
+            ]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self._send_json({"error": "Bad request"}, 400)
+            return
+
+        if role not in {"patient", "provider"}:
+            self._send_json({"error": "Invalid role"}, 400)
+            return
+
+        if not verify(ANY_ROOM_SCOPE, role, sig):
+            self._send_json({"error": "Invalid signature"}, 403)
+            return
+
+        if len(updates) > MAX_BATCH_UPDATES:
+            self._send_json({"error": f"At most {MAX_BATCH_UPDATES} updates per batch"}, 400)
+            return
+
+        def respond(future):
+            try:
+                results = future.result()
+            except Exception as exc:
+                self._send_json({"error": str(exc)}, 500)
+                return
+            self._send_json({"results": results})
+
+        self._after_commit(UPDATE_QUEUE.start().submit_many(updates), respond)
 
 
 def create_signed_form_url(base_url: str, room_id: int, role: str) -> str:
     role = role.lower()
     scope = str(room_id)
-    sig = _sign(scope, role)
+    sig = sign(scope, role)
     return f"{base_url.rstrip('/')}/form?room_id={scope}&role={role}&sig={sig}"
 
 
 def create_shared_form_url(base_url: str, role: str) -> str:
     role = role.lower()
-    sig = _sign(ANY_ROOM_SCOPE, role)
+    sig = sign(ANY_ROOM_SCOPE, role)
     return f"{base_url.rstrip('/')}/form?room_id={ANY_ROOM_SCOPE}&role={role}&sig={sig}"
 
 